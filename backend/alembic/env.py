@@ -9,7 +9,7 @@ from dotenv import load_dotenv
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from app.database import Base
-from app.models import User, Book
+from app.models import User, Book, Exchange  # noqa: F401
 
 load_dotenv()
 
@@ -0,0 +1,91 @@
+"""initial schema
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    # Базы, созданные раньше через Base.metadata.create_all, уже содержат эти таблицы:
+    # пропускаем их, чтобы цепочку можно было применить поверх существующей схемы
+    if op.get_context().as_sql:
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    if not _has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(length=255), nullable=False),
+            sa.Column("username", sa.String(length=100), nullable=False),
+            sa.Column("password_hash", sa.String(length=255), nullable=False),
+            sa.Column("full_name", sa.String(length=200), nullable=True),
+            sa.Column("city", sa.String(length=100), nullable=True),
+            sa.Column("about", sa.Text(), nullable=True),
+            sa.Column("role", sa.Enum("GUEST", "USER", "ADMIN", name="userrole"), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    if not _has_table("books"):
+        op.create_table(
+            "books",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("title", sa.String(length=255), nullable=False),
+            sa.Column("author", sa.String(length=255), nullable=False),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("genre", sa.String(length=100), nullable=True),
+            sa.Column("condition", sa.String(length=50), nullable=True),
+            sa.Column("cover", sa.String(length=500), nullable=True),
+            sa.Column("cover_url", sa.String(length=500), nullable=True),
+            sa.Column("owner_id", sa.Integer(), nullable=False),
+            sa.Column("status", sa.String(length=20), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(["owner_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_books_id", "books", ["id"])
+        op.create_index("ix_books_title", "books", ["title"])
+
+    if not _has_table("exchanges"):
+        op.create_table(
+            "exchanges",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("book_id", sa.Integer(), nullable=False),
+            sa.Column("requester_id", sa.Integer(), nullable=False),
+            sa.Column("owner_id", sa.Integer(), nullable=False),
+            sa.Column("status", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(["book_id"], ["books.id"]),
+            sa.ForeignKeyConstraint(["owner_id"], ["users.id"]),
+            sa.ForeignKeyConstraint(["requester_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_exchanges_id", "exchanges", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("exchanges")
+    op.drop_table("books")
+    op.drop_table("users")
+    sa.Enum(name="userrole").drop(op.get_bind(), checkfirst=True)
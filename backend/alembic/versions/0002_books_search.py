@@ -0,0 +1,77 @@
+"""books full-text search and trigram indexes
+
+Revision ID: 0002_books_search
+Revises: 0001_initial_schema
+Create Date: 2026-10-18 10:10:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_books_search'
+down_revision = '0001_initial_schema'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(author, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(author, '')), 'B') ||
+    setweight(to_tsvector('russian', coalesce(description, '')), 'C') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'C')
+"""
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING GIN (search_vector)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING GIN (title gin_trgm_ops)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_books_author_trgm ON books USING GIN (author gin_trgm_ops)")
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+            "title, author, description, content='books', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+            "INSERT INTO books_fts(rowid, title, author, description) "
+            "VALUES (new.id, new.title, new.author, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+            "INSERT INTO books_fts(books_fts, rowid, title, author, description) "
+            "VALUES ('delete', old.id, old.title, old.author, old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, description ON books BEGIN "
+            "INSERT INTO books_fts(books_fts, rowid, title, author, description) "
+            "VALUES ('delete', old.id, old.title, old.author, old.description); "
+            "INSERT INTO books_fts(rowid, title, author, description) "
+            "VALUES (new.id, new.title, new.author, new.description); END"
+        )
+        op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_books_author_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_books_title_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_books_search_vector")
+        op.execute("ALTER TABLE books DROP COLUMN IF EXISTS search_vector")
+    elif dialect == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS books_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS books_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS books_fts_ai")
+        op.execute("DROP TABLE IF EXISTS books_fts")
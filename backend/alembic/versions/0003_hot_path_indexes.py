@@ -0,0 +1,67 @@
+"""composite indexes for catalog and exchange hot paths
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_books_search
+Create Date: 2026-10-18 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_hot_path_indexes'
+down_revision = '0002_books_search'
+branch_labels = None
+depends_on = None
+
+ACTIVE_EXCHANGE_STATUSES = sa.text("status IN ('pending', 'accepted')")
+
+# До уникального индекса у книги могло накопиться несколько активных обменов.
+# Оставляем один: принятый, если он есть, иначе самую раннюю заявку; остальные отменяем.
+CANCEL_DUPLICATE_ACTIVE_EXCHANGES = sa.text(
+    """
+    UPDATE exchanges
+    SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+    WHERE status IN ('pending', 'accepted')
+      AND id <> (
+          SELECT keeper.id
+          FROM exchanges AS keeper
+          WHERE keeper.book_id = exchanges.book_id AND keeper.status IN ('pending', 'accepted')
+          ORDER BY CASE WHEN keeper.status = 'accepted' THEN 0 ELSE 1 END, keeper.id
+          LIMIT 1
+      )
+    """
+)
+
+
+def upgrade() -> None:
+    op.create_index("ix_books_status_created_at_id", "books", ["status", "created_at", "id"], if_not_exists=True)
+    op.create_index("ix_books_created_at_id", "books", ["created_at", "id"], if_not_exists=True)
+    op.create_index("ix_books_owner_id_status", "books", ["owner_id", "status"], if_not_exists=True)
+    op.create_index("ix_exchanges_owner_id_status", "exchanges", ["owner_id", "status"], if_not_exists=True)
+    op.create_index(
+        "ix_exchanges_requester_id_created_at",
+        "exchanges",
+        ["requester_id", "created_at"],
+        if_not_exists=True,
+    )
+    op.execute(CANCEL_DUPLICATE_ACTIVE_EXCHANGES)
+    op.create_index(
+        "uq_exchanges_active_book",
+        "exchanges",
+        ["book_id"],
+        unique=True,
+        if_not_exists=True,
+        postgresql_where=ACTIVE_EXCHANGE_STATUSES,
+        sqlite_where=ACTIVE_EXCHANGE_STATUSES,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_exchanges_active_book", table_name="exchanges")
+    op.drop_index("ix_exchanges_requester_id_created_at", table_name="exchanges")
+    op.drop_index("ix_exchanges_owner_id_status", table_name="exchanges")
+    op.drop_index("ix_books_owner_id_status", table_name="books")
+    op.drop_index("ix_books_created_at_id", table_name="books")
+    op.drop_index("ix_books_status_created_at_id", table_name="books")
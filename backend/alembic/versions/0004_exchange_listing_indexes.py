@@ -0,0 +1,40 @@
+"""status-aware indexes for paginated exchange listings
+
+Revision ID: 0004_exchange_listing_indexes
+Revises: 0003_hot_path_indexes
+Create Date: 2026-10-18 12:40:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_exchange_listing_indexes'
+down_revision = '0003_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_exchanges_requester_id_status_created_at",
+        "exchanges",
+        ["requester_id", "status", "created_at"],
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_exchanges_owner_id_status_created_at",
+        "exchanges",
+        ["owner_id", "status", "created_at"],
+        if_not_exists=True,
+    )
+    op.create_index("ix_exchanges_owner_id_created_at", "exchanges", ["owner_id", "created_at"], if_not_exists=True)
+    # (owner_id, status) — префикс нового индекса
+    op.drop_index("ix_exchanges_owner_id_status", table_name="exchanges", if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index("ix_exchanges_owner_id_status", "exchanges", ["owner_id", "status"], if_not_exists=True)
+    op.drop_index("ix_exchanges_owner_id_created_at", table_name="exchanges")
+    op.drop_index("ix_exchanges_owner_id_status_created_at", table_name="exchanges")
+    op.drop_index("ix_exchanges_requester_id_status_created_at", table_name="exchanges")
@@ -0,0 +1,23 @@
+"""(status, created_at) index for the pending exchange expiry sweep
+
+Revision ID: 0006_exchange_expiry_index
+Revises: 0005_exchange_events_outbox
+Create Date: 2026-10-18 15:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_exchange_expiry_index'
+down_revision = '0005_exchange_events_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_exchanges_status_created_at", "exchanges", ["status", "created_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_exchanges_status_created_at", table_name="exchanges")
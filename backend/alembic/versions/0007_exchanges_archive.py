@@ -0,0 +1,48 @@
+"""exchanges_archive table for closed exchanges
+
+Revision ID: 0007_exchanges_archive
+Revises: 0006_exchange_expiry_index
+Create Date: 2026-10-18 16:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_exchanges_archive'
+down_revision = '0006_exchange_expiry_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "exchanges_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id"), nullable=False),
+        sa.Column("requester_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index(
+        "ix_exchanges_archive_requester_id_status_created_at",
+        "exchanges_archive",
+        ["requester_id", "status", "created_at"],
+    )
+    op.create_index(
+        "ix_exchanges_archive_owner_id_status_created_at",
+        "exchanges_archive",
+        ["owner_id", "status", "created_at"],
+    )
+    op.create_index("ix_exchanges_archive_book_id", "exchanges_archive", ["book_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_exchanges_archive_book_id", table_name="exchanges_archive")
+    op.drop_index("ix_exchanges_archive_owner_id_status_created_at", table_name="exchanges_archive")
+    op.drop_index("ix_exchanges_archive_requester_id_status_created_at", table_name="exchanges_archive")
+    op.drop_table("exchanges_archive")
@@ -0,0 +1,45 @@
+"""per-user exchange_counters for pending offers and open requests
+
+Revision ID: 0008_exchange_counters
+Revises: 0007_exchanges_archive
+Create Date: 2026-10-18 17:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_exchange_counters'
+down_revision = '0007_exchanges_archive'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "exchange_counters",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("pending_offers", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("open_requests", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    # Начальные значения из уже существующих ожидающих обменов
+    op.execute(
+        """
+        INSERT INTO exchange_counters (user_id, pending_offers, open_requests)
+        SELECT user_id, SUM(pending_offers), SUM(open_requests)
+        FROM (
+            SELECT owner_id AS user_id, 1 AS pending_offers, 0 AS open_requests
+            FROM exchanges WHERE status = 'pending'
+            UNION ALL
+            SELECT requester_id, 0, 1
+            FROM exchanges WHERE status = 'pending'
+        ) AS pending
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("exchange_counters")
@@ -0,0 +1,28 @@
+"""failed delivery attempts on exchange_events
+
+Revision ID: 0010_exchange_events_attempts
+Revises: 0009_exchange_replay
+Create Date: 2026-10-18 21:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_exchange_events_attempts'
+down_revision = '0009_exchange_replay'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "exchange_events",
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("exchange_events") as batch_op:
+        batch_op.drop_column("attempts")
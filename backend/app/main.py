@@ -1,14 +1,18 @@
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
-import xml.etree.ElementTree as ET
+from fastapi.responses import Response, StreamingResponse
 from contextlib import asynccontextmanager
 from sqlalchemy import text
 
-from .database import engine, Base
+from .database import SessionLocal, engine
 from .minio_client import minio_client
-from .routes import auth, books, exchanges
-from .services.storage import attach_cover_urls
+from .routes import auth, books, exchanges, presence
+from .services import sitemap as sitemap_service
+from .services.archive import exchange_archiver
+from .services.expiry import expiry_sweeper
+from .services.outbox import outbox_dispatcher
 from .settings import get_settings
 from .websockets import SocketManager  # Импортируем SocketManager
 
@@ -19,17 +23,23 @@ async def lifespan(app: FastAPI):
     # При запуске приложения
     print("🚀 Запуск приложения...")
     print("🔌 Инициализация вебсокет-сервера...")
-    
-    # Создаем таблицы
-    print("📊 Создание таблиц в базе данных...")
-    Base.metadata.create_all(bind=engine)
+    socket_manager.start()
+    # Схема БД создаётся миграциями: alembic upgrade head (см. scripts/start.sh)
+    print("📨 Запуск рассылки событий обменов...")
+    outbox_dispatcher.start(app.state.socket_manager)
+    expiry_sweeper.start()
+    exchange_archiver.start()
     
     yield
     
     # При остановке приложения
     print("🛑 Остановка приложения...")
+    await exchange_archiver.stop()
+    await expiry_sweeper.stop()
+    await outbox_dispatcher.stop()
     if hasattr(socket_manager, 'sio'):
         print("🔌 Остановка вебсокет-сервера...")
+        await socket_manager.stop()
         await socket_manager.sio.eio.shutdown()
 
 app = FastAPI(title="Book Exchange API", version="1.0.0", lifespan=lifespan)
@@ -54,6 +64,7 @@ app.mount("/ws", socket_manager.app)
 app.include_router(auth.router)
 app.include_router(books.router)
 app.include_router(exchanges.router)
+app.include_router(presence.router)
 
 @app.get("/robots.txt")
 async def robots_txt():
@@ -73,61 +84,72 @@ Sitemap: {settings.public_site_url}/sitemap.xml
     return Response(content=content, media_type="text/plain")
 
 @app.get("/sitemap.xml")
-async def sitemap():
-    # Простая реализация: берем все доступные книги
-    # В реальном проекте лучше использовать кэширование
-    from .database import SessionLocal
-    from .models import Book
-    
+def sitemap():
+    """Индекс карты сайта: статические страницы и шарды книг по SITEMAP_SHARD_SIZE адресов."""
     db = SessionLocal()
     try:
-        books = db.query(Book).filter(Book.status == "available").all()
-        attach_cover_urls(books)
-        
-        urlset = ET.Element("urlset", xmlns="http://www.sitemaps.org/schemas/sitemap/0.9")
-        
-        # Статические страницы
-        for path in ["", "/catalog"]:
-            url = ET.SubElement(urlset, "url")
-            loc = ET.SubElement(url, "loc")
-            loc.text = f"{settings.public_site_url}{path}"
-            priority = ET.SubElement(url, "priority")
-            priority.text = "1.0" if path == "" else "0.9"
-
-        # Динамические страницы книг
-        for book in books:
-            url = ET.SubElement(urlset, "url")
-            loc = ET.SubElement(url, "loc")
-            loc.text = f"{settings.public_site_url}/book/{book.id}"
-            lastmod = ET.SubElement(url, "lastmod")
-            lastmod.text = book.updated_at.isoformat() if book.updated_at else book.created_at.isoformat()
-            priority = ET.SubElement(url, "priority")
-            priority.text = "0.8"
-
-        return Response(content=ET.tostring(urlset, encoding="unicode"), media_type="application/xml")
+        states = sitemap_service.shard_states(db)
     finally:
         db.close()
+    return Response(content=sitemap_service.render_index(states), media_type="application/xml")
+
+
+@app.get("/sitemap-pages.xml")
+def sitemap_pages():
+    return Response(content=sitemap_service.render_static_pages(), media_type="application/xml")
+
+
+@app.get("/sitemap-books-{shard}.xml")
+def sitemap_books(shard: int):
+    if shard < 0:
+        raise HTTPException(status_code=404, detail="Шард карты сайта не найден")
+
+    db = SessionLocal()
+    try:
+        state = sitemap_service.shard_state(db, shard)
+    finally:
+        db.close()
+    if state is None:
+        raise HTTPException(status_code=404, detail="Шард карты сайта не найден")
+
+    cached = sitemap_service.cached_shard(shard, state)
+    if cached is not None:
+        return Response(content=cached, media_type="application/xml")
+    return StreamingResponse(sitemap_service.stream_shard(shard, state), media_type="application/xml")
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Book Exchange API"}
 
-@app.get("/health")
-def health_check():
-    database_status = "unhealthy"
+def check_database() -> str:
     try:
         with engine.connect() as connection:
             connection.execute(text("SELECT 1"))
-        database_status = "healthy"
+        return "healthy"
     except Exception:
-        database_status = "unhealthy"
+        return "unhealthy"
+
+
+@app.get("/health")
+async def health_check():
+    database_status = await asyncio.to_thread(check_database)
+    storage_healthy = await asyncio.to_thread(minio_client.healthcheck)
+
+    websockets_status = "enabled"
+    online_users = None
+    try:
+        # Присутствие общее для всех воркеров, если настроен SOCKETIO_MESSAGE_QUEUE
+        online_users = await socket_manager.online_count()
+    except Exception as e:
+        print(f"Ошибка чтения присутствия: {str(e)}")
+        websockets_status = "degraded"
 
     return {
         "status": "healthy" if database_status == "healthy" else "degraded",
         "database": database_status,
-        "storage": "healthy" if minio_client.healthcheck() else "degraded",
-        "websockets": "enabled",
-        "online_users": len(socket_manager.online_users)
+        "storage": "healthy" if storage_healthy else "degraded",
+        "websockets": websockets_status,
+        "online_users": online_users
     }
 
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum as SQLEnum
+from sqlalchemy import DDL, JSON, Column, Index, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum as SQLEnum, event, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -43,15 +43,160 @@ class Book(Base):
     owner = relationship("User", back_populates="books")
     exchanges = relationship("Exchange", back_populates="book", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset-пагинация каталога (status = 'available') и админского списка
+        Index("ix_books_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_books_created_at_id", "created_at", "id"),
+        Index("ix_books_owner_id_status", "owner_id", "status"),
+    )
+
 class Exchange(Base):
     __tablename__ = "exchanges"
     id = Column(Integer, primary_key=True, index=True)
     book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
     requester_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    status = Column(String, default="pending")  # pending, accepted, rejected, cancelled
+    status = Column(String, default="pending")  # pending, accepted, rejected, cancelled, expired
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     book = relationship("Book", back_populates="exchanges")
     requester = relationship("User", foreign_keys=[requester_id])
-    owner = relationship("User", foreign_keys=[owner_id])
\ No newline at end of file
+    owner = relationship("User", foreign_keys=[owner_id])
+
+    __table_args__ = (
+        Index("ix_exchanges_requester_id_created_at", "requester_id", "created_at"),
+        Index("ix_exchanges_owner_id_created_at", "owner_id", "created_at"),
+        # Списки «мои запросы» / «мои предложения» с фильтром по статусу
+        Index("ix_exchanges_requester_id_status_created_at", "requester_id", "status", "created_at"),
+        Index("ix_exchanges_owner_id_status_created_at", "owner_id", "status", "created_at"),
+        # Поиск просроченных ожидающих обменов (services/expiry.py)
+        Index("ix_exchanges_status_created_at", "status", "created_at"),
+        # Не больше одного активного обмена на книгу
+        Index(
+            "uq_exchanges_active_book",
+            "book_id",
+            unique=True,
+            postgresql_where=text("status IN ('pending', 'accepted')"),
+            sqlite_where=text("status IN ('pending', 'accepted')"),
+        ),
+    )
+
+class ExchangeArchive(Base):
+    """
+    Закрытые обмены старше EXCHANGE_ARCHIVE_AFTER_DAYS, перенесённые из exchanges
+    (services/archive.py). Сохраняют исходный id; списки обменов читают обе таблицы.
+    """
+    __tablename__ = "exchanges_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
+    requester_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String, nullable=False)  # accepted, rejected, cancelled, expired
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    book = relationship("Book")
+    requester = relationship("User", foreign_keys=[requester_id])
+    owner = relationship("User", foreign_keys=[owner_id])
+
+    __table_args__ = (
+        Index("ix_exchanges_archive_requester_id_status_created_at", "requester_id", "status", "created_at"),
+        Index("ix_exchanges_archive_owner_id_status_created_at", "owner_id", "status", "created_at"),
+        Index("ix_exchanges_archive_book_id", "book_id"),
+    )
+
+class ExchangeCounter(Base):
+    """
+    Счётчики ожидающих обменов пользователя для бейджа в интерфейсе.
+    Обновляются в той же транзакции, что и переход обмена (services/counters.py).
+    """
+    __tablename__ = "exchange_counters"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    pending_offers = Column(Integer, nullable=False, default=0, server_default="0")  # ждут ответа владельца
+    open_requests = Column(Integer, nullable=False, default=0, server_default="0")  # отправлены пользователем
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ExchangeEvent(Base):
+    """
+    Outbox уведомлений об обменах: пишется в той же транзакции, что и изменение
+    обмена, и разбирается фоновым диспетчером (services/outbox.py).
+    Доставленные события удаляются; события, которые не удалось доставить
+    outbox_max_attempts раз, остаются в таблице и больше не разбираются.
+    """
+    __tablename__ = "exchange_events"
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String(50), nullable=False)  # exchange_created, exchange_status_changed, exchange_status_batch, exchange_counters
+    exchange_id = Column(Integer)
+    recipient_id = Column(Integer, nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ExchangeStream(Base):
+    """Последний номер дельта-события обменов, выданный пользователю (services/replay.py)"""
+    __tablename__ = "exchange_streams"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_seq = Column(Integer, nullable=False, default=0, server_default="0")
+
+class ExchangeReplay(Base):
+    """
+    Буфер повтора: последние доставленные дельта-события пользователя с номерами,
+    по которым переподключившийся клиент получает пропущенное.
+    """
+    __tablename__ = "exchange_replay"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+    event_type = Column(String(50), nullable=False)  # тип события outbox
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# Полнотекстовый поиск по каталогу.
+# PostgreSQL: вычисляемая колонка tsvector (русская и английская конфигурации) с GIN-индексом.
+# SQLite (dev/тесты): внешняя FTS5-таблица books_fts, синхронизируемая триггерами.
+BOOKS_SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(author, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(author, '')), 'B') ||
+    setweight(to_tsvector('russian', coalesce(description, '')), 'C') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'C')
+"""
+
+_postgres_search_ddl = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"ALTER TABLE books ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({BOOKS_SEARCH_VECTOR_SQL}) STORED",
+    "CREATE INDEX ix_books_search_vector ON books USING GIN (search_vector)",
+    # Триграммные индексы для автодополнения (ILIKE 'q%' и нечёткое совпадение %)
+    "CREATE INDEX ix_books_title_trgm ON books USING GIN (title gin_trgm_ops)",
+    "CREATE INDEX ix_books_author_trgm ON books USING GIN (author gin_trgm_ops)",
+]
+
+_sqlite_search_ddl = [
+    "CREATE VIRTUAL TABLE books_fts USING fts5("
+    "title, author, description, content='books', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, title, author, description) "
+    "VALUES (new.id, new.title, new.author, new.description); END",
+    "CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author, description) "
+    "VALUES ('delete', old.id, old.title, old.author, old.description); END",
+    "CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author, description ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author, description) "
+    "VALUES ('delete', old.id, old.title, old.author, old.description); "
+    "INSERT INTO books_fts(rowid, title, author, description) "
+    "VALUES (new.id, new.title, new.author, new.description); END",
+]
+
+for statement in _postgres_search_ddl:
+    event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+for statement in _sqlite_search_ddl:
+    event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+event.listen(
+    Book.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS books_fts").execute_if(dialect="sqlite"),
+)
@@ -2,14 +2,19 @@ from typing import List
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import func, or_, select
 from sqlalchemy.orm import Session, joinedload
 
 from ..database import get_db
-from ..models import Book
+from ..models import Book, Exchange
 from ..models import User, UserRole
 from ..permissions import get_user_permissions
 from ..schemas import BookResponse, UserCreate, UserResponse, UserUpdateAdmin
 from ..security import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, create_access_token, create_refresh_token, get_current_admin_user, get_current_user, get_current_user_from_refresh, get_password_hash, verify_password
+from ..services.catalog_cache import bump_catalog_version
+from ..services.exchanges import delete_pending_where
+from ..services.http_cache import etag_for, is_fresh, latest, not_modified, validator_headers
+from ..services.outbox import outbox_dispatcher
 from ..services.storage import attach_cover_urls
 from ..settings import get_settings
 
@@ -143,22 +148,60 @@ def get_current_user_info(request: Request, current_user: User = Depends(get_cur
 @router.get("/profile/{user_id}", response_model=UserResponse)
 def get_user_profile(
     request: Request,
+    response: Response,
     user_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    stamps = db.query(User.created_at, User.updated_at).filter(User.id == user_id).first()
+    if not stamps:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    last_modified = latest(*stamps)
+    headers = validator_headers(etag_for("profile", user_id, *stamps), last_modified, "private, no-cache")
+    if is_fresh(request, headers["ETag"], last_modified):
+        return not_modified(headers)
+
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    response.headers.update(headers)
     return user
 
 @router.get("/profile/{user_id}/books", response_model=List[BookResponse])
 def get_user_books(
     request: Request,
+    response: Response,
     user_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    # Отпечаток списка: число и сумма id книг меняются при добавлении/удалении,
+    # максимум меток времени — при правке книги; метка владельца — при правке профиля.
+    # Last-Modified не отдаём: максимум меток не растёт при удалении книги из списка
+    owner_stamp = (
+        select(func.coalesce(User.updated_at, User.created_at))
+        .where(User.id == user_id)
+        .scalar_subquery()
+    )
+    count, id_sum, books_stamp, owner_changed_at = (
+        db.query(
+            func.count(Book.id),
+            func.sum(Book.id),
+            func.max(func.coalesce(Book.updated_at, Book.created_at)),
+            owner_stamp,
+        )
+        .filter(Book.owner_id == user_id, Book.status == "available")
+        .one()
+    )
+    headers = validator_headers(
+        etag_for("profile-books", user_id, count, id_sum, books_stamp, owner_changed_at),
+        cache_control="private, no-cache",
+    )
+    if is_fresh(request, headers["ETag"]):
+        return not_modified(headers)
+
+    response.headers.update(headers)
     books = db.query(Book).filter(Book.owner_id == user_id, Book.status == "available").options(joinedload(Book.owner)).all()
     attach_cover_urls(books)
     return books
@@ -223,6 +266,7 @@ def update_user(
         setattr(user, field, value)
     
     db.commit()
+    bump_catalog_version()
     db.refresh(user)
     return user
 
@@ -252,8 +296,11 @@ def delete_user(
                 detail="Нельзя удалить последнего администратора"
             )
     
+    delete_pending_where(db, or_(Exchange.owner_id == user_id, Exchange.requester_id == user_id))
     db.delete(user)
     db.commit()
+    bump_catalog_version()
+    outbox_dispatcher.wake()
     return {"message": "Пользователь успешно удален"}
 
 @router.post("/admin/users/{user_id}/role")
@@ -285,6 +332,7 @@ def update_user_role(
     
     user.role = new_role
     db.commit()
+    bump_catalog_version()
     db.refresh(user)
 
     return {
@@ -3,21 +3,39 @@ from datetime import datetime
 from math import ceil
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile, status
 from sqlalchemy.orm import Session, joinedload
 
 from ..database import get_db
 from ..minio_client import minio_client
-from ..models import Book, Exchange, User, UserRole
+from ..models import Book, Exchange, ExchangeArchive, User, UserRole
 from ..permissions import Permission, can_delete_book, can_edit_book, has_permission
-from ..schemas import BookResponse, PaginatedBookResponse
+from ..schemas import BookBatchResponse, BookResponse, FacetsResponse, PaginatedBookResponse, SuggestionResponse
 from ..security import get_current_user
+from ..services.catalog_cache import (
+    CachedPage,
+    book_count_key,
+    book_snapshot,
+    catalog_page_cache,
+    catalog_page_key,
+    clean_filter,
+    count_books,
+    record_book_change,
+)
+from ..services.exchanges import delete_pending_where
+from ..services.facets import get_facets
+from ..services.http_cache import etag_for, etag_matches, is_fresh, latest, not_modified, validator_headers
+from ..services.outbox import outbox_dispatcher
+from ..services.pagination import order_by_keyset, seek_after_cursor, split_page
+from ..services.search import apply_search
 from ..services.storage import attach_cover_url, attach_cover_urls
+from ..services.suggest import get_suggestions
 from ..services.weather import get_city_weather
 
 router = APIRouter(prefix="/books", tags=["books"])
 
+MAX_BATCH_SIZE = 100
+
 
 @router.post("/", response_model=BookResponse)
 def create_book(
@@ -65,48 +83,147 @@ def create_book(
     db.add(db_book)
     db.commit()
     db.refresh(db_book)
+    record_book_change(None, book_snapshot(db_book))
     attach_cover_url(db_book)
     return db_book
 
 
-@router.get("/", response_model=PaginatedBookResponse)
-def get_books(
-    page: int = 1,
-    limit: int = 10,
-    genre: Optional[str] = None,
-    condition: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
+def _load_catalog_page(
+    db: Session,
+    page: int,
+    limit: int,
+    genre: Optional[str],
+    condition: Optional[str],
+    search: Optional[str],
+    cursor: Optional[str],
+) -> dict:
     query = db.query(Book).filter(Book.status == "available")
 
     if genre:
         query = query.filter(Book.genre.ilike(f"%{genre}%"))
     if condition:
         query = query.filter(Book.condition == condition)
-    if search:
-        query = query.filter(
-            or_(
-                Book.title.ilike(f"%{search}%"),
-                Book.author.ilike(f"%{search}%"),
-                Book.description.ilike(f"%{search}%"),
-            )
-        )
-
-    total_count = query.count()
-    skip = (page - 1) * limit
-
-    books = query.options(joinedload(Book.owner)).offset(skip).limit(limit).all()
+    query, relevance = apply_search(query, search)
+
+    total_count = count_books(query, book_count_key("catalog", genre, condition, search))
+    query = query.options(joinedload(Book.owner))
+
+    if cursor is not None:
+        query = seek_after_cursor(query, Book.created_at, Book.id, cursor)
+        query = order_by_keyset(query, Book.created_at, Book.id)
+        rows = query.limit(limit + 1).all()
+    elif relevance is not None:
+        rows = query.order_by(relevance, Book.id.desc()).offset((page - 1) * limit).limit(limit).all()
+    else:
+        query = order_by_keyset(query, Book.created_at, Book.id)
+        rows = query.offset((page - 1) * limit).limit(limit + 1).all()
+
+    books, next_cursor = split_page(rows, limit)
     attach_cover_urls(books)
 
-    total_pages = ceil(total_count / limit) if limit > 0 else 1
-
     return {
         "books": books,
         "total_count": total_count,
-        "total_pages": total_pages,
+        "total_pages": ceil(total_count / limit),
         "current_page": page,
         "limit": limit,
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/", response_model=PaginatedBookResponse)
+def get_books(
+    request: Request,
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=100),
+    genre: Optional[str] = None,
+    condition: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Каталог доступных книг.
+    Режим page/limit сохранён для старых клиентов; если передан cursor
+    (пустая строка — первая страница), выдача идёт по ключу (created_at, id)
+    без OFFSET, а следующую страницу открывает next_cursor из ответа.
+    Поиск в режиме page/limit сортируется по релевантности.
+
+    Ответ одинаков для всех пользователей, поэтому готовое тело страницы
+    кэшируется до следующего изменения каталога и отдаётся с ETag.
+    """
+    # Одни и те же значения фильтров идут и в ключ кэша, и в запрос
+    genre, condition = clean_filter(genre), clean_filter(condition)
+    cache_key = catalog_page_key(page, limit, genre, condition, search, cursor)
+    cached_page = catalog_page_cache.get(cache_key)
+
+    if cached_page is None:
+        generation = catalog_page_cache.generation
+        payload = PaginatedBookResponse(**_load_catalog_page(db, page, limit, genre, condition, search, cursor))
+        body = payload.json().encode("utf-8")
+        cached_page = CachedPage(body=body, etag=etag_for(body))
+        catalog_page_cache.set(cache_key, cached_page, generation=generation)
+
+    headers = {"ETag": cached_page.etag, "Cache-Control": "public, no-cache"}
+    if etag_matches(request, cached_page.etag):
+        return not_modified(headers)
+    return Response(content=cached_page.body, media_type="application/json", headers=headers)
+
+
+@router.get("/suggest", response_model=List[SuggestionResponse])
+def suggest_books(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+    db: Session = Depends(get_db),
+):
+    """Автодополнение по названиям и авторам доступных книг."""
+    return get_suggestions(db, q, limit)
+
+
+@router.get("/facets", response_model=FacetsResponse)
+def get_book_facets(
+    genre: Optional[str] = None,
+    condition: Optional[str] = None,
+    search: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Количество доступных книг по жанрам и состояниям для текущих фильтров каталога."""
+    return get_facets(db, clean_filter(genre), clean_filter(condition), search)
+
+
+@router.get("/batch", response_model=BookBatchResponse)
+def get_books_batch(
+    ids: str = Query(..., description="Идентификаторы книг через запятую"),
+    db: Session = Depends(get_db),
+):
+    """
+    Несколько книг одним запросом IN с владельцем.
+    Порядок ответа совпадает с порядком ids (повторы отбрасываются),
+    отсутствующие книги помечаются found = false и перечисляются в missing_ids.
+    """
+    try:
+        requested_ids = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный список идентификаторов книг")
+
+    if not requested_ids:
+        raise HTTPException(status_code=400, detail="Неверный список идентификаторов книг")
+    if len(requested_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Можно запросить не больше {MAX_BATCH_SIZE} книг за раз",
+        )
+
+    books = db.query(Book).options(joinedload(Book.owner)).filter(Book.id.in_(requested_ids)).all()
+    attach_cover_urls(books)
+    books_by_id = {book.id: book for book in books}
+
+    return {
+        "items": [
+            {"id": book_id, "found": book_id in books_by_id, "book": books_by_id.get(book_id)}
+            for book_id in requested_ids
+        ],
+        "missing_ids": [book_id for book_id in requested_ids if book_id not in books_by_id],
     }
 
 
@@ -121,10 +238,27 @@ def get_my_books(
 
 
 @router.get("/{book_id}", response_model=BookResponse)
-def get_book(book_id: int, db: Session = Depends(get_db)):
-    book = db.query(Book).filter(Book.id == book_id).first()
+def get_book(book_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    # Свежесть проверяется по меткам времени книги и владельца (он встроен в ответ),
+    # не загружая саму книгу и связь owner
+    stamps = (
+        db.query(Book.created_at, Book.updated_at, User.created_at, User.updated_at)
+        .join(User, Book.owner_id == User.id)
+        .filter(Book.id == book_id)
+        .first()
+    )
+    if not stamps:
+        raise HTTPException(status_code=404, detail="Книга не найдена")
+
+    last_modified = latest(*stamps)
+    headers = validator_headers(etag_for("book", book_id, *stamps), last_modified, "public, no-cache")
+    if is_fresh(request, headers["ETag"], last_modified):
+        return not_modified(headers)
+
+    book = db.query(Book).options(joinedload(Book.owner)).filter(Book.id == book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
+    response.headers.update(headers)
     attach_cover_url(book)
     return book
 
@@ -151,6 +285,7 @@ def update_book(
             detail="Недостаточно прав для редактирования этой книги",
         )
 
+    old_snapshot = book_snapshot(book)
     book.title = title
     book.author = author
     book.description = description
@@ -180,6 +315,7 @@ def update_book(
 
     db.commit()
     db.refresh(book)
+    record_book_change(old_snapshot, book_snapshot(book))
     attach_cover_url(book)
     return book
 
@@ -194,11 +330,16 @@ def delete_book(
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
 
+    # Принятые обмены старше срока архивации лежат в exchanges_archive
     has_active_exchanges = (
-        db.query(Exchange)
+        db.query(Exchange.id)
         .filter(Exchange.book_id == book_id, Exchange.status.in_(["pending", "accepted"]))
-        .count()
-        > 0
+        .first()
+        is not None
+        or db.query(ExchangeArchive.id)
+        .filter(ExchangeArchive.book_id == book_id, ExchangeArchive.status == "accepted")
+        .first()
+        is not None
     )
 
     if not can_delete_book(current_user, book.owner_id, has_active_exchanges):
@@ -218,15 +359,22 @@ def delete_book(
         except Exception as error:
             print(f"Ошибка удаления обложки: {str(error)}")
 
+    old_snapshot = book_snapshot(book)
+    delete_pending_where(db, Exchange.book_id == book_id)
+    # Архивные обмены не связаны с книгой каскадом ORM, как exchanges
+    db.query(ExchangeArchive).filter(ExchangeArchive.book_id == book_id).delete(synchronize_session=False)
     db.delete(book)
     db.commit()
+    record_book_change(old_snapshot, None)
+    outbox_dispatcher.wake()
     return {"message": "Книга успешно удалена"}
 
 
 @router.get("/admin/all-books", response_model=PaginatedBookResponse)
 def get_all_books_admin(
-    page: int = 1,
-    limit: int = 50,
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -237,18 +385,24 @@ def get_all_books_admin(
         )
 
     query = db.query(Book)
-    total_count = query.count()
-    skip = (page - 1) * limit
-    books = query.options(joinedload(Book.owner)).offset(skip).limit(limit).all()
+    total_count = count_books(query, book_count_key("admin"), allow_estimate=True)
+    query = order_by_keyset(query.options(joinedload(Book.owner)), Book.created_at, Book.id)
+
+    if cursor is not None:
+        query = seek_after_cursor(query, Book.created_at, Book.id, cursor)
+    else:
+        query = query.offset((page - 1) * limit)
+
+    books, next_cursor = split_page(query.limit(limit + 1).all(), limit)
     attach_cover_urls(books)
-    total_pages = ceil(total_count / limit) if limit > 0 else 1
 
     return {
         "books": books,
         "total_count": total_count,
-        "total_pages": total_pages,
+        "total_pages": ceil(total_count / limit),
         "current_page": page,
         "limit": limit,
+        "next_cursor": next_cursor,
     }
 
 
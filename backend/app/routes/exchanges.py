@@ -1,27 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, or_
 from ..database import get_db
-from ..models import Exchange, Book, User, UserRole
-from ..schemas import ExchangeResponse, ExchangeCreate
+from ..models import Exchange, ExchangeArchive, Book, User, UserRole
+from ..schemas import (
+    ExchangeBulkAction,
+    ExchangeBulkRequest,
+    ExchangeBulkResponse,
+    ExchangeCountersResponse,
+    ExchangeCreate,
+    ExchangeResponse,
+    PaginatedExchangeResponse,
+)
 from ..security import get_current_user
-from ..dependencies import get_socket_manager
-from fastapi import Request
 from ..permissions import has_permission, Permission
+from ..services.archive import CLOSED_STATUSES
+from ..services.catalog_cache import book_snapshot, bump_catalog_version, record_book_change
+from ..services.counters import get_counters
+from ..services.exchanges import (
+    apply_bulk_decisions,
+    delete_pending,
+    insert_exchange,
+    mark_book_exchanged,
+    transition_pending,
+)
+from ..services.outbox import outbox_dispatcher
+from ..services.pagination import order_by_keyset, seek_after_cursor, split_page
 from ..services.storage import attach_exchange_cover_url, attach_exchange_cover_urls
 
 router = APIRouter(prefix="/exchanges", tags=["exchanges"])
 
-def get_socket_manager(request: Request):
-    return request.app.state.socket_manager
+MAX_BULK_SIZE = 100
+
+def exchange_response_options(model=Exchange):
+    """План загрузки для ExchangeResponse: книга с владельцем, инициатор и владелец обмена одним запросом"""
+    return (
+        joinedload(model.book).joinedload(Book.owner),
+        joinedload(model.requester),
+        joinedload(model.owner),
+    )
+
+def load_exchange_response(db: Session, exchange_id: int):
+    exchange = db.query(Exchange).options(*exchange_response_options()).filter(Exchange.id == exchange_id).first()
+    attach_exchange_cover_url(exchange)
+    return exchange
 
 @router.post("/", response_model=ExchangeResponse)
 def create_exchange(
     exchange: ExchangeCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    socket_manager=Depends(get_socket_manager)
+    current_user: User = Depends(get_current_user)
 ):
 
     if not has_permission(current_user, Permission.EXCHANGES_CREATE):
@@ -38,52 +70,171 @@ def create_exchange(
     if book.owner_id == current_user.id:
         raise HTTPException(status_code=400, detail="Вы не можете обменять свою же книгу")
     
-    existing_exchange = db.query(Exchange).filter(
-        Exchange.book_id == exchange.book_id,
-        Exchange.status.in_(["pending", "accepted"])
-    ).first()
-    
-    if existing_exchange:
-        raise HTTPException(status_code=400, detail="Уже есть активное предложение обмена для этой книги")
-    
-    db_exchange = Exchange(
-        book_id=exchange.book_id,
-        requester_id=current_user.id,
-        owner_id=book.owner_id,
-        status="pending"
+    db_exchange = insert_exchange(db, book, current_user)
+    bump_catalog_version()
+    outbox_dispatcher.wake()
+    return load_exchange_response(db, db_exchange.id)
+
+EXCHANGE_STATUS_PATTERN = "^(pending|accepted|rejected|cancelled|expired)$"
+
+def _exchange_page_rows(
+    db: Session,
+    model,
+    party: str,
+    user_id: int,
+    exchange_status: Optional[str],
+    book_id: Optional[int],
+    descending: bool,
+    cursor: Optional[str],
+    limit: int,
+):
+    query = db.query(model).filter(getattr(model, party) == user_id)
+    if exchange_status:
+        query = query.filter(model.status == exchange_status)
+    if book_id is not None:
+        query = query.filter(model.book_id == book_id)
+    query = seek_after_cursor(query, model.created_at, model.id, cursor, descending=descending)
+    query = order_by_keyset(query, model.created_at, model.id, descending=descending)
+    return query.options(*exchange_response_options(model)).limit(limit + 1).all()
+
+def _keyset_key(exchange):
+    created_at = exchange.created_at
+    if created_at is not None and created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return created_at or datetime.min, exchange.id
+
+def _status_counts(db: Session, model, party: str, user_id: int) -> Counter:
+    rows = (
+        db.query(model.status, func.count(model.id))
+        .filter(getattr(model, party) == user_id)
+        .group_by(model.status)
+        .all()
     )
-    db.add(db_exchange)
-    db.commit()
-    db.refresh(db_exchange)
-    attach_exchange_cover_url(db_exchange)
-    background_tasks.add_task(socket_manager.notify_new_exchange, db_exchange.id)
-    return db_exchange
+    return Counter(dict(rows))
 
-@router.get("/my-requests", response_model=list[ExchangeResponse])
+def list_exchanges_page(
+    db: Session,
+    party: str,
+    user_id: int,
+    exchange_status: Optional[str],
+    book_id: Optional[int],
+    order: str,
+    cursor: Optional[str],
+    limit: int,
+):
+    """
+    Страница обменов пользователя по keyset-курсору (created_at, id)
+    и сводка по статусам. Читаются и exchanges, и exchanges_archive: из каждой
+    таблицы берётся limit + 1 строк по индексу (<сторона>, status, created_at),
+    и страница собирается слиянием. Архив пропускается, если фильтр статуса
+    заведомо не может в нём встретиться.
+    """
+    descending = order == "desc"
+    rows = _exchange_page_rows(db, Exchange, party, user_id, exchange_status, book_id, descending, cursor, limit)
+    include_archive = not exchange_status or exchange_status in CLOSED_STATUSES
+    if include_archive:
+        rows += _exchange_page_rows(
+            db, ExchangeArchive, party, user_id, exchange_status, book_id, descending, cursor, limit
+        )
+        rows.sort(key=_keyset_key, reverse=descending)
+    exchanges, next_cursor = split_page(rows, limit)
+    attach_exchange_cover_urls(exchanges)
+
+    status_counts = _status_counts(db, Exchange, party, user_id) + _status_counts(db, ExchangeArchive, party, user_id)
+    return {
+        "exchanges": exchanges,
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "status_counts": dict(status_counts),
+    }
+
+@router.get("/my-requests", response_model=PaginatedExchangeResponse)
 def get_my_requests(
+    status_filter: Optional[str] = Query(None, alias="status", pattern=EXCHANGE_STATUS_PATTERN),
+    book_id: Optional[int] = Query(None, ge=1),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    exchanges = db.query(Exchange).filter(Exchange.requester_id == current_user.id).all()
-    attach_exchange_cover_urls(exchanges)
-    return exchanges
+    return list_exchanges_page(
+        db, "requester_id", current_user.id, status_filter, book_id, order, cursor, limit
+    )
 
-@router.get("/my-offers", response_model=list[ExchangeResponse])
+@router.get("/my-offers", response_model=PaginatedExchangeResponse)
 def get_my_offers(
+    status_filter: Optional[str] = Query(None, alias="status", pattern=EXCHANGE_STATUS_PATTERN),
+    book_id: Optional[int] = Query(None, ge=1),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    exchanges = db.query(Exchange).filter(Exchange.owner_id == current_user.id).all()
-    attach_exchange_cover_urls(exchanges)
-    return exchanges
+    return list_exchanges_page(
+        db, "owner_id", current_user.id, status_filter, book_id, order, cursor, limit
+    )
+
+@router.get("/counters", response_model=ExchangeCountersResponse)
+def get_exchange_counters(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Число ожидающих предложений и открытых запросов пользователя для бейджа"""
+    return get_counters(db, current_user.id)
+
+@router.post("/bulk", response_model=ExchangeBulkResponse)
+def bulk_decide_exchanges(
+    payload: ExchangeBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Принять или отклонить несколько предложений одной транзакцией.
+    Результат возвращается по каждому обмену; инициатор получает одно
+    сводное уведомление обо всех своих обменах из пакета.
+    """
+    if not payload.actions:
+        raise HTTPException(status_code=400, detail="Список действий пуст")
+    if len(payload.actions) > MAX_BULK_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Можно обработать не больше {MAX_BULK_SIZE} обменов за раз",
+        )
+    actions = {item.id: item.action.value for item in payload.actions}
+    if len(actions) != len(payload.actions):
+        raise HTTPException(status_code=400, detail="Один обмен указан в пакете несколько раз")
+
+    requested = {item.action for item in payload.actions}
+    if ExchangeBulkAction.ACCEPT in requested and not has_permission(current_user, Permission.EXCHANGES_ACCEPT):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав для принятия обмена"
+        )
+    if ExchangeBulkAction.REJECT in requested and not has_permission(current_user, Permission.EXCHANGES_REJECT):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав для отклонения обмена"
+        )
+
+    results, accepted_snapshots, changed_count = apply_bulk_decisions(
+        db, actions, current_user.id, current_user.role == UserRole.ADMIN
+    )
+    db.commit()
+
+    if changed_count:
+        bump_catalog_version()
+        outbox_dispatcher.wake()
+    for snapshot in accepted_snapshots:
+        record_book_change(snapshot, None)
+    return {"results": results}
 
 @router.put("/{exchange_id}/accept", response_model=ExchangeResponse)
 def accept_exchange(
     exchange_id: int,
-    background_tasks: BackgroundTasks,  
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    socket_manager = Depends(get_socket_manager)
+    current_user: User = Depends(get_current_user)
 ):
     if not has_permission(current_user, Permission.EXCHANGES_ACCEPT):
         raise HTTPException(
@@ -91,7 +242,7 @@ def accept_exchange(
             detail="Недостаточно прав для принятия обмена"
         )
     
-    exchange = db.query(Exchange).filter(Exchange.id == exchange_id).first()
+    exchange = db.query(Exchange).options(joinedload(Exchange.book)).filter(Exchange.id == exchange_id).first()
     if not exchange:
         raise HTTPException(status_code=404, detail="Обмен не найден")
     
@@ -101,28 +252,19 @@ def accept_exchange(
             detail="Недостаточно прав для принятия этого обмена"
         )
     
-    if exchange.status != "pending":
-        raise HTTPException(status_code=400, detail="Этот обмен уже был обработан")
-    
-    exchange.status = "accepted"
-    
-    book = db.query(Book).filter(Book.id == exchange.book_id).first()
-    if book:
-        book.status = "exchanged"
-    
+    old_snapshot = book_snapshot(exchange.book)
+    book_id = transition_pending(db, exchange, "accepted")
+    mark_book_exchanged(db, book_id)
     db.commit()
-    db.refresh(exchange)
-    attach_exchange_cover_url(exchange)
-    background_tasks.add_task(socket_manager.notify_exchange_status_update, exchange.id, "accepted")
-    return exchange
+    record_book_change(old_snapshot, None)
+    outbox_dispatcher.wake()
+    return load_exchange_response(db, exchange.id)
 
 @router.put("/{exchange_id}/reject", response_model=ExchangeResponse)
 def reject_exchange(
     exchange_id: int,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    socket_manager = Depends(get_socket_manager)
+    current_user: User = Depends(get_current_user)
 ):
     
     if not has_permission(current_user, Permission.EXCHANGES_REJECT):
@@ -131,7 +273,7 @@ def reject_exchange(
             detail="Недостаточно прав для отклонения обмена"
         )
     
-    exchange = db.query(Exchange).filter(Exchange.id == exchange_id).first()
+    exchange = db.query(Exchange).options(joinedload(Exchange.book)).filter(Exchange.id == exchange_id).first()
     if not exchange:
         raise HTTPException(status_code=404, detail="Обмен не найден")
     
@@ -141,15 +283,11 @@ def reject_exchange(
             detail="Недостаточно прав для отклонения этого обмена"
         )
     
-    if exchange.status != "pending":
-        raise HTTPException(status_code=400, detail="Этот обмен уже был обработан")
-    
-    exchange.status = "rejected"
+    transition_pending(db, exchange, "rejected")
     db.commit()
-    db.refresh(exchange)
-    attach_exchange_cover_url(exchange)
-    background_tasks.add_task(socket_manager.notify_exchange_status_update, exchange.id, "rejected")
-    return exchange
+    bump_catalog_version()
+    outbox_dispatcher.wake()
+    return load_exchange_response(db, exchange.id)
 
 @router.delete("/{exchange_id}/cancel")
 def cancel_exchange(
@@ -174,9 +312,8 @@ def cancel_exchange(
             detail="Недостаточно прав для отмены этого обмена"
         )
     
-    if exchange.status != "pending":
-        raise HTTPException(status_code=400, detail="Этот обмен уже был обработан")
-    
-    db.delete(exchange)
+    delete_pending(db, exchange.id)
     db.commit()
+    bump_catalog_version()
+    outbox_dispatcher.wake()
     return {"message": "Обмен отменён успешно"}
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from ..dependencies import get_socket_manager
+from ..models import User
+from ..schemas import PresenceResponse
+from ..security import get_current_user
+from ..services.socket_backend import presence_map
+
+router = APIRouter(prefix="/presence", tags=["presence"])
+
+MAX_PRESENCE_IDS = 100
+
+@router.get("", response_model=PresenceResponse)
+async def get_presence(
+    ids: str = Query(..., pattern=r"^\d+(,\d+)*$"),
+    socket_manager=Depends(get_socket_manager),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Начальный статус онлайн для списка пользователей (ids=1,2,3).
+    Дальнейшие изменения приходят подписчикам через subscribe_presence.
+    """
+    user_ids = list(dict.fromkeys(int(user_id) for user_id in ids.split(",")))
+    if len(user_ids) > MAX_PRESENCE_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Можно запросить статус не больше {MAX_PRESENCE_IDS} пользователей за раз",
+        )
+    return {"users": await presence_map(socket_manager.presence, user_ids)}
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 from typing import Optional
-from typing import List
+from typing import List, Dict
 from enum import Enum
 
 class UserRole(str, Enum):
@@ -103,6 +103,29 @@ class PaginatedBookResponse(BaseModel):
     total_pages: int
     current_page: int
     limit: int
+    next_cursor: Optional[str] = None
+
+class BookBatchItem(BaseModel):
+    id: int
+    found: bool
+    book: Optional[BookResponse] = None
+
+class BookBatchResponse(BaseModel):
+    items: List[BookBatchItem]
+    missing_ids: List[int]
+
+class SuggestionResponse(BaseModel):
+    value: str
+    kind: str
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class FacetsResponse(BaseModel):
+    genres: List[FacetCount]
+    conditions: List[FacetCount]
+    total_count: int
 
 class ExchangeBase(BaseModel):
     book_id: int
@@ -122,4 +145,39 @@ class ExchangeResponse(ExchangeBase):
     owner: UserResponse
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class PaginatedExchangeResponse(BaseModel):
+    exchanges: List[ExchangeResponse]
+    limit: int
+    next_cursor: Optional[str] = None
+    # Число обменов пользователя в каждом статусе, без учёта фильтров страницы
+    status_counts: Dict[str, int]
+
+class ExchangeCountersResponse(BaseModel):
+    pending_offers: int
+    open_requests: int
+
+class ExchangeBulkAction(str, Enum):
+    ACCEPT = "accept"
+    REJECT = "reject"
+
+class ExchangeBulkItem(BaseModel):
+    id: int
+    action: ExchangeBulkAction
+
+class ExchangeBulkRequest(BaseModel):
+    actions: List[ExchangeBulkItem]
+
+class ExchangeBulkResult(BaseModel):
+    id: int
+    action: ExchangeBulkAction
+    ok: bool
+    status: Optional[str] = None
+    detail: Optional[str] = None
+
+class ExchangeBulkResponse(BaseModel):
+    results: List[ExchangeBulkResult]
+
+class PresenceResponse(BaseModel):
+    users: Dict[str, bool]
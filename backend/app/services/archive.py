@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+
+from ..database import SessionLocal
+from ..models import Exchange, ExchangeArchive
+from ..settings import get_settings
+from .expiry import older_than
+from .periodic import PeriodicJob
+
+settings = get_settings()
+
+CLOSED_STATUSES = ("accepted", "rejected", "cancelled", "expired")
+ARCHIVED_COLUMNS = ("id", "book_id", "requester_id", "owner_id", "status", "created_at", "updated_at")
+
+
+def archive_closed_batch(db, age: timedelta, batch_size: int, now: Optional[datetime] = None) -> int:
+    """
+    Перенести одну пачку закрытых обменов, не менявшихся дольше age, в exchanges_archive:
+    INSERT ... SELECT и DELETE по одному списку id в одной короткой транзакции.
+    Возвращает число перенесённых строк.
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - age
+    query = (
+        db.query(Exchange.id)
+        .filter(
+            Exchange.status.in_(CLOSED_STATUSES),
+            older_than(db, func.coalesce(Exchange.updated_at, Exchange.created_at), cutoff),
+        )
+        .order_by(Exchange.id)
+        .limit(batch_size)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+    ids = [exchange_id for exchange_id, in query.all()]
+    if not ids:
+        db.rollback()
+        return 0
+
+    db.execute(
+        insert(ExchangeArchive).from_select(
+            ARCHIVED_COLUMNS,
+            select(*(getattr(Exchange, column) for column in ARCHIVED_COLUMNS)).where(Exchange.id.in_(ids)),
+        )
+    )
+    db.execute(delete(Exchange).where(Exchange.id.in_(ids)).execution_options(synchronize_session=False))
+    db.commit()
+    return len(ids)
+
+
+def archive_closed_exchanges(age: timedelta, batch_size: int, now: Optional[datetime] = None) -> int:
+    """Перенести в архив все подходящие обмены пачками; каждая пачка в своей транзакции."""
+    total = 0
+    while True:
+        db = SessionLocal()
+        try:
+            moved = archive_closed_batch(db, age, batch_size, now)
+        finally:
+            db.close()
+        total += moved
+        if moved < batch_size:
+            return total
+
+
+exchange_archiver = PeriodicJob(
+    "Архивация закрытых обменов",
+    interval_seconds=settings.exchange_archive_interval_seconds,
+    run=lambda: archive_closed_exchanges(
+        timedelta(days=settings.exchange_archive_after_days), settings.exchange_archive_batch_size
+    ),
+    enabled=settings.exchange_archive_after_days > 0 and settings.exchange_archive_batch_size > 0,
+)
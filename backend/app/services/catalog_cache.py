@@ -0,0 +1,196 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional
+
+from sqlalchemy import text
+
+from ..settings import get_settings
+from .facets import facet_aggregate
+from .search import extract_terms
+from .suggest import suggestion_index
+
+settings = get_settings()
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш с ограничением времени жизни записей.
+    clear() увеличивает поколение кэша: значение, вычисленное до очистки,
+    не будет сохранено через set(..., generation=...).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+book_count_cache = TTLCache(
+    max_entries=settings.book_count_cache_size,
+    ttl_seconds=settings.book_count_cache_ttl_seconds,
+)
+
+# Сериализованные страницы публичного каталога: ключ включает версию каталога,
+# поэтому страница, собранная до записи, больше никогда не будет выдана
+catalog_page_cache = TTLCache(
+    max_entries=settings.catalog_page_cache_size,
+    ttl_seconds=settings.catalog_page_cache_ttl_seconds,
+)
+
+_catalog_version = 0
+_catalog_version_lock = threading.Lock()
+
+
+class CachedPage:
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+
+
+def catalog_version() -> int:
+    return _catalog_version
+
+
+def clean_filter(value: Optional[str]) -> Optional[str]:
+    """Фильтр каталога без крайних пробелов; пустой фильтр — None."""
+    if value is None:
+        return None
+    return value.strip() or None
+
+
+def book_count_key(
+    scope: str,
+    genre: Optional[str] = None,
+    condition: Optional[str] = None,
+    search: Optional[str] = None,
+) -> tuple:
+    """
+    Ключ набора фильтров. genre и condition входят в ключ ровно в том виде,
+    в каком попадают в запрос (после clean_filter): иначе фильтры, выбирающие
+    разные строки, делили бы одну запись. Поиск нормализуется extract_terms —
+    так же, как его видит apply_search.
+    """
+    return (scope, genre, condition, " ".join(extract_terms(search)) or None)
+
+
+def _estimate_book_rows(db) -> Optional[int]:
+    """Оценка числа строк books из статистики планировщика PostgreSQL."""
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    estimate = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'books'::regclass")
+    ).scalar()
+    # reltuples = -1, пока таблица ни разу не анализировалась
+    if estimate is None or estimate < settings.book_count_estimate_threshold:
+        return None
+    return int(estimate)
+
+
+def count_books(query, cache_key: tuple, allow_estimate: bool = False) -> int:
+    """
+    Число строк запроса с кэшированием по ключу фильтров.
+    allow_estimate разрешает для нефильтрованной выборки взять оценку pg_class.reltuples,
+    если она включена (BOOK_COUNT_ESTIMATE_THRESHOLD > 0) и таблица достаточно велика.
+    """
+    cached = book_count_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    generation = book_count_cache.generation
+    total_count = None
+    if allow_estimate and settings.book_count_estimate_threshold > 0:
+        total_count = _estimate_book_rows(query.session)
+    if total_count is None:
+        total_count = query.count()
+
+    book_count_cache.set(cache_key, total_count, generation=generation)
+    return total_count
+
+
+def invalidate_book_counts() -> None:
+    book_count_cache.clear()
+
+
+def bump_catalog_version() -> int:
+    """
+    Отметить изменение каталога: вызывается из каждого пути записи книг и обменов.
+    Сбрасывает кэш страниц и счётчиков.
+    """
+    global _catalog_version
+    with _catalog_version_lock:
+        _catalog_version += 1
+        version = _catalog_version
+    catalog_page_cache.clear()
+    invalidate_book_counts()
+    return version
+
+
+def catalog_page_key(
+    page: int,
+    limit: int,
+    genre: Optional[str],
+    condition: Optional[str],
+    search: Optional[str],
+    cursor: Optional[str],
+) -> tuple:
+    return (catalog_version(), page, limit, cursor) + book_count_key("catalog", genre, condition, search)
+
+
+class BookSnapshot(NamedTuple):
+    title: str
+    author: str
+    genre: Optional[str]
+    condition: Optional[str]
+
+
+def book_snapshot(book) -> Optional[BookSnapshot]:
+    """Снимок полей книги, видимых в каталоге; None, если книга не в каталоге."""
+    if book is None or book.status != "available":
+        return None
+    return BookSnapshot(book.title, book.author, book.genre, book.condition)
+
+
+def record_book_change(old: Optional[BookSnapshot], new: Optional[BookSnapshot]) -> None:
+    """
+    Учесть закоммиченную запись книги: old — снимок до изменения, new — после.
+    Сбрасывает кэши каталога и инкрементально обновляет производные индексы.
+    """
+    bump_catalog_version()
+    suggestion_index.apply_change(old, new)
+    facet_aggregate.apply_change(old, new)
@@ -0,0 +1,91 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+
+class _PendingBatch:
+    def __init__(self, now: float, flushed: asyncio.Future):
+        self.first_at = now
+        self.last_at = now
+        self.events: list = []
+        self.task: Optional[asyncio.Task] = None
+        # Завершается, когда пачка отправлена (или с исключением отправки)
+        self.flushed = flushed
+
+
+class NotificationCoalescer:
+    """
+    Окно склейки уведомлений: события одного пользователя, пришедшие с паузами
+    короче window_seconds, копятся и уходят одной пачкой. Окно продлевается
+    каждым событием, но пачка отправляется не позже max_delay_seconds после первого.
+
+    flush(user_id, events) получает события в порядке поступления.
+    При window_seconds <= 0 каждое событие отправляется сразу.
+
+    add возвращает future пачки, в которую попало событие: по ней вызывающий
+    узнаёт, что событие действительно ушло клиенту. None — событие уже отправлено.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        max_delay_seconds: float,
+        flush: Callable[[int, list], Awaitable[None]],
+    ):
+        self.window_seconds = window_seconds
+        self.max_delay_seconds = max(max_delay_seconds, window_seconds)
+        self._flush = flush
+        self._batches: dict[int, _PendingBatch] = {}
+
+    async def add(self, user_id: int, event) -> Optional[asyncio.Future]:
+        if self.window_seconds <= 0:
+            await self._flush(user_id, [event])
+            return None
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        batch = self._batches.get(user_id)
+        if batch is None:
+            batch = self._batches[user_id] = _PendingBatch(now, loop.create_future())
+            batch.task = asyncio.create_task(self._flush_when_due(user_id, batch))
+        batch.last_at = now
+        batch.events.append(event)
+        return batch.flushed
+
+    async def _send(self, user_id: int, batch: _PendingBatch) -> None:
+        try:
+            await self._flush(user_id, batch.events)
+        except Exception as e:
+            if not batch.flushed.done():
+                batch.flushed.set_exception(e)
+                # Исключение уже разобрано, если future никто не ждёт
+                batch.flushed.exception()
+            raise
+        if not batch.flushed.done():
+            batch.flushed.set_result(None)
+
+    async def _flush_when_due(self, user_id: int, batch: _PendingBatch) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            due = min(batch.last_at + self.window_seconds, batch.first_at + self.max_delay_seconds)
+            delay = due - loop.time()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        if self._batches.get(user_id) is batch:
+            del self._batches[user_id]
+        try:
+            await self._send(user_id, batch)
+        except Exception as e:
+            print(f"Ошибка отправки пачки уведомлений пользователю {user_id}: {str(e)}")
+
+    async def flush_all(self) -> None:
+        """Немедленно отправить все накопленные пачки (при остановке воркера)."""
+        batches, self._batches = self._batches, {}
+        for user_id, batch in batches.items():
+            if batch.task is not None:
+                batch.task.cancel()
+            await self._send(user_id, batch)
+
+    @property
+    def pending_users(self) -> int:
+        return len(self._batches)
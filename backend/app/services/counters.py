@@ -0,0 +1,60 @@
+from collections import defaultdict
+from typing import Iterable
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..models import ExchangeCounter
+from .outbox import record_event
+
+_DIALECT_INSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+
+def get_counters(db, user_id: int) -> dict:
+    row = db.query(ExchangeCounter).filter(ExchangeCounter.user_id == user_id).first()
+    if row is None:
+        return {"pending_offers": 0, "open_requests": 0}
+    return {"pending_offers": row.pending_offers, "open_requests": row.open_requests}
+
+
+def adjust_pending_counters(db, pairs: Iterable[tuple[int, int]], delta: int) -> None:
+    """
+    Учесть появление (delta=1) или закрытие (delta=-1) ожидающих обменов,
+    заданных парами (owner_id, requester_id).
+
+    Все затронутые пользователи обновляются одним INSERT ... ON CONFLICT DO UPDATE
+    RETURNING в текущей транзакции, и новые значения кладутся в outbox событием
+    exchange_counters, чтобы бейдж обновлялся без запроса списков.
+    """
+    deltas: dict[int, list[int]] = defaultdict(lambda: [0, 0])
+    for owner_id, requester_id in pairs:
+        deltas[owner_id][0] += delta
+        deltas[requester_id][1] += delta
+    if not deltas:
+        return
+
+    insert = _DIALECT_INSERTS[db.get_bind().dialect.name]
+    # Порядок по user_id: параллельные транзакции берут блокировки строк в одном порядке
+    statement = insert(ExchangeCounter).values(
+        [
+            {"user_id": user_id, "pending_offers": offers, "open_requests": requests}
+            for user_id, (offers, requests) in sorted(deltas.items())
+        ]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ExchangeCounter.user_id],
+        set_={
+            "pending_offers": ExchangeCounter.pending_offers + statement.excluded.pending_offers,
+            "open_requests": ExchangeCounter.open_requests + statement.excluded.open_requests,
+            "updated_at": func.now(),
+        },
+    ).returning(ExchangeCounter.user_id, ExchangeCounter.pending_offers, ExchangeCounter.open_requests)
+
+    for user_id, pending_offers, open_requests in db.execute(statement).all():
+        record_event(
+            db,
+            "exchange_counters",
+            user_id,
+            {"pending_offers": pending_offers, "open_requests": open_requests},
+        )
@@ -0,0 +1,234 @@
+from collections import defaultdict
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from ..models import Book, Exchange
+from .catalog_cache import book_snapshot
+from .counters import adjust_pending_counters
+from .outbox import record_event
+
+ACTIVE_EXCHANGE_EXISTS = "Уже есть активное предложение обмена для этой книги"
+BOOK_NOT_AVAILABLE = "Книга недоступна для обмена"
+ALREADY_PROCESSED = "Этот обмен уже был обработан"
+EXCHANGE_NOT_FOUND = "Обмен не найден"
+NOT_EXCHANGE_OWNER = "Недостаточно прав для изменения этого обмена"
+
+BULK_ACTION_STATUSES = {"accept": "accepted", "reject": "rejected"}
+UNKNOWN_BOOK_TITLE = "Неизвестная книга"
+
+ACTIVE_BOOK_INDEX = "uq_exchanges_active_book"
+# SQLite не сообщает имя индекса, только столбцы нарушенного ограничения
+SQLITE_ACTIVE_BOOK_VIOLATION = "UNIQUE constraint failed: exchanges.book_id"
+
+
+def book_title(book) -> str:
+    return book.title if book is not None else UNKNOWN_BOOK_TITLE
+
+
+def status_change(exchange_id: int, title: str, new_status: str) -> dict:
+    """Полезная нагрузка события exchange_status_changed (и элемент сводного события)."""
+    return {"exchange_id": exchange_id, "book_title": title, "status": new_status}
+
+
+def is_active_book_conflict(error: IntegrityError) -> bool:
+    """Нарушен ли именно uq_exchanges_active_book, а не другое ограничение (например, внешний ключ)."""
+    diag = getattr(error.orig, "diag", None)
+    if diag is not None:
+        return getattr(diag, "constraint_name", None) == ACTIVE_BOOK_INDEX
+    return SQLITE_ACTIVE_BOOK_VIOLATION in str(error.orig)
+
+
+def insert_exchange(db, book, requester) -> Exchange:
+    """
+    Создать ожидающий обмен и событие exchange_created для владельца книги.
+    Второй активный обмен на ту же книгу отсекает частичный уникальный индекс
+    uq_exchanges_active_book, а не проверка в Python, поэтому параллельные
+    запросы не могут оба пройти.
+
+    Принятый обмен после архивации выходит из-под этого индекса, поэтому
+    обменянную книгу отсекает проверка статуса: книга становится exchanged
+    в той же транзакции, что и принятие, задолго до архивации.
+    """
+    if book.status != "available":
+        raise HTTPException(status_code=400, detail=BOOK_NOT_AVAILABLE)
+    exchange = Exchange(book_id=book.id, requester_id=requester.id, owner_id=book.owner_id, status="pending")
+    db.add(exchange)
+    try:
+        db.flush()
+        record_event(
+            db,
+            "exchange_created",
+            book.owner_id,
+            {
+                "id": exchange.id,
+                "book_id": book.id,
+                "book_title": book.title,
+                "requester_id": requester.id,
+                "requester_username": requester.username,
+                "created_at": exchange.created_at.isoformat() if exchange.created_at else "",
+            },
+            exchange_id=exchange.id,
+        )
+        adjust_pending_counters(db, [(book.owner_id, requester.id)], 1)
+        db.commit()
+    except IntegrityError as error:
+        db.rollback()
+        if not is_active_book_conflict(error):
+            raise
+        raise HTTPException(status_code=400, detail=ACTIVE_EXCHANGE_EXISTS) from error
+    return exchange
+
+
+def transition_pending(db, exchange: Exchange, new_status: str) -> int:
+    """
+    Атомарно перевести обмен из pending в new_status:
+    UPDATE ... WHERE status = 'pending' RETURNING book_id,
+    и в той же транзакции записать событие для инициатора и обновить счётчики.
+    Из параллельных запросов строку меняет ровно один, остальные получают 400.
+    Возвращает book_id; коммит остаётся за вызывающим.
+    """
+    exchange_id, owner_id, requester_id, book = exchange.id, exchange.owner_id, exchange.requester_id, exchange.book
+    book_id = db.execute(
+        update(Exchange)
+        .where(Exchange.id == exchange_id, Exchange.status == "pending")
+        .values(status=new_status, updated_at=func.now())
+        .returning(Exchange.book_id)
+    ).scalar()
+    if book_id is None:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=ALREADY_PROCESSED)
+    record_event(
+        db,
+        "exchange_status_changed",
+        requester_id,
+        status_change(exchange_id, book_title(book), new_status),
+        exchange_id=exchange_id,
+    )
+    adjust_pending_counters(db, [(owner_id, requester_id)], -1)
+    return book_id
+
+
+def mark_book_exchanged(db, book_id: int) -> None:
+    db.execute(update(Book).where(Book.id == book_id).values(status="exchanged"))
+
+
+def delete_pending(db, exchange_id: int) -> None:
+    """Удалить обмен, только если он всё ещё ожидает ответа, и обновить счётчики."""
+    deleted = db.execute(
+        delete(Exchange)
+        .where(Exchange.id == exchange_id, Exchange.status == "pending")
+        .returning(Exchange.owner_id, Exchange.requester_id)
+    ).all()
+    if not deleted:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=ALREADY_PROCESSED)
+    adjust_pending_counters(db, [tuple(row) for row in deleted], -1)
+
+
+def delete_pending_where(db, *criteria) -> None:
+    """
+    Удалить ожидающие обмены по условию перед удалением книги или пользователя
+    и обновить счётчики: каскадное удаление ORM обошло бы adjust_pending_counters.
+    Коммит остаётся за вызывающим.
+    """
+    deleted = db.execute(
+        delete(Exchange)
+        .where(Exchange.status == "pending", *criteria)
+        .returning(Exchange.owner_id, Exchange.requester_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    adjust_pending_counters(db, [tuple(row) for row in deleted], -1)
+
+
+def apply_bulk_decisions(db, actions: dict[int, str], actor_id: int, is_admin: bool):
+    """
+    Принять или отклонить несколько обменов в одной транзакции.
+    Строки блокируются одним SELECT ... FOR UPDATE, затем каждая группа действий
+    применяется одним условным UPDATE. Коммит остаётся за вызывающим.
+
+    Каждый затронутый инициатор получает одно сводное событие
+    exchange_status_batch со всеми своими изменениями.
+
+    Возвращает (results, accepted_snapshots, changed_count): результат
+    по каждому id в порядке запроса, снимки принятых книг для кэшей каталога
+    и число изменённых обменов.
+    """
+    exchanges = (
+        db.query(Exchange)
+        .options(joinedload(Exchange.book, innerjoin=True))
+        .filter(Exchange.id.in_(list(actions)))
+        .with_for_update(of=Exchange)
+        .all()
+    )
+    by_id = {exchange.id: exchange for exchange in exchanges}
+
+    errors: dict[int, str] = {}
+    pending_by_status: dict[str, list[int]] = defaultdict(list)
+    for exchange_id, action in actions.items():
+        exchange = by_id.get(exchange_id)
+        if exchange is None:
+            errors[exchange_id] = EXCHANGE_NOT_FOUND
+        elif exchange.owner_id != actor_id and not is_admin:
+            errors[exchange_id] = NOT_EXCHANGE_OWNER
+        elif exchange.status != "pending":
+            errors[exchange_id] = ALREADY_PROCESSED
+        else:
+            pending_by_status[BULK_ACTION_STATUSES[action]].append(exchange_id)
+
+    # Снимки берутся до UPDATE: после него книги уже не в каталоге
+    snapshots = {
+        exchange_id: book_snapshot(by_id[exchange_id].book)
+        for exchange_id in pending_by_status.get("accepted", [])
+    }
+
+    changed: set[int] = set()
+    for new_status, ids in pending_by_status.items():
+        changed.update(
+            db.execute(
+                update(Exchange)
+                .where(Exchange.id.in_(ids), Exchange.status == "pending")
+                .values(status=new_status, updated_at=func.now())
+                .returning(Exchange.id)
+            ).scalars()
+        )
+
+    accepted_ids = [exchange_id for exchange_id in pending_by_status.get("accepted", []) if exchange_id in changed]
+    if accepted_ids:
+        db.execute(
+            update(Book)
+            .where(Book.id.in_([by_id[exchange_id].book_id for exchange_id in accepted_ids]))
+            .values(status="exchanged")
+        )
+
+    results = []
+    updates_by_requester: dict[int, list[dict]] = defaultdict(list)
+    for exchange_id, action in actions.items():
+        exchange = by_id.get(exchange_id)
+        if exchange_id in changed:
+            new_status = BULK_ACTION_STATUSES[action]
+            results.append({"id": exchange_id, "action": action, "ok": True, "status": new_status})
+            updates_by_requester[exchange.requester_id].append(
+                status_change(exchange_id, book_title(exchange.book), new_status)
+            )
+        else:
+            results.append(
+                {
+                    "id": exchange_id,
+                    "action": action,
+                    "ok": False,
+                    "status": exchange.status if exchange is not None else None,
+                    "detail": errors.get(exchange_id, ALREADY_PROCESSED),
+                }
+            )
+
+    for requester_id, updates in updates_by_requester.items():
+        record_event(db, "exchange_status_batch", requester_id, {"updates": updates})
+    adjust_pending_counters(
+        db, [(by_id[exchange_id].owner_id, by_id[exchange_id].requester_id) for exchange_id in changed], -1
+    )
+
+    accepted_snapshots = [snapshots[exchange_id] for exchange_id in accepted_ids]
+    return results, accepted_snapshots, len(changed)
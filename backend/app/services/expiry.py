@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import DateTime, func, literal, update
+
+from ..database import SessionLocal
+from ..models import Book, Exchange
+from ..settings import get_settings
+from .counters import adjust_pending_counters
+from .exchanges import UNKNOWN_BOOK_TITLE, status_change
+from .outbox import outbox_dispatcher, record_event
+from .periodic import PeriodicJob
+
+settings = get_settings()
+
+
+def older_than(db, column, cutoff: datetime):
+    if db.get_bind().dialect.name == "sqlite":
+        # Как в pagination.py: в SQLite даты хранятся строками разного формата
+        return func.datetime(column) < func.datetime(literal(cutoff, DateTime()))
+    return column < cutoff
+
+
+def expire_stale_batch(db, ttl: timedelta, batch_size: int, now: Optional[datetime] = None) -> int:
+    """
+    Перевести в expired одну пачку ожидающих обменов старше ttl.
+
+    Кандидаты выбираются по индексу (status, created_at); в PostgreSQL строки,
+    которые прямо сейчас принимают или отклоняют, пропускаются (SKIP LOCKED).
+    Каждая пачка — отдельная короткая транзакция, поэтому блокировки на
+    exchanges не копятся. Счётчики ожидающих обменов обновляются в той же
+    транзакции. Возвращает число истёкших обменов.
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - ttl
+    query = (
+        db.query(Exchange.id, Exchange.owner_id, Exchange.requester_id, Book.title)
+        .outerjoin(Book, Book.id == Exchange.book_id)
+        .filter(Exchange.status == "pending", older_than(db, Exchange.created_at, cutoff))
+        .order_by(Exchange.created_at)
+        .limit(batch_size)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(of=Exchange, skip_locked=True)
+    candidates = {
+        exchange_id: (owner_id, requester_id, title) for exchange_id, owner_id, requester_id, title in query.all()
+    }
+    if not candidates:
+        db.rollback()
+        return 0
+
+    expired_ids = db.execute(
+        update(Exchange)
+        .where(Exchange.id.in_(list(candidates)), Exchange.status == "pending")
+        .values(status="expired", updated_at=func.now())
+        .returning(Exchange.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    for exchange_id in expired_ids:
+        _, requester_id, title = candidates[exchange_id]
+        record_event(
+            db,
+            "exchange_status_changed",
+            requester_id,
+            status_change(exchange_id, title or UNKNOWN_BOOK_TITLE, "expired"),
+            exchange_id=exchange_id,
+        )
+    adjust_pending_counters(db, [candidates[exchange_id][:2] for exchange_id in expired_ids], -1)
+    db.commit()
+    return len(expired_ids)
+
+
+def expire_stale_exchanges(ttl: timedelta, batch_size: int, now: Optional[datetime] = None) -> int:
+    """Истечь все просроченные обмены пачками; каждая пачка в своей сессии и транзакции."""
+    total = 0
+    while True:
+        db = SessionLocal()
+        try:
+            expired = expire_stale_batch(db, ttl, batch_size, now)
+        finally:
+            db.close()
+        total += expired
+        if expired:
+            outbox_dispatcher.wake()
+        if expired < batch_size:
+            return total
+
+
+expiry_sweeper = PeriodicJob(
+    "Истечение ожидающих обменов",
+    interval_seconds=settings.exchange_expiry_interval_seconds,
+    run=lambda: expire_stale_exchanges(
+        timedelta(hours=settings.exchange_pending_ttl_hours), settings.exchange_expiry_batch_size
+    ),
+    enabled=settings.exchange_pending_ttl_hours > 0 and settings.exchange_expiry_batch_size > 0,
+)
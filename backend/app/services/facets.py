@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import func
+
+from ..models import Book
+from ..settings import get_settings
+from .search import apply_search, extract_terms
+
+settings = get_settings()
+
+def _grouped_counts(query) -> Counter:
+    rows = query.with_entities(Book.genre, Book.condition, func.count(Book.id)).group_by(
+        Book.genre, Book.condition
+    )
+    return Counter({(genre, condition): count for genre, condition, count in rows})
+
+
+class FacetAggregate:
+    """
+    Число доступных книг по парам (genre, condition) без фильтров.
+    Поддерживается инкрементально из путей записи книг и периодически
+    пересчитывается одним сгруппированным запросом.
+    """
+
+    def __init__(self, rebuild_interval_seconds: float):
+        self.rebuild_interval_seconds = rebuild_interval_seconds
+        self._counts: Counter = Counter()
+        self._built_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def is_fresh(self) -> bool:
+        return self._built_at is not None and (
+            time.monotonic() - self._built_at < self.rebuild_interval_seconds
+        )
+
+    def rebuild(self, db) -> None:
+        counts = _grouped_counts(db.query(Book).filter(Book.status == "available"))
+        with self._lock:
+            self._counts = counts
+            self._built_at = time.monotonic()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = Counter()
+            self._built_at = None
+
+    def apply_change(self, old, new) -> None:
+        """Учесть запись книги: old/new — снимки доступной книги (genre, condition) или None."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            if old is not None:
+                key = (old.genre, old.condition)
+                self._counts[key] -= 1
+                if self._counts[key] <= 0:
+                    del self._counts[key]
+            if new is not None:
+                self._counts[(new.genre, new.condition)] += 1
+
+    def counts(self) -> Counter:
+        with self._lock:
+            return Counter(self._counts)
+
+
+facet_aggregate = FacetAggregate(rebuild_interval_seconds=settings.facet_aggregate_rebuild_seconds)
+
+
+def _genre_matches(value: Optional[str], genre: Optional[str]) -> bool:
+    # Та же семантика, что у фильтра каталога: ILIKE '%genre%'
+    return not genre or (value is not None and genre.lower() in value.lower())
+
+
+def _condition_matches(value: Optional[str], condition: Optional[str]) -> bool:
+    return not condition or value == condition
+
+
+def _facet_list(counter: Counter) -> list[dict]:
+    items = [(value, count) for value, count in counter.items() if value and count > 0]
+    items.sort(key=lambda item: (-item[1], item[0]))
+    return [{"value": value, "count": count} for value, count in items]
+
+
+def summarize_facets(pairs: Counter, genre: Optional[str], condition: Optional[str]) -> dict:
+    """
+    Свести счётчики пар (genre, condition) в фасеты.
+    Каждый фасет учитывает все фильтры, кроме собственного, чтобы в боковой
+    панели были видны альтернативы уже выбранному значению.
+    """
+    genres: Counter = Counter()
+    conditions: Counter = Counter()
+    total_count = 0
+    for (pair_genre, pair_condition), count in pairs.items():
+        genre_ok = _genre_matches(pair_genre, genre)
+        condition_ok = _condition_matches(pair_condition, condition)
+        if condition_ok:
+            genres[pair_genre] += count
+        if genre_ok:
+            conditions[pair_condition] += count
+        if genre_ok and condition_ok:
+            total_count += count
+
+    return {
+        "genres": _facet_list(genres),
+        "conditions": _facet_list(conditions),
+        "total_count": total_count,
+    }
+
+
+def get_facets(db, genre: Optional[str], condition: Optional[str], search: Optional[str]) -> dict:
+    """Фасеты каталога: без поиска — из агрегата в памяти, с поиском — одним GROUP BY."""
+    if extract_terms(search):
+        query, _ = apply_search(db.query(Book).filter(Book.status == "available"), search)
+        pairs = _grouped_counts(query)
+    else:
+        if not facet_aggregate.is_fresh():
+            facet_aggregate.rebuild(db)
+        pairs = facet_aggregate.counts()
+    return summarize_facets(pairs, genre, condition)
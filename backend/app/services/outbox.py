@@ -0,0 +1,192 @@
+import asyncio
+from typing import NamedTuple, Optional
+
+from sqlalchemy import update
+
+from ..database import SessionLocal
+from ..models import ExchangeEvent
+from ..settings import get_settings
+from .replay import assign_seqs
+
+settings = get_settings()
+
+
+class OutboxEvent(NamedTuple):
+    id: int
+    event_type: str
+    recipient_id: int
+    payload: dict
+
+
+def record_event(db, event_type: str, recipient_id: int, payload: dict, exchange_id: Optional[int] = None) -> None:
+    """
+    Добавить событие в outbox текущей транзакции. Событие станет видно
+    диспетчеру только вместе с коммитом изменения, которое его породило.
+    """
+    db.add(
+        ExchangeEvent(
+            event_type=event_type,
+            exchange_id=exchange_id,
+            recipient_id=recipient_id,
+            payload=payload,
+        )
+    )
+
+
+def _claim_batch(db, limit: int, max_attempts: int) -> list[OutboxEvent]:
+    query = (
+        db.query(ExchangeEvent.id, ExchangeEvent.event_type, ExchangeEvent.recipient_id, ExchangeEvent.payload)
+        .filter(ExchangeEvent.attempts < max_attempts)
+        .order_by(ExchangeEvent.id)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        # Несколько воркеров разбирают outbox параллельно, не мешая друг другу
+        query = query.with_for_update(skip_locked=True)
+    return [OutboxEvent(*row) for row in query.limit(limit).all()]
+
+
+def _acknowledge(db, event_ids: list[int]) -> None:
+    db.query(ExchangeEvent).filter(ExchangeEvent.id.in_(event_ids)).delete(synchronize_session=False)
+    db.commit()
+
+
+def _record_failure(db, event_ids: list[int], max_attempts: int) -> list[int]:
+    """Откатить пачку, засчитать попытку событиям event_ids и вернуть id отложенных."""
+    db.rollback()
+    rows = db.execute(
+        update(ExchangeEvent)
+        .where(ExchangeEvent.id.in_(event_ids))
+        .values(attempts=ExchangeEvent.attempts + 1)
+        .returning(ExchangeEvent.id, ExchangeEvent.attempts)
+    ).all()
+    db.commit()
+    parked = [event_id for event_id, attempts in rows if attempts >= max_attempts]
+    for event_id in parked:
+        print(f"Событие outbox {event_id} отложено после {max_attempts} неудачных попыток доставки")
+    return parked
+
+
+class OutboxDispatcher:
+    """
+    Долгоживущая задача event loop, которая разбирает exchange_events пачками
+    и рассылает события через SocketManager.deliver_event.
+
+    Доставка «как минимум один раз»: пачка удаляется из outbox одним запросом
+    только после отправки — когда окна склейки SocketManager отправили все её
+    события, — поэтому при падении воркера она будет отправлена снова.
+    В той же транзакции дельта-события получают номера и попадают в буфер повтора.
+    Синхронный SQL выполняется в пуле потоков и не блокирует event loop.
+
+    Неудачная попытка засчитывается событию, на котором упала отправка, а если
+    виновника не определить (ошибка номеров или БД) — всей пачке; такие события
+    затем разбираются по одному. Событие, не доставленное max_attempts раз,
+    остаётся в exchange_events, но больше не выбирается и не блокирует остальных;
+    вернуть его в очередь можно, обнулив attempts.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval_seconds: float,
+        replay_buffer_size: int = 200,
+        max_attempts: int = 10,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval_seconds = poll_interval_seconds
+        self.replay_buffer_size = replay_buffer_size
+        self.max_attempts = max_attempts
+        # События из пачек, упавших без известного виновника: их отправляем по одному
+        self._suspects: set[int] = set()
+        self._socket_manager = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def start(self, socket_manager) -> None:
+        self._socket_manager = socket_manager
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        self._loop = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def wake(self) -> None:
+        """Разбудить диспетчер после коммита; безопасно вызывать из потоков обработчиков."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def drain(self) -> int:
+        """Отправить одну пачку событий; возвращает число отправленных."""
+        async with self._lock:
+            db = SessionLocal()
+            failed_ids: list[int] = []
+            try:
+                limit = 1 if self._suspects else self.batch_size
+                events = await asyncio.to_thread(_claim_batch, db, limit, self.max_attempts)
+                if not events:
+                    self._suspects.clear()
+                    return 0
+                if self._suspects and events[0].id > max(self._suspects):
+                    # Подозрительные события уже разобрал другой воркер
+                    self._suspects.clear()
+                event_ids = [event.id for event in events]
+                failed_ids = event_ids
+                seqs = await asyncio.to_thread(assign_seqs, db, events, self.replay_buffer_size)
+                pending = []
+                for event in events:
+                    failed_ids = [event.id]
+                    flushed = await self._socket_manager.deliver_event(
+                        event.event_type, event.recipient_id, event.payload, seqs.get(event.id)
+                    )
+                    if flushed is not None:
+                        pending.append((event.id, flushed))
+                # Подтверждаем только то, что окно склейки уже отправило клиентам
+                for event_id, flushed in pending:
+                    failed_ids = [event_id]
+                    await flushed
+                failed_ids = event_ids
+                await asyncio.to_thread(_acknowledge, db, event_ids)
+                self._suspects.difference_update(event_ids)
+                return len(events)
+            except Exception:
+                if failed_ids:
+                    parked = await asyncio.to_thread(_record_failure, db, failed_ids, self.max_attempts)
+                    if len(failed_ids) > 1:
+                        self._suspects.update(failed_ids)
+                    self._suspects.difference_update(parked)
+                raise
+            finally:
+                await asyncio.to_thread(db.close)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                while await self.drain() >= self.batch_size or self._suspects:
+                    pass
+            except Exception as e:
+                print(f"Ошибка рассылки событий обменов: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+outbox_dispatcher = OutboxDispatcher(
+    batch_size=settings.outbox_batch_size,
+    poll_interval_seconds=settings.outbox_poll_interval_seconds,
+    replay_buffer_size=settings.exchange_replay_buffer_size,
+    max_attempts=settings.outbox_max_attempts,
+)
@@ -0,0 +1,81 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, and_, func, literal, or_, tuple_
+
+
+def encode_cursor(created_at: datetime, item_id: int) -> str:
+    """Закодировать позицию (created_at, id) в непрозрачный курсор."""
+    raw = json.dumps([created_at.isoformat(), item_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="Неверный курсор пагинации")
+
+
+def _is_sqlite(query) -> bool:
+    return query.session.get_bind().dialect.name == "sqlite"
+
+
+def _created_key(query, created_at_column):
+    if _is_sqlite(query):
+        # SQLite хранит даты строками в разных форматах (с микросекундами и без),
+        # поэтому сравниваем и сортируем по нормализованному значению
+        return func.datetime(created_at_column)
+    return created_at_column
+
+
+def order_by_keyset(query, created_at_column, id_column, descending: bool = True):
+    """Упорядочить запрос по (created_at, id): по умолчанию от новых к старым."""
+    created_key = _created_key(query, created_at_column)
+    if descending:
+        return query.order_by(created_key.desc(), id_column.desc())
+    return query.order_by(created_key.asc(), id_column.asc())
+
+
+def seek_after_cursor(query, created_at_column, id_column, cursor: str | None, descending: bool = True):
+    """Оставить только строки, идущие после позиции курсора (без OFFSET)."""
+    if not cursor:
+        return query
+
+    created_at, last_id = decode_cursor(cursor)
+    if _is_sqlite(query):
+        created_key = func.datetime(created_at_column)
+        cursor_key = func.datetime(literal(created_at, DateTime()))
+        if descending:
+            return query.filter(
+                or_(
+                    created_key < cursor_key,
+                    and_(created_key == cursor_key, id_column < last_id),
+                )
+            )
+        return query.filter(
+            or_(
+                created_key > cursor_key,
+                and_(created_key == cursor_key, id_column > last_id),
+            )
+        )
+    if descending:
+        return query.filter(tuple_(created_at_column, id_column) < tuple_(created_at, last_id))
+    return query.filter(tuple_(created_at_column, id_column) > tuple_(created_at, last_id))
+
+
+def split_page(rows: list, limit: int):
+    """
+    Отделить страницу от «лишней» строки, запрошенной через limit + 1.
+    Возвращает (items, next_cursor); next_cursor = None на последней странице.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    items = rows[:limit]
+    last = items[-1]
+    return items, encode_cursor(last.created_at, last.id)
@@ -0,0 +1,42 @@
+import asyncio
+from typing import Callable, Optional
+
+
+class PeriodicJob:
+    """
+    Фоновая задача event loop: раз в interval_seconds выполняет синхронную
+    функцию обслуживания БД в пуле потоков, не блокируя обработку запросов.
+    """
+
+    def __init__(self, name: str, interval_seconds: float, run: Callable[[], int], enabled: bool = True):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.run = run
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.enabled:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def run_once(self) -> int:
+        return await asyncio.to_thread(self.run)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                processed = await self.run_once()
+                if processed:
+                    print(f"{self.name}: обработано строк {processed}")
+            except Exception as e:
+                print(f"Ошибка задачи «{self.name}»: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
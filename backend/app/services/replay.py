@@ -0,0 +1,81 @@
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import and_, delete, insert, or_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..models import ExchangeReplay, ExchangeStream
+
+_DIALECT_INSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+# Дельты списка обменов получают номер. Счётчики — абсолютные значения: в буфер повтора
+# они не пишутся, после переподключения resume отправляет текущие счётчики из БД
+SEQUENCED_EVENTS = frozenset({"exchange_created", "exchange_status_changed", "exchange_status_batch"})
+
+
+def assign_seqs(db, events, buffer_size: int) -> dict[int, int]:
+    """
+    Выдать дельта-событиям пачки outbox монотонные номера получателей
+    и записать их в буфер повтора, оставив последние buffer_size событий на пользователя.
+
+    Номера всех получателей выделяются одним INSERT ... ON CONFLICT DO UPDATE
+    RETURNING, буфер пополняется одним INSERT и подрезается одним DELETE.
+    Возвращает {id события outbox: seq}; коммит остаётся за вызывающим.
+    """
+    by_recipient = defaultdict(list)
+    for event in events:
+        if event.event_type in SEQUENCED_EVENTS:
+            by_recipient[event.recipient_id].append(event)
+    if not by_recipient:
+        return {}
+
+    upsert = _DIALECT_INSERTS[db.get_bind().dialect.name]
+    statement = upsert(ExchangeStream).values(
+        [
+            {"user_id": user_id, "last_seq": len(recipient_events)}
+            for user_id, recipient_events in sorted(by_recipient.items())
+        ]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ExchangeStream.user_id],
+        set_={"last_seq": ExchangeStream.last_seq + statement.excluded.last_seq},
+    ).returning(ExchangeStream.user_id, ExchangeStream.last_seq)
+
+    seqs: dict[int, int] = {}
+    rows = []
+    evicted = []
+    for user_id, last_seq in db.execute(statement).all():
+        recipient_events = by_recipient[user_id]
+        first_seq = last_seq - len(recipient_events) + 1
+        for seq, event in enumerate(recipient_events, start=first_seq):
+            seqs[event.id] = seq
+            rows.append({"user_id": user_id, "seq": seq, "event_type": event.event_type, "payload": event.payload})
+        evicted.append(and_(ExchangeReplay.user_id == user_id, ExchangeReplay.seq <= last_seq - buffer_size))
+
+    db.execute(insert(ExchangeReplay), rows)
+    db.execute(delete(ExchangeReplay).where(or_(*evicted)))
+    return seqs
+
+
+def missed_events(db, user_id: int, last_seq: Optional[int]) -> tuple[int, Optional[list[tuple[int, str, dict]]]]:
+    """
+    Текущий номер пользователя и события (seq, event_type, payload) после last_seq.
+    Вместо списка возвращается None, когда нужен полный снимок: клиент не прислал
+    last_seq, отстал больше чем на буфер или прислал номер, которого сервер не выдавал.
+    """
+    current = db.query(ExchangeStream.last_seq).filter(ExchangeStream.user_id == user_id).scalar() or 0
+    if last_seq is None or last_seq > current:
+        return current, None
+    if last_seq == current:
+        return current, []
+
+    rows = (
+        db.query(ExchangeReplay.seq, ExchangeReplay.event_type, ExchangeReplay.payload)
+        .filter(ExchangeReplay.user_id == user_id, ExchangeReplay.seq > last_seq)
+        .order_by(ExchangeReplay.seq)
+        .all()
+    )
+    if not rows or rows[0].seq != last_seq + 1:
+        return current, None
+    return current, [tuple(row) for row in rows]
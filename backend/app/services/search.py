@@ -0,0 +1,75 @@
+import re
+
+from sqlalchemy import func, literal_column, or_, select, text
+
+from ..models import Book
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+MAX_SEARCH_TERMS = 8
+
+
+def extract_terms(search: str | None) -> list[str]:
+    """Разбить поисковую строку на слова, отбросив пунктуацию и операторы FTS."""
+    if not search:
+        return []
+    return [term.lower() for term in _TERM_RE.findall(search)][:MAX_SEARCH_TERMS]
+
+
+def _dialect_name(query) -> str:
+    return query.session.get_bind().dialect.name
+
+
+def _postgres_search(query, terms: list[str]):
+    tsquery_text = " & ".join(f"{term}:*" for term in terms)
+    tsquery = func.to_tsquery("russian", tsquery_text).op("||")(
+        func.to_tsquery("english", tsquery_text)
+    )
+    search_vector = literal_column("books.search_vector")
+    query = query.filter(search_vector.op("@@")(tsquery))
+    return query, func.ts_rank_cd(search_vector, tsquery).desc()
+
+
+def _sqlite_search(query, terms: list[str]):
+    match_expression = " ".join(f'"{term}"*' for term in terms)
+    matches = (
+        select(
+            literal_column("rowid").label("book_id"),
+            literal_column("bm25(books_fts, 10.0, 5.0, 1.0)").label("rank"),
+        )
+        .select_from(text("books_fts"))
+        .where(text("books_fts MATCH :match_expression").bindparams(match_expression=match_expression))
+        .subquery("books_fts_matches")
+    )
+    query = query.join(matches, matches.c.book_id == Book.id)
+    # bm25 в SQLite возвращает отрицательные значения: чем меньше, тем релевантнее
+    return query, matches.c.rank.asc()
+
+
+def _fallback_search(query, terms: list[str]):
+    for term in terms:
+        query = query.filter(
+            or_(
+                Book.title.ilike(f"%{term}%"),
+                Book.author.ilike(f"%{term}%"),
+                Book.description.ilike(f"%{term}%"),
+            )
+        )
+    return query, None
+
+
+def apply_search(query, search: str | None):
+    """
+    Отфильтровать запрос по книгам полнотекстовым поиском.
+    Возвращает (query, order_by) — выражение сортировки по релевантности или None.
+    Каждое слово ищется по префиксу, слова объединяются через И.
+    """
+    terms = extract_terms(search)
+    if not terms:
+        return query, None
+
+    dialect = _dialect_name(query)
+    if dialect == "postgresql":
+        return _postgres_search(query, terms)
+    if dialect == "sqlite":
+        return _sqlite_search(query, terms)
+    return _fallback_search(query, terms)
@@ -0,0 +1,61 @@
+from typing import Dict, Optional, Set
+
+
+class SessionRegistry:
+    """
+    Учёт сокет-сессий пользователей: прямое отображение user_id -> {sid}
+    и обратный индекс sid -> user_id. Подключение и отключение выполняются
+    за O(1) независимо от числа пользователей онлайн.
+    """
+
+    def __init__(self):
+        self._sessions_by_user: Dict[int, Set[str]] = {}
+        self._user_by_sid: Dict[str, int] = {}
+
+    def add(self, sid: str, user_id: int) -> bool:
+        """Привязать сессию к пользователю; True, если это его первая сессия."""
+        previous = self._user_by_sid.get(sid)
+        if previous is not None and previous != user_id:
+            self.remove(sid)
+        self._user_by_sid[sid] = user_id
+        sessions = self._sessions_by_user.setdefault(user_id, set())
+        sessions.add(sid)
+        return len(sessions) == 1 and previous != user_id
+
+    def remove(self, sid: str) -> tuple[Optional[int], bool]:
+        """
+        Отвязать сессию. Возвращает (user_id, last): владельца сессии
+        (None для неизвестного sid) и признак того, что это была его последняя сессия.
+        """
+        user_id = self._user_by_sid.pop(sid, None)
+        if user_id is None:
+            return None, False
+        sessions = self._sessions_by_user.get(user_id)
+        if sessions is None:
+            return user_id, True
+        sessions.discard(sid)
+        if sessions:
+            return user_id, False
+        del self._sessions_by_user[user_id]
+        return user_id, True
+
+    def user_of(self, sid: str) -> Optional[int]:
+        return self._user_by_sid.get(sid)
+
+    def bindings(self) -> list[tuple[str, int]]:
+        """Все пары (sid, user_id) этого процесса."""
+        return list(self._user_by_sid.items())
+
+    def sessions_of(self, user_id: int) -> Set[str]:
+        return self._sessions_by_user.get(user_id, set())
+
+    def is_online(self, user_id: int) -> bool:
+        return user_id in self._sessions_by_user
+
+    @property
+    def online_count(self) -> int:
+        return len(self._sessions_by_user)
+
+    @property
+    def session_count(self) -> int:
+        return len(self._user_by_sid)
@@ -0,0 +1,172 @@
+import threading
+from datetime import datetime, timezone
+from typing import Iterator, NamedTuple, Optional
+from xml.sax.saxutils import escape
+
+from sqlalchemy import func
+
+from ..database import SessionLocal
+from ..models import Book
+from ..settings import get_settings
+
+settings = get_settings()
+
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+STATIC_PAGES = [("", "1.0"), ("/catalog", "0.9")]
+ROWS_PER_CHUNK = 500
+
+
+class ShardState(NamedTuple):
+    """Отпечаток шарда: меняется при добавлении, удалении или правке любой книги шарда."""
+    url_count: int
+    id_sum: int
+    lastmod: Optional[datetime]
+
+
+_rendered_shards: dict[int, tuple[ShardState, bytes]] = {}
+_rendered_lock = threading.Lock()
+
+
+def _w3c_datetime(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.isoformat()
+
+
+def _site_url(path: str) -> str:
+    return escape(f"{settings.public_site_url}{path}")
+
+
+def _shard_number():
+    # Шард — фиксированный диапазон id: в нём заведомо не больше shard_size адресов
+    return (Book.id - 1) // settings.sitemap_shard_size
+
+
+def _available_books(db):
+    return db.query(Book).filter(Book.status == "available")
+
+
+def shard_states(db) -> dict[int, ShardState]:
+    """Отпечатки всех непустых шардов одним агрегирующим запросом."""
+    shard = _shard_number().label("shard")
+    rows = (
+        _available_books(db)
+        .with_entities(
+            shard,
+            func.count(Book.id),
+            func.sum(Book.id),
+            func.max(func.coalesce(Book.updated_at, Book.created_at)),
+        )
+        .group_by(shard)
+        .order_by(shard)
+        .all()
+    )
+    return {number: ShardState(count, id_sum, lastmod) for number, count, id_sum, lastmod in rows}
+
+
+def _shard_bounds(shard: int) -> tuple[int, int]:
+    first_id = shard * settings.sitemap_shard_size + 1
+    return first_id, first_id + settings.sitemap_shard_size - 1
+
+
+def shard_state(db, shard: int) -> Optional[ShardState]:
+    first_id, last_id = _shard_bounds(shard)
+    count, id_sum, lastmod = (
+        _available_books(db)
+        .filter(Book.id.between(first_id, last_id))
+        .with_entities(
+            func.count(Book.id),
+            func.sum(Book.id),
+            func.max(func.coalesce(Book.updated_at, Book.created_at)),
+        )
+        .one()
+    )
+    if not count:
+        return None
+    return ShardState(count, id_sum, lastmod)
+
+
+def render_index(states: dict[int, ShardState]) -> str:
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<sitemapindex xmlns="{SITEMAP_NAMESPACE}">',
+        f"<sitemap><loc>{_site_url('/sitemap-pages.xml')}</loc></sitemap>",
+    ]
+    for shard, state in states.items():
+        lastmod = _w3c_datetime(state.lastmod)
+        parts.append(
+            f"<sitemap><loc>{_site_url(f'/sitemap-books-{shard}.xml')}</loc>"
+            + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "")
+            + "</sitemap>"
+        )
+    parts.append("</sitemapindex>")
+    return "".join(parts)
+
+
+def render_static_pages() -> str:
+    urls = "".join(
+        f"<url><loc>{_site_url(path)}</loc><priority>{priority}</priority></url>"
+        for path, priority in STATIC_PAGES
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{SITEMAP_NAMESPACE}">{urls}</urlset>'
+
+
+def cached_shard(shard: int, state: ShardState) -> Optional[bytes]:
+    with _rendered_lock:
+        cached = _rendered_shards.get(shard)
+    if cached is not None and cached[0] == state:
+        return cached[1]
+    return None
+
+
+def stream_shard(shard: int, state: ShardState) -> Iterator[bytes]:
+    """
+    Потоково сформировать шард: строки читаются через yield_per, XML отдаётся
+    кусками, а готовый результат кэшируется до изменения отпечатка шарда.
+    """
+    first_id, last_id = _shard_bounds(shard)
+    chunks: list[bytes] = []
+
+    def emit(text: str) -> bytes:
+        chunk = text.encode("utf-8")
+        chunks.append(chunk)
+        return chunk
+
+    yield emit(f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{SITEMAP_NAMESPACE}">')
+
+    db = SessionLocal()
+    try:
+        rows = (
+            _available_books(db)
+            .filter(Book.id.between(first_id, last_id))
+            .with_entities(Book.id, Book.updated_at, Book.created_at)
+            .order_by(Book.id)
+            .yield_per(ROWS_PER_CHUNK)
+        )
+        buffer = []
+        for book_id, updated_at, created_at in rows:
+            lastmod = _w3c_datetime(updated_at or created_at)
+            buffer.append(
+                f"<url><loc>{_site_url(f'/book/{book_id}')}</loc>"
+                + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "")
+                + "<priority>0.8</priority></url>"
+            )
+            if len(buffer) >= ROWS_PER_CHUNK:
+                yield emit("".join(buffer))
+                buffer = []
+        if buffer:
+            yield emit("".join(buffer))
+    finally:
+        db.close()
+
+    yield emit("</urlset>")
+
+    with _rendered_lock:
+        _rendered_shards[shard] = (state, b"".join(chunks))
+
+
+def clear_rendered_shards() -> None:
+    with _rendered_lock:
+        _rendered_shards.clear()
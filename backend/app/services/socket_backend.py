@@ -0,0 +1,213 @@
+import asyncio
+import pickle
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+PRESENCE_KEY = "presence:sessions"
+PRESENCE_WORKERS_KEY = "presence:workers"
+PRESENCE_WORKER_PREFIX = "presence:worker:"
+
+# Сессия учитывается и в хэше воркера, и в общем хэше; возвращает общий счётчик
+_SESSION_OPENED_SCRIPT = """
+redis.call('HINCRBY', KEYS[2], ARGV[1], 1)
+return redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+"""
+
+# Уменьшить счётчики сессий и удалить пользователя из хэшей одним атомарным шагом:
+# иначе воркер может удалить поле, которое другой воркер только что увеличил.
+# Если вклад воркера уже снят как вклад умершего, общий счётчик не трогаем
+_SESSION_CLOSED_SCRIPT = """
+local mine = redis.call('HINCRBY', KEYS[2], ARGV[1], -1)
+if mine <= 0 then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+end
+if mine < 0 then
+    return 0
+end
+local left = redis.call('HINCRBY', KEYS[1], ARGV[1], -1)
+if left <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# Отметить живой воркер и снять из общего хэша вклад воркеров без пульса дольше TTL;
+# возвращает пользователей, у которых после этого не осталось сессий
+_HEARTBEAT_SCRIPT = """
+redis.call('ZADD', KEYS[2], ARGV[1], ARGV[2])
+local offline = {}
+for _, worker in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[3])) do
+    local key = ARGV[4] .. worker
+    local sessions = redis.call('HGETALL', key)
+    for i = 1, #sessions, 2 do
+        local left = redis.call('HINCRBY', KEYS[1], sessions[i], -tonumber(sessions[i + 1]))
+        if left <= 0 then
+            redis.call('HDEL', KEYS[1], sessions[i])
+            table.insert(offline, sessions[i])
+        end
+    end
+    redis.call('DEL', key)
+    redis.call('ZREM', KEYS[2], worker)
+end
+return offline
+"""
+
+
+class MemoryPubSubManager(AsyncPubSubManager):
+    """
+    Очередь сообщений Socket.IO внутри одного процесса: несколько AsyncServer
+    с одним каналом обмениваются emit так же, как воркеры через Redis.
+    Используется в тестах и локальной разработке (SOCKETIO_MESSAGE_QUEUE=memory://).
+    """
+
+    name = "memory"
+    _subscribers: dict[str, list[asyncio.Queue]] = {}
+
+    def __init__(self, channel: str = "socketio", write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        if not write_only:
+            self._subscribers.setdefault(channel, []).append(self._queue)
+
+    def unsubscribe(self) -> None:
+        subscribers = self._subscribers.get(self.channel, [])
+        if self._queue in subscribers:
+            subscribers.remove(self._queue)
+
+    async def _publish(self, data):
+        # Сообщение сериализуется, как при отправке по сети
+        message = pickle.dumps(data)
+        for queue in list(self._subscribers.get(self.channel, [])):
+            queue.put_nowait(message)
+
+    async def _listen(self):
+        while True:
+            yield await self._queue.get()
+
+
+class LocalPresence:
+    """Число сокет-сессий каждого пользователя в памяти процесса."""
+
+    def __init__(self):
+        self._sessions: Counter = Counter()
+
+    async def session_opened(self, user_id: int) -> bool:
+        """Учесть новую сессию; True, если это первая сессия пользователя."""
+        self._sessions[user_id] += 1
+        return self._sessions[user_id] == 1
+
+    async def session_closed(self, user_id: int) -> bool:
+        """Учесть закрытие сессии; True, если у пользователя не осталось сессий."""
+        self._sessions[user_id] -= 1
+        if self._sessions[user_id] > 0:
+            return False
+        del self._sessions[user_id]
+        return True
+
+    async def online_count(self) -> int:
+        return len(self._sessions)
+
+    async def online_among(self, user_ids: list[int]) -> set[int]:
+        return {user_id for user_id in user_ids if user_id in self._sessions}
+
+    async def heartbeat(self) -> list[int]:
+        """В одном процессе других воркеров нет: снимать нечего."""
+        return []
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisPresence:
+    """
+    Присутствие, общее для всех воркеров: хэш presence:sessions с числом
+    открытых сессий на пользователя во всех процессах и хэш presence:worker:{id}
+    с вкладом каждого воркера.
+
+    Воркер раз в SOCKET_PRESENCE_HEARTBEAT_SECONDS обновляет свою отметку
+    в presence:workers и заодно снимает вклад воркеров, молчащих дольше
+    ttl_seconds: после аварийного завершения (OOM, SIGKILL) их пользователи
+    уходят в офлайн, а не остаются онлайн навсегда. Воркер, сам простоявший
+    дольше TTL, теряет учёт уже открытых сессий до их переподключения.
+    """
+
+    def __init__(self, redis, ttl_seconds: float = 30):
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self.worker_id = uuid.uuid4().hex
+        self._worker_key = PRESENCE_WORKER_PREFIX + self.worker_id
+        self._session_opened = redis.register_script(_SESSION_OPENED_SCRIPT)
+        self._session_closed = redis.register_script(_SESSION_CLOSED_SCRIPT)
+        self._heartbeat = redis.register_script(_HEARTBEAT_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str, ttl_seconds: float = 30) -> "RedisPresence":
+        from redis import asyncio as aioredis
+
+        return cls(aioredis.Redis.from_url(url), ttl_seconds)
+
+    async def session_opened(self, user_id: int) -> bool:
+        keys = [PRESENCE_KEY, self._worker_key]
+        return await self._session_opened(keys=keys, args=[str(user_id)]) == 1
+
+    async def session_closed(self, user_id: int) -> bool:
+        keys = [PRESENCE_KEY, self._worker_key]
+        return bool(await self._session_closed(keys=keys, args=[str(user_id)]))
+
+    async def heartbeat(self) -> list[int]:
+        """Продлить отметку воркера и вернуть пользователей, ушедших в офлайн вместе с умершими воркерами."""
+        now = time.time()
+        offline = await self._heartbeat(
+            keys=[PRESENCE_KEY, PRESENCE_WORKERS_KEY],
+            args=[now, self.worker_id, now - self.ttl_seconds, PRESENCE_WORKER_PREFIX],
+        )
+        return [int(user_id) for user_id in offline]
+
+    async def close(self) -> None:
+        """Убрать отметку воркера после того, как он снял свои сессии."""
+        await self.redis.zrem(PRESENCE_WORKERS_KEY, self.worker_id)
+        await self.redis.delete(self._worker_key)
+
+    async def online_count(self) -> int:
+        return await self.redis.hlen(PRESENCE_KEY)
+
+    async def online_among(self, user_ids: list[int]) -> set[int]:
+        if not user_ids:
+            return set()
+        counts = await self.redis.hmget(PRESENCE_KEY, [str(user_id) for user_id in user_ids])
+        return {user_id for user_id, count in zip(user_ids, counts) if count is not None}
+
+
+async def presence_map(presence, user_ids: list[int]) -> dict[str, bool]:
+    """Статус онлайн пользователей по всем воркерам: {"id": true|false}"""
+    online = await presence.online_among(user_ids)
+    return {str(user_id): user_id in online for user_id in user_ids}
+
+
+_memory_presence = LocalPresence()
+
+
+def create_socket_backend(
+    message_queue: str, presence_ttl_seconds: float = 30
+) -> tuple[Optional[socketio.AsyncManager], object]:
+    """
+    Менеджер клиентов Socket.IO и хранилище присутствия по SOCKETIO_MESSAGE_QUEUE:
+    пусто — один процесс, memory:// — несколько серверов в одном процессе,
+    redis:// или rediss:// — pub/sub и общее присутствие в Redis для N воркеров.
+    """
+    if not message_queue:
+        return None, LocalPresence()
+    if message_queue == "memory://":
+        return MemoryPubSubManager(), _memory_presence
+    if message_queue.startswith(("redis://", "rediss://")):
+        return (
+            socketio.AsyncRedisManager(message_queue),
+            RedisPresence.from_url(message_queue, presence_ttl_seconds),
+        )
+    raise ValueError(f"Неподдерживаемая очередь сообщений Socket.IO: {message_queue}")
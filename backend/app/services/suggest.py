@@ -0,0 +1,233 @@
+import re
+import threading
+import time
+from collections import deque
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+
+from ..models import Book
+from ..settings import get_settings
+
+settings = get_settings()
+
+# Порог сходства как у оператора % в pg_trgm (pg_trgm.similarity_threshold по умолчанию)
+FUZZY_SIMILARITY_THRESHOLD = 0.3
+
+
+def normalize_text(value: str) -> str:
+    return " ".join(value.lower().replace("ё", "е").split())
+
+
+def trigrams(value: str) -> frozenset[str]:
+    """Триграммы по правилам pg_trgm: каждое слово дополняется двумя пробелами слева и одним справа."""
+    result = set()
+    for word in re.findall(r"\w+", normalize_text(value)):
+        padded = f"  {word} "
+        result.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return frozenset(result)
+
+
+def similarity(left: frozenset[str], right: frozenset[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class _TrieNode:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children: dict[str, "_TrieNode"] = {}
+        # (kind, value) -> сколько доступных книг дают эту подсказку через данный ключ
+        self.entries: dict[tuple[str, str], int] = {}
+
+
+class SuggestionIndex:
+    """
+    Префиксное дерево названий и авторов доступных книг.
+    Каждое значение индексируется с начала каждого слова, поэтому «толс»
+    находит «Лев Толстой». Если префиксных совпадений меньше limit, выдача
+    добирается значениями, похожими на запрос по триграммам, как оператор %
+    в PostgreSQL: опечатка «гари потер» всё равно находит «Гарри Поттер».
+    Дерево строится лениво из БД, дальше поддерживается
+    инкрементально из путей записи книг и периодически перестраивается целиком,
+    чтобы подхватить записи других воркеров.
+    """
+
+    def __init__(self, rebuild_interval_seconds: float):
+        self.rebuild_interval_seconds = rebuild_interval_seconds
+        self._root = _TrieNode()
+        # (kind, value) -> [число доступных книг, триграммы значения] для нечёткого добора
+        self._values: dict[tuple[str, str], list] = {}
+        self._built_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _keys(value: str) -> Iterable[str]:
+        words = normalize_text(value).split(" ")
+        for index in range(len(words)):
+            yield " ".join(words[index:])
+
+    def _insert(self, kind: str, value: str) -> None:
+        entry = self._values.setdefault((kind, value), [0, trigrams(value)])
+        entry[0] += 1
+        for key in self._keys(value):
+            node = self._root
+            for char in key:
+                node = node.children.setdefault(char, _TrieNode())
+            node.entries[(kind, value)] = node.entries.get((kind, value), 0) + 1
+
+    def _remove(self, kind: str, value: str) -> None:
+        entry = self._values.get((kind, value))
+        if entry is not None:
+            entry[0] -= 1
+            if entry[0] <= 0:
+                del self._values[(kind, value)]
+        for key in self._keys(value):
+            path = [self._root]
+            for char in key:
+                child = path[-1].children.get(char)
+                if child is None:
+                    break
+                path.append(child)
+            else:
+                node = path[-1]
+                remaining = node.entries.get((kind, value), 0) - 1
+                if remaining > 0:
+                    node.entries[(kind, value)] = remaining
+                else:
+                    node.entries.pop((kind, value), None)
+                # Убираем опустевшие ветки, чтобы дерево не росло от правок
+                for char, parent, child in zip(reversed(key), reversed(path[:-1]), reversed(path[1:])):
+                    if child.children or child.entries:
+                        break
+                    del parent.children[char]
+
+    def _add_book(self, title: str, author: str) -> None:
+        if title:
+            self._insert("title", title)
+        if author:
+            self._insert("author", author)
+
+    def _remove_book(self, title: str, author: str) -> None:
+        if title:
+            self._remove("title", title)
+        if author:
+            self._remove("author", author)
+
+    def is_fresh(self) -> bool:
+        return self._built_at is not None and (
+            time.monotonic() - self._built_at < self.rebuild_interval_seconds
+        )
+
+    def rebuild(self, db) -> None:
+        rows = db.query(Book.title, Book.author).filter(Book.status == "available").all()
+        root = _TrieNode()
+        with self._lock:
+            self._root = root
+            self._values = {}
+            for title, author in rows:
+                self._add_book(title, author)
+            self._built_at = time.monotonic()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._root = _TrieNode()
+            self._values = {}
+            self._built_at = None
+
+    def apply_change(self, old, new) -> None:
+        """Учесть запись книги: old/new — снимки доступной книги (title, author) или None."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            if old is not None:
+                self._remove_book(old.title, old.author)
+            if new is not None:
+                self._add_book(new.title, new.author)
+
+    def search(self, prefix: str, limit: int) -> list[dict]:
+        query = normalize_text(prefix)
+        if not query:
+            return []
+        with self._lock:
+            results = self._prefix_matches(query, limit)
+            if len(results) < limit:
+                results += self._fuzzy_matches(query, limit - len(results), exclude=set(results))
+        return [{"value": value, "kind": kind} for kind, value in results]
+
+    def _prefix_matches(self, query: str, limit: int) -> list[tuple[str, str]]:
+        node = self._root
+        for char in query:
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        # Обход в ширину: сначала самые короткие дополнения
+        results: dict[tuple[str, str], int] = {}
+        level = deque([node])
+        while level and len(results) < limit:
+            next_level = deque()
+            for current in level:
+                for entry, count in current.entries.items():
+                    results[entry] = results.get(entry, 0) + count
+                next_level.extend(current.children.values())
+            level = next_level
+
+        ranked = sorted(results.items(), key=lambda item: (-item[1], len(item[0][1]), item[0][1]))
+        return [entry for entry, _ in ranked[:limit]]
+
+    def _fuzzy_matches(self, query: str, limit: int, exclude: set) -> list[tuple[str, str]]:
+        query_trigrams = trigrams(query)
+        scored = []
+        for entry, (_, value_trigrams) in self._values.items():
+            if entry in exclude:
+                continue
+            score = similarity(query_trigrams, value_trigrams)
+            if score >= FUZZY_SIMILARITY_THRESHOLD:
+                scored.append((-score, entry[1], entry))
+        scored.sort()
+        return [entry for _, _, entry in scored[:limit]]
+
+
+suggestion_index = SuggestionIndex(rebuild_interval_seconds=settings.suggest_index_rebuild_seconds)
+
+
+def _postgres_suggestions(db, q: str, limit: int) -> list[dict]:
+    """
+    Совпадение, как и в префиксном дереве, — с начала любого слова значения
+    или по сходству триграмм (оператор % из pg_trgm) для запросов с опечатками.
+    Префиксные совпадения идут первыми, нечёткие добирают выдачу за ними.
+    """
+    escaped = " ".join(q.split()).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    rows = db.execute(
+        text(
+            """
+            SELECT value, kind FROM (
+                SELECT title AS value, 'title' AS kind, similarity(title, :q) AS score,
+                       (title ILIKE :prefix OR title ILIKE :word_prefix) AS is_prefix
+                FROM books
+                WHERE status = 'available' AND (title ILIKE :prefix OR title ILIKE :word_prefix OR title % :q)
+                UNION ALL
+                SELECT author, 'author', similarity(author, :q), (author ILIKE :prefix OR author ILIKE :word_prefix)
+                FROM books
+                WHERE status = 'available' AND (author ILIKE :prefix OR author ILIKE :word_prefix OR author % :q)
+            ) AS candidates
+            GROUP BY value, kind
+            ORDER BY bool_or(is_prefix) DESC, max(score) DESC, value
+            LIMIT :limit
+            """
+        ),
+        {"q": q, "prefix": f"{escaped}%", "word_prefix": f"% {escaped}%", "limit": limit},
+    ).all()
+    return [{"value": value, "kind": kind} for value, kind in rows]
+
+
+def get_suggestions(db, q: str, limit: int) -> list[dict]:
+    """Подсказки для автодополнения: pg_trgm в PostgreSQL, префиксное дерево в остальных СУБД."""
+    if db.get_bind().dialect.name == "postgresql":
+        return _postgres_suggestions(db, q, limit)
+    if not suggestion_index.is_fresh():
+        suggestion_index.rebuild(db)
+    return suggestion_index.search(q, limit)
@@ -50,6 +50,39 @@ class Settings:
 
     openweather_api_key: str | None = os.getenv("OPENWEATHER_API_KEY")
 
+    book_count_cache_ttl_seconds: int = int(os.getenv("BOOK_COUNT_CACHE_TTL_SECONDS", "60"))
+    book_count_cache_size: int = int(os.getenv("BOOK_COUNT_CACHE_SIZE", "512"))
+    book_count_estimate_threshold: int = int(os.getenv("BOOK_COUNT_ESTIMATE_THRESHOLD", "0"))
+    catalog_page_cache_ttl_seconds: int = int(os.getenv("CATALOG_PAGE_CACHE_TTL_SECONDS", "30"))
+    catalog_page_cache_size: int = int(os.getenv("CATALOG_PAGE_CACHE_SIZE", "256"))
+    suggest_index_rebuild_seconds: int = int(os.getenv("SUGGEST_INDEX_REBUILD_SECONDS", "300"))
+    facet_aggregate_rebuild_seconds: int = int(os.getenv("FACET_AGGREGATE_REBUILD_SECONDS", "300"))
+    sitemap_shard_size: int = int(os.getenv("SITEMAP_SHARD_SIZE", "50000"))
+    outbox_batch_size: int = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+    outbox_poll_interval_seconds: float = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "1.0"))
+    # После стольких неудачных попыток событие откладывается и не блокирует outbox
+    outbox_max_attempts: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+    # Сколько последних дельта-событий на пользователя хранится для переподключения
+    exchange_replay_buffer_size: int = int(os.getenv("EXCHANGE_REPLAY_BUFFER_SIZE", "200"))
+    # 0 отключает истечение ожидающих обменов
+    exchange_pending_ttl_hours: int = int(os.getenv("EXCHANGE_PENDING_TTL_HOURS", "336"))
+    exchange_expiry_batch_size: int = int(os.getenv("EXCHANGE_EXPIRY_BATCH_SIZE", "200"))
+    exchange_expiry_interval_seconds: float = float(os.getenv("EXCHANGE_EXPIRY_INTERVAL_SECONDS", "600"))
+    # 0 отключает перенос закрытых обменов в exchanges_archive
+    exchange_archive_after_days: int = int(os.getenv("EXCHANGE_ARCHIVE_AFTER_DAYS", "90"))
+    exchange_archive_batch_size: int = int(os.getenv("EXCHANGE_ARCHIVE_BATCH_SIZE", "500"))
+    exchange_archive_interval_seconds: float = float(os.getenv("EXCHANGE_ARCHIVE_INTERVAL_SECONDS", "3600"))
+    # Пусто — один процесс; redis://host:6379/0 — общая шина и присутствие для N воркеров
+    socketio_message_queue: str = os.getenv("SOCKETIO_MESSAGE_QUEUE", "").strip()
+    socket_db_pool_size: int = int(os.getenv("SOCKET_DB_POOL_SIZE", "4"))
+    socket_db_timeout_seconds: float = float(os.getenv("SOCKET_DB_TIMEOUT_SECONDS", "5"))
+    # Пульс воркера в общем присутствии; сессии воркера без пульса дольше TTL снимаются
+    socket_presence_heartbeat_seconds: float = float(os.getenv("SOCKET_PRESENCE_HEARTBEAT_SECONDS", "10"))
+    socket_presence_ttl_seconds: float = float(os.getenv("SOCKET_PRESENCE_TTL_SECONDS", "30"))
+    # Окно склейки уведомлений одного пользователя; 0 — отправлять каждое событие сразу
+    socket_coalesce_window_seconds: float = float(os.getenv("SOCKET_COALESCE_WINDOW_SECONDS", "0.05"))
+    socket_coalesce_max_delay_seconds: float = float(os.getenv("SOCKET_COALESCE_MAX_DELAY_SECONDS", "0.25"))
+
 
 @lru_cache
 def get_settings() -> Settings:
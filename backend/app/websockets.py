@@ -1,17 +1,138 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 import socketio
 from jose import jwt
-from typing import Dict, Set, Optional
-from .database import get_db
+from sqlalchemy.orm import joinedload
+from typing import NamedTuple, Optional
+from .database import SessionLocal
 from .models import Exchange
 from .security import SECRET_KEY, ALGORITHM
 from datetime import datetime, timezone
 import json
 from .settings import get_settings
+from .services.coalescing import NotificationCoalescer
+from .services.counters import get_counters
+from .services.exchanges import book_title
+from .services.replay import missed_events
+from .services.sessions import SessionRegistry
+from .services.socket_backend import MemoryPubSubManager, create_socket_backend, presence_map
+
+MAX_PRESENCE_SUBSCRIPTIONS = 200
+
+def user_room(user_id: int) -> str:
+    """Комната Socket.IO, в которую входят все сессии пользователя"""
+    return f"user:{user_id}"
+
+def presence_room(user_id: int) -> str:
+    """Комната подписчиков на появление и уход пользователя"""
+    return f"presence:{user_id}"
+
+def access_token_user_id(token: str) -> int:
+    """
+    Проверить подпись, срок и тип access-токена и вернуть user_id из его claims.
+    Ошибки — исключения jose (ExpiredSignatureError, JWTError).
+    """
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    token_type = payload.get('type')
+    if token_type and token_type != 'access':
+        raise jwt.JWTClaimsError('Неверный тип токена')
+    user_id = payload.get('user_id')
+    if not user_id:
+        raise jwt.JWTClaimsError('В токене нет user_id')
+    return int(user_id)
+
+def parse_user_ids(data) -> Optional[list[int]]:
+    """Список id из {'user_ids': [...]} без повторов; None, если формат неверный"""
+    user_ids = data.get('user_ids') if isinstance(data, dict) else None
+    if not isinstance(user_ids, list):
+        return None
+    try:
+        return list(dict.fromkeys(int(user_id) for user_id in user_ids))
+    except (TypeError, ValueError):
+        return None
+
+def parse_last_seq(value) -> Optional[int]:
+    """Номер последнего полученного клиентом события; None — клиенту нужен снимок"""
+    try:
+        seq = int(value)
+    except (TypeError, ValueError):
+        return None
+    return seq if seq >= 0 else None
+
+def socket_event(event_type: str, payload: dict, seq: Optional[int] = None):
+    """Имя и данные Socket.IO-события для события outbox; дельты несут номер seq"""
+    if event_type == 'exchange_created':
+        return 'exchange_created', {'seq': seq, 'exchange': payload}
+    if event_type == 'exchange_status_changed':
+        return 'exchange_updated', {'seq': seq, 'updates': [payload]}
+    if event_type == 'exchange_status_batch':
+        return 'exchange_updated', {'seq': seq, 'updates': payload['updates']}
+    if event_type == 'exchange_counters':
+        return 'exchange_counters', payload
+    return None
+
+def pending_offers(db, owner_id: int) -> list[dict]:
+    """Ожидающие предложения владельцу в формате события exchange_created"""
+    exchanges = (
+        db.query(Exchange)
+        .options(joinedload(Exchange.book), joinedload(Exchange.requester))
+        .filter(Exchange.owner_id == owner_id, Exchange.status == 'pending')
+        .all()
+    )
+    return [
+        {
+            'id': exchange.id,
+            'book_id': exchange.book_id,
+            'book_title': book_title(exchange.book),
+            'requester_id': exchange.requester_id,
+            'requester_username': exchange.requester.username if exchange.requester else 'Неизвестный пользователь',
+            'created_at': exchange.created_at.isoformat() if exchange.created_at else ''
+        }
+        for exchange in exchanges
+    ]
+
+class ExchangeSync(NamedTuple):
+    seq: int
+    missed: Optional[list]  # None — вместо пропущенных событий отправляется снимок
+    snapshot: list
+    counters: dict
+
+def load_exchange_sync(user_id: int, last_seq: Optional[int]) -> ExchangeSync:
+    """Всё, что нужно сессии после подключения (синхронный SQL, выполняется в пуле)"""
+    db = SessionLocal()
+    try:
+        # Номер читается до снимка: более поздние события придут в комнату пользователя
+        seq, missed = missed_events(db, user_id, last_seq)
+        snapshot = pending_offers(db, user_id) if missed is None else []
+        return ExchangeSync(seq, missed, snapshot, get_counters(db, user_id))
+    finally:
+        db.close()
 
 class SocketManager:
-    def __init__(self):
+    """
+    Socket.IO-сервер уведомлений. Без SOCKETIO_MESSAGE_QUEUE работает в одном
+    процессе; с очередью (redis://) emit из любого воркера доходит до сокетов
+    всех воркеров, а присутствие пользователей хранится в Redis.
+
+    Синхронный SQL обработчиков выполняется в собственном ограниченном пуле
+    потоков с таймаутом: шторм подключений ждёт своей очереди в пуле,
+    а не останавливает event loop вместе со всеми HTTP-запросами.
+
+    События outbox склеиваются по пользователю в коротком окне
+    (SOCKET_COALESCE_WINDOW_SECONDS, не дольше SOCKET_COALESCE_MAX_DELAY_SECONDS):
+    всплеск событий уходит одним exchange_batch вместо emit на каждое.
+    """
+
+    def __init__(self, client_manager=None, presence=None):
         settings = get_settings()
+        if client_manager is None and presence is None:
+            client_manager, presence = create_socket_backend(
+                settings.socketio_message_queue, settings.socket_presence_ttl_seconds
+            )
+        self.presence = presence
         self.sio = socketio.AsyncServer(
+            client_manager=client_manager,
             async_mode='asgi',
             cors_allowed_origins=settings.allowed_origins,
             allow_upgrades=True,
@@ -21,7 +142,17 @@ class SocketManager:
             engineio_logger=True
         )
         self.app = socketio.ASGIApp(self.sio, socketio_path='socket.io')
-        self.online_users: Dict[str, Set[str]] = {}
+        self.sessions = SessionRegistry()
+        self.presence_heartbeat_seconds = settings.socket_presence_heartbeat_seconds
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.db_pool_size = settings.socket_db_pool_size
+        self.db_timeout_seconds = settings.socket_db_timeout_seconds
+        self._db_executor: Optional[ThreadPoolExecutor] = None
+        self.coalescer = NotificationCoalescer(
+            settings.socket_coalesce_window_seconds,
+            settings.socket_coalesce_max_delay_seconds,
+            self.emit_to_user,
+        )
         self.setup_events()
     
     def setup_events(self):
@@ -51,26 +182,20 @@ class SocketManager:
                     if unverified.get('exp', 0) < datetime.now(timezone.utc).timestamp():
                         await self.sio.emit('auth_error', {'error': 'Токен истёк. Войдите снова.'}, to=sid)
                         return False
-                    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-                    token_type = payload.get('type')
-                    if token_type and token_type != 'access':
-                        await self.sio.emit('auth_error', {'error': 'Неверный тип токена'}, to=sid)
-                        return False
-                    user_id = payload.get('user_id')
-                    
-                    if user_id:
-                        user_id_str = str(user_id)
-                        if user_id_str not in self.online_users:
-                            self.online_users[user_id_str] = set()
-                        self.online_users[user_id_str].add(sid)
-                        await self.sio.save_session(sid, {'user_id': user_id_str})
-                        await self.sio.emit('user_online', {'user_id': user_id_str}, to=sid)
-                        await self.sio.emit('auth_success', {'user_id': user_id_str}, to=sid)
-                        await self.send_pending_exchanges(user_id_str)
-                        return True
+                    user_id = access_token_user_id(token)
+                    user_id_str = str(user_id)
+                    await self.bind_session(sid, user_id)
+                    await self.sio.save_session(sid, {'user_id': user_id})
+                    await self.sio.emit('user_online', {'user_id': user_id_str}, to=sid)
+                    await self.sio.emit('auth_success', {'user_id': user_id_str}, to=sid)
+                    last_seq = parse_last_seq(auth.get('last_seq')) if isinstance(auth, dict) else None
+                    await self.resume(sid, user_id, last_seq)
+                    return True
                 except jwt.ExpiredSignatureError:
                     await self.sio.emit('auth_error', {'error': 'Токен истёк. Войдите снова.'}, to=sid)
-                except jwt.InvalidTokenError:
+                except jwt.JWTClaimsError as e:
+                    await self.sio.emit('auth_error', {'error': str(e)}, to=sid)
+                except jwt.JWTError:
                     await self.sio.emit('auth_error', {'error': 'Неверный токен'}, to=sid)
                 except Exception as e:
                     print(f"Ошибка аутентификации: {str(e)}")
@@ -82,18 +207,46 @@ class SocketManager:
         @self.sio.event
         async def disconnect(sid):
             print(f"Клиент отключен: {sid}")
-            user_id_to_remove = None
-            for user_id, sessions in self.online_users.items():
-                if sid in sessions:
-                    user_id_to_remove = user_id
-                    sessions.remove(sid)
-                    if not sessions:
-                        del self.online_users[user_id]
-                    break
-            
-            if user_id_to_remove:
-                await self.sio.emit('user_offline', {'user_id': user_id_to_remove})
-                print(f"Пользователь {user_id_to_remove} отключен")
+            user_id, _ = self.sessions.remove(sid)
+            if user_id is not None and await self.presence.session_closed(user_id):
+                await self.sio.emit('user_offline', {'user_id': str(user_id)}, room=presence_room(user_id))
+                print(f"Пользователь {user_id} отключен")
+
+        @self.sio.event
+        async def subscribe_presence(sid, data):
+            """
+            Подписать сессию на присутствие пользователей (например, участников
+            её обменов). Ответ подтверждения — их текущий статус.
+            """
+            if self.sessions.user_of(sid) is None:
+                return {'error': 'Требуется аутентификация'}
+            user_ids = parse_user_ids(data)
+            if user_ids is None:
+                return {'error': 'Ожидается {"user_ids": [...]}'}
+            subscribed = {room for room in self.sio.rooms(sid) if room.startswith('presence:')}
+            new_rooms = {presence_room(user_id) for user_id in user_ids} - subscribed
+            if len(subscribed) + len(new_rooms) > MAX_PRESENCE_SUBSCRIPTIONS:
+                return {'error': f'Можно следить не больше чем за {MAX_PRESENCE_SUBSCRIPTIONS} пользователями'}
+            for room in new_rooms:
+                await self.sio.enter_room(sid, room)
+            return {'users': await presence_map(self.presence, user_ids)}
+
+        @self.sio.event
+        async def unsubscribe_presence(sid, data):
+            for user_id in parse_user_ids(data) or []:
+                await self.sio.leave_room(sid, presence_room(user_id))
+
+        @self.sio.event
+        async def exchange_resync(sid, data):
+            """
+            Клиент заметил разрыв в номерах дельт, который не закрылся сам:
+            дослать события после его last_seq (или снимок), как при подключении.
+            """
+            user_id = self.sessions.user_of(sid)
+            if user_id is None:
+                return {'error': 'Требуется аутентификация'}
+            last_seq = parse_last_seq(data.get('last_seq')) if isinstance(data, dict) else None
+            await self.resume(sid, user_id, last_seq)
 
         @self.sio.event
         async def authenticate(sid, token_data):
@@ -102,22 +255,29 @@ class SocketManager:
                     token_data = json.loads(token_data)
                 
                 token = token_data.get('token')
-                user_id = token_data.get('user_id')
-                
-                if not token or not user_id:
-                    await self.sio.emit('auth_error', {'error': 'Требуется токен и user_id'}, to=sid)
-                    print("Ошибка аутентификации: отсутствует токен или user_id")
+                if not token:
+                    await self.sio.emit('auth_error', {'error': 'Требуется токен'}, to=sid)
+                    print("Ошибка аутентификации: отсутствует токен")
                     return False
-                
-                if user_id not in self.online_users:
-                    self.online_users[user_id] = set()
-                self.online_users[user_id].add(sid)
+
+                # user_id берётся только из проверенного токена: иначе любой сокет
+                # мог бы войти в чужую комнату user:{id} и получить историю обменов
+                try:
+                    user_id = access_token_user_id(token)
+                except jwt.ExpiredSignatureError:
+                    await self.sio.emit('auth_error', {'error': 'Токен истёк. Войдите снова.'}, to=sid)
+                    return False
+                except jwt.JWTError:
+                    await self.sio.emit('auth_error', {'error': 'Неверный токен'}, to=sid)
+                    return False
+
+                await self.bind_session(sid, user_id)
                 
                 await self.sio.save_session(sid, {'user_id': user_id})
-                await self.sio.emit('auth_success', {'user_id': user_id}, to=sid)
+                await self.sio.emit('auth_success', {'user_id': str(user_id)}, to=sid)
                 print(f"Пользователь {user_id} успешно прошел аутентификацию")
                 
-                await self.send_pending_exchanges(user_id, sid)
+                await self.resume(sid, user_id, parse_last_seq(token_data.get('last_seq')))
                 return True
                 
             except Exception as e:
@@ -126,69 +286,139 @@ class SocketManager:
                 await self.sio.emit('auth_error', {'error': error_msg}, to=sid)
                 return False
 
-    async def send_pending_exchanges(self, user_id: str, sid: Optional[str] = None):
-        """Отправка уведомлений о новых предложениях обмена"""
+    async def bind_session(self, sid: str, user_id: int):
+        """Привязать сессию к пользователю и его комнате user:{id}"""
+        previous = self.sessions.user_of(sid)
+        if previous == user_id:
+            return
+        if previous is not None:
+            await self.sio.leave_room(sid, user_room(previous))
+            if await self.presence.session_closed(previous):
+                await self.sio.emit('user_offline', {'user_id': str(previous)}, room=presence_room(previous))
+        self.sessions.add(sid, user_id)
+        if await self.presence.session_opened(user_id):
+            await self.sio.emit('user_online', {'user_id': str(user_id)}, room=presence_room(user_id))
+        await self.sio.enter_room(sid, user_room(user_id))
+
+    def start(self):
+        """
+        Подписаться на очередь сообщений сразу, а не при первом подключении к воркеру,
+        и запустить пульс общего присутствия.
+        """
+        if not self.sio.manager_initialized:
+            self.sio.manager_initialized = True
+            self.sio.manager.initialize()
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._presence_heartbeat())
+
+    async def presence_heartbeat(self):
+        """Продлить отметку воркера и сообщить подписчикам об ушедших вместе с умершими воркерами"""
+        for user_id in await self.presence.heartbeat():
+            await self.sio.emit('user_offline', {'user_id': str(user_id)}, room=presence_room(user_id))
+            print(f"Пользователь {user_id} отключен вместе с остановившимся воркером")
+
+    async def _presence_heartbeat(self):
+        while True:
+            try:
+                await self.presence_heartbeat()
+            except Exception as e:
+                print(f"Ошибка пульса присутствия: {str(e)}")
+            await asyncio.sleep(self.presence_heartbeat_seconds)
+
+    async def stop(self):
+        """Отправить накопленные пачки, снять сессии воркера из общего присутствия и отписаться от очереди"""
+        heartbeat, self._heartbeat_task = self._heartbeat_task, None
+        if heartbeat is not None:
+            heartbeat.cancel()
+        await self.coalescer.flush_all()
+        for sid, user_id in self.sessions.bindings():
+            self.sessions.remove(sid)
+            await self.presence.session_closed(user_id)
+        await self.presence.close()
+        listener = getattr(self.sio.manager, 'thread', None)
+        if listener is not None:
+            listener.cancel()
+        if isinstance(self.sio.manager, MemoryPubSubManager):
+            self.sio.manager.unsubscribe()
+        executor, self._db_executor = self._db_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run_db(self, func, *args):
+        """
+        Выполнить синхронную функцию с доступом к БД в пуле SocketManager.
+        По таймауту ещё не начатая задача снимается из очереди пула.
+        """
+        if self._db_executor is None:
+            self._db_executor = ThreadPoolExecutor(max_workers=self.db_pool_size, thread_name_prefix='socket-db')
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(self._db_executor, func, *args),
+            timeout=self.db_timeout_seconds,
+        )
+
+    async def online_count(self) -> int:
+        """Число пользователей онлайн во всех воркерах"""
+        return await self.presence.online_count()
+
+    async def resume(self, sid: str, user_id: int, last_seq: Optional[int] = None):
+        """
+        Синхронизировать сессию после подключения. Если клиент прислал last_seq
+        и отстал не больше чем на буфер повтора, ему отправляются только пропущенные
+        дельты; иначе — снимок ожидающих предложений exchange_snapshot.
+        Затем отправляются текущие счётчики.
+
+        Сессия уже в комнате пользователя, поэтому новые дельты могут прийти
+        раньше повтора: клиент применяет их по порядку номеров.
+        Флаг reset в снимке означает, что сервер не выдавал номер клиента
+        и снимок заменяет состояние, даже если его номер меньше.
+        """
         try:
-            db = next(get_db())
-            exchanges = db.query(Exchange).join(Book).filter(
-                Exchange.owner_id == int(user_id),
-                Exchange.status == 'pending'
-            ).all()
-            
-            notifications = []
-            for exchange in exchanges:
-                notifications.append({
-                    'id': exchange.id,
-                    'book_id': exchange.book_id,
-                    'book_title': exchange.book.title if exchange.book else 'Неизвестная книга',
-                    'requester_id': exchange.requester_id,
-                    'requester_username': exchange.requester.username if exchange.requester else 'Неизвестный пользователь',
-                    'created_at': exchange.created_at.isoformat() if exchange.created_at else ''
-                })
-            
-            if notifications:
-                if sid:
-                    await self.sio.emit('new_exchanges', {'exchanges': notifications}, to=sid)
-                else:
-                    if user_id in self.online_users:
-                        for session_id in self.online_users[user_id]:
-                            await self.sio.emit('new_exchanges', {'exchanges': notifications}, to=session_id)
-                print(f"Отправлено {len(notifications)} уведомлений пользователю {user_id}")
-                
+            sync = await self.run_db(load_exchange_sync, user_id, last_seq)
+        except asyncio.TimeoutError:
+            print(f"Таймаут загрузки уведомлений пользователя {user_id}")
+            return
         except Exception as e:
             print(f"Ошибка отправки уведомлений: {str(e)}")
-        finally:
-            db.close()
+            return
 
-    async def notify_new_exchange(self, exchange_id: int):
-        """Уведомление о новом предложении обмена"""
-        try:
-            db = next(get_db())
-            exchange = db.query(Exchange).get(exchange_id)
-            if exchange:
-                await self.send_pending_exchanges(str(exchange.owner_id))
-                print(f"Уведомление о новом обмене ID {exchange_id} отправлено владельцу {exchange.owner_id}")
-        except Exception as e:
-            print(f"Ошибка уведомления о новом обмене: {str(e)}")
-        finally:
-            db.close()
+        if sync.missed is None:
+            reset = last_seq is not None and last_seq > sync.seq
+            await self.sio.emit(
+                'exchange_snapshot', {'seq': sync.seq, 'reset': reset, 'exchanges': sync.snapshot}, to=sid
+            )
+        else:
+            for seq, event_type, payload in sync.missed:
+                name, data = socket_event(event_type, payload, seq)
+                await self.sio.emit(name, data, to=sid)
+        await self.sio.emit('exchange_counters', sync.counters, to=sid)
 
+    async def deliver_event(
+        self, event_type: str, recipient_id: int, payload: dict, seq: Optional[int] = None
+    ) -> Optional[asyncio.Future]:
+        """
+        Поставить событие из outbox в окно склейки получателя.
+        Полезная нагрузка уже содержит всё нужное клиенту, поэтому БД не читается.
+        Возвращает future отправки пачки (None — событие уже отправлено или пропущено):
+        outbox подтверждает событие только после неё, поэтому при падении воркера
+        до конца окна событие будет отправлено снова.
+        """
+        event = socket_event(event_type, payload, seq)
+        if event is None:
+            print(f"Неизвестный тип события обмена: {event_type}")
+            return None
+        return await self.coalescer.add(recipient_id, event)
 
-    async def notify_exchange_status_update(self, exchange_id: int, status: str):
-        """Уведомление об обновлении статуса обмена"""
-        try:
-            db = next(get_db())
-            exchange = db.query(Exchange).get(exchange_id)
-            if exchange:
-                if str(exchange.requester_id) in self.online_users:
-                    for session_id in self.online_users[str(exchange.requester_id)]:
-                        await self.sio.emit('exchange_status_update', {
-                            'exchange_id': exchange.id,
-                            'book_title': exchange.book.title if exchange.book else 'Неизвестная книга',
-                            'status': status
-                        }, to=session_id)
-                    print(f"Уведомление о статусе обмена ID {exchange_id} отправлено запрашивающему {exchange.requester_id}")
-        except Exception as e:
-            print(f"Ошибка уведомления о статусе обмена: {str(e)}")
-        finally:
-            db.close()
+    async def emit_to_user(self, user_id: int, events: list):
+        """
+        Отправить события пользователю одним emit в его комнату. Из нескольких
+        exchange_counters остаётся последнее, в конце пачки: счётчики — абсолютные значения.
+        """
+        counters = [event for event in events if event[0] == 'exchange_counters']
+        events = [event for event in events if event[0] != 'exchange_counters'] + counters[-1:]
+        if len(events) == 1:
+            name, data = events[0]
+            await self.sio.emit(name, data, room=user_room(user_id))
+        else:
+            batch = [{'event': name, 'data': data} for name, data in events]
+            await self.sio.emit('exchange_batch', {'events': batch}, room=user_room(user_id))
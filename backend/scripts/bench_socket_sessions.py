@@ -0,0 +1,70 @@
+"""
+Бенчмарк учёта сокет-сессий: волна подключений и отключений
+(как после деплоя) на 50 000 сессий.
+
+Сравнивает SessionRegistry с прежней схемой, где отключение искало
+владельца sid перебором всех пользователей онлайн.
+
+    python scripts/bench_socket_sessions.py [--sessions 50000] [--users 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.sessions import SessionRegistry  # noqa: E402
+
+
+class LinearScanSessions:
+    """Прежняя схема: только прямое отображение user_id -> {sid}."""
+
+    def __init__(self):
+        self.online_users: dict[str, set[str]] = {}
+
+    def add(self, sid: str, user_id: int) -> None:
+        self.online_users.setdefault(str(user_id), set()).add(sid)
+
+    def remove(self, sid: str) -> None:
+        for user_id, sessions in self.online_users.items():
+            if sid in sessions:
+                sessions.remove(sid)
+                if not sessions:
+                    del self.online_users[user_id]
+                break
+
+
+def churn(registry, sessions: list[tuple[str, int]]) -> tuple[float, float]:
+    started = time.perf_counter()
+    for sid, user_id in sessions:
+        registry.add(sid, user_id)
+    connected = time.perf_counter()
+    for sid, _ in reversed(sessions):
+        registry.remove(sid)
+    return connected - started, time.perf_counter() - connected
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sessions = [(f"sid-{index}", rng.randint(1, args.users)) for index in range(args.sessions)]
+
+    for name, registry in (("SessionRegistry", SessionRegistry()), ("линейный поиск", LinearScanSessions())):
+        connect_seconds, disconnect_seconds = churn(registry, sessions)
+        print(
+            f"{name:>16}: {args.sessions} подключений за {connect_seconds:.3f} с, "
+            f"{args.sessions} отключений за {disconnect_seconds:.3f} с "
+            f"({disconnect_seconds / args.sessions * 1e6:.1f} мкс на отключение)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
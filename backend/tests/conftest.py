@@ -1,8 +1,11 @@
 import os
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Optional
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 
 TEST_DB_PATH = Path(__file__).with_name("lab5_test.sqlite3")
 
@@ -14,10 +17,20 @@ os.environ.setdefault("MINIO_ACCESS_KEY", "minioadmin")
 os.environ.setdefault("MINIO_SECRET_KEY", "minioadmin")
 os.environ.setdefault("MINIO_BUCKET_NAME", "book-covers")
 os.environ.setdefault("MINIO_SECURE", "false")
+# Фоновое истечение и архивация обменов в тестах вызываются явно
+os.environ.setdefault("EXCHANGE_PENDING_TTL_HOURS", "0")
+os.environ.setdefault("EXCHANGE_ARCHIVE_AFTER_DAYS", "0")
 
 from app.database import Base, SessionLocal, engine, get_db  # noqa: E402
 from app.main import app  # noqa: E402
 from app.routes import books as books_routes  # noqa: E402
+from app.services.catalog_cache import bump_catalog_version  # noqa: E402
+from app.services.facets import facet_aggregate  # noqa: E402
+from app.services.outbox import outbox_dispatcher  # noqa: E402
+from app.services.sessions import SessionRegistry  # noqa: E402
+from app.services.socket_backend import LocalPresence  # noqa: E402
+from app.services.sitemap import clear_rendered_shards  # noqa: E402
+from app.services.suggest import suggestion_index  # noqa: E402
 
 
 class FakeMinioClient:
@@ -41,21 +54,74 @@ class FakeMinioClient:
 
 class FakeSocketManager:
     def __init__(self):
-        self.online_users: dict[str, set[str]] = {}
-        self.new_exchange_calls: list[int] = []
-        self.status_updates: list[tuple[int, str]] = []
+        self.sessions = SessionRegistry()
+        self.events: list[tuple[str, int, dict]] = []
+        self.seqs: list[tuple[int, Optional[int]]] = []
+        self.presence = LocalPresence()
 
-    async def notify_new_exchange(self, exchange_id: int):
-        self.new_exchange_calls.append(exchange_id)
+    async def deliver_event(self, event_type: str, recipient_id: int, payload: dict, seq: Optional[int] = None):
+        self.events.append((event_type, recipient_id, payload))
+        self.seqs.append((recipient_id, seq))
 
-    async def notify_exchange_status_update(self, exchange_id: int, status: str):
-        self.status_updates.append((exchange_id, status))
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries():
+    """Контекстный менеджер, считающий SQL-запросы к тестовой БД внутри блока."""
+
+    @contextmanager
+    def counter():
+        query_counter = QueryCounter()
+        event.listen(engine, "before_cursor_execute", query_counter)
+        try:
+            yield query_counter
+        finally:
+            event.remove(engine, "before_cursor_execute", query_counter)
+
+    return counter
+
+
+@pytest.fixture
+def assert_constant_queries(count_queries):
+    """
+    Проверить, что число запросов не зависит от числа строк:
+    seed(n) добавляет n строк, request() выполняет запрос к списку.
+    """
+
+    def check(seed, request, small: int = 1, large: int = 5):
+        seed(small)
+        with count_queries() as small_counter:
+            request()
+        seed(large - small)
+        with count_queries() as large_counter:
+            request()
+        assert large_counter.count == small_counter.count, (
+            f"{small} строк: {small_counter.count} запросов, {large} строк: {large_counter.count}\n"
+            + "\n".join(large_counter.statements)
+        )
+
+    return check
 
 
 @pytest.fixture(autouse=True)
 def reset_database():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    bump_catalog_version()
+    suggestion_index.reset()
+    facet_aggregate.reset()
+    clear_rendered_shards()
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -74,6 +140,17 @@ def fake_socket_manager() -> FakeSocketManager:
     return manager
 
 
+@pytest.fixture
+def drain_outbox(client):
+    """Дождаться рассылки всех закоммиченных событий обменов в event loop приложения."""
+
+    def drain() -> None:
+        while client.portal.call(outbox_dispatcher.drain):
+            pass
+
+    return drain
+
+
 @pytest.fixture
 def db_session():
     session = SessionLocal()
@@ -61,9 +61,9 @@ def test_full_exchange_lifecycle(client):
     assert create_book.status_code == 200
     assert create_exchange.status_code == 200
     assert requests_response.status_code == 200
-    assert len(requests_response.json()) == 1
+    assert len(requests_response.json()["exchanges"]) == 1
     assert offers_response.status_code == 200
-    assert len(offers_response.json()) == 1
+    assert len(offers_response.json()["exchanges"]) == 1
     assert accept_response.status_code == 200
     assert accept_response.json()["status"] == "accepted"
     assert book_response.json()["status"] == "exchanged"
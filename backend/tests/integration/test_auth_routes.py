@@ -106,3 +106,46 @@ def test_admin_can_change_user_role(client, db_session):
     assert login_response.status_code == 200
     assert role_response.status_code == 200
     assert role_response.json()["new_role"] == "admin"
+
+
+@pytest.mark.integration
+def test_profile_books_revalidate_until_the_list_changes(client):
+    register_user(client, "owner")
+    user_id = client.get("/auth/me").json()["id"]
+    client.post("/books/", data={"title": "First", "author": "Author"})
+
+    profile_response = client.get(f"/auth/profile/{user_id}")
+    profile_revalidated = client.get(
+        f"/auth/profile/{user_id}", headers={"If-None-Match": profile_response.headers["etag"]}
+    )
+    books_response = client.get(f"/auth/profile/{user_id}/books")
+    etag = books_response.headers["etag"]
+    books_revalidated = client.get(f"/auth/profile/{user_id}/books", headers={"If-None-Match": etag})
+
+    client.post("/books/", data={"title": "Second", "author": "Author"})
+    after_create = client.get(f"/auth/profile/{user_id}/books", headers={"If-None-Match": etag})
+
+    assert profile_response.status_code == 200
+    assert profile_revalidated.status_code == 304
+    assert books_revalidated.status_code == 304
+    assert after_create.status_code == 200
+    assert len(after_create.json()) == 2
+
+
+@pytest.mark.integration
+def test_profile_books_ignore_if_modified_since_after_a_book_is_removed(client):
+    register_user(client, "owner")
+    user_id = client.get("/auth/me").json()["id"]
+    client.post("/books/", data={"title": "First", "author": "Author"})
+    newest_id = client.post("/books/", data={"title": "Second", "author": "Author"}).json()["id"]
+    books_response = client.get(f"/auth/profile/{user_id}/books")
+
+    client.delete(f"/books/{newest_id}")
+    after_delete = client.get(
+        f"/auth/profile/{user_id}/books",
+        headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"},
+    )
+
+    assert "last-modified" not in books_response.headers
+    assert after_delete.status_code == 200
+    assert [book["title"] for book in after_delete.json()] == ["First"]
@@ -157,3 +157,261 @@ def test_owner_cannot_delete_book_with_active_exchange(client, db_session):
 
     assert response.status_code == 400
     assert response.json()["detail"] == "Нельзя удалить книгу с активными обменами"
+
+
+@pytest.mark.integration
+def test_search_ranks_title_matches_above_description_matches(client, db_session):
+    owner = User(
+        email="owner@example.com",
+        username="owner",
+        password_hash=get_password_hash("Password123"),
+        role=UserRole.USER,
+        is_active=True,
+    )
+    db_session.add(owner)
+    db_session.commit()
+    db_session.refresh(owner)
+
+    db_session.add_all(
+        [
+            Book(
+                title="Мастер и Маргарита",
+                author="Михаил Булгаков",
+                description="Роман о дьяволе в Москве",
+                owner_id=owner.id,
+            ),
+            Book(
+                title="Белая гвардия",
+                author="Михаил Булгаков",
+                description="Ранний роман автора «Мастера и Маргариты»",
+                owner_id=owner.id,
+            ),
+            Book(
+                title="Dune",
+                author="Frank Herbert",
+                description="Sci-fi classic",
+                owner_id=owner.id,
+            ),
+        ]
+    )
+    db_session.commit()
+
+    response = client.get("/books/", params={"search": "маргарит"})
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["total_count"] == 2
+    assert [book["title"] for book in payload["books"]] == ["Мастер и Маргарита", "Белая гвардия"]
+
+
+@pytest.mark.integration
+def test_search_index_follows_book_updates(client):
+    register_user(client, "owner")
+    book_id = create_book(client, title="Old title").json()["id"]
+
+    client.put(
+        f"/books/{book_id}",
+        data={"title": "Refactoring", "author": "Martin Fowler"},
+    )
+
+    old_response = client.get("/books/", params={"search": "old"})
+    new_response = client.get("/books/", params={"search": "refact"})
+
+    assert old_response.json()["total_count"] == 0
+    assert new_response.json()["total_count"] == 1
+    assert new_response.json()["books"][0]["id"] == book_id
+
+
+@pytest.mark.integration
+def test_books_cursor_pagination_walks_catalog_without_gaps(client, db_session):
+    owner = User(
+        email="owner@example.com",
+        username="owner",
+        password_hash=get_password_hash("Password123"),
+        role=UserRole.USER,
+        is_active=True,
+    )
+    db_session.add(owner)
+    db_session.commit()
+    db_session.refresh(owner)
+
+    db_session.add_all(
+        [Book(title=f"Book {index}", author="Author", owner_id=owner.id) for index in range(5)]
+    )
+    db_session.add(Book(title="Gone", author="Author", owner_id=owner.id, status="exchanged"))
+    db_session.commit()
+
+    seen_titles = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get("/books/", params={"cursor": cursor, "limit": 2})
+        assert response.status_code == 200
+        payload = response.json()
+        assert payload["total_count"] == 5
+        seen_titles.extend(book["title"] for book in payload["books"])
+        cursor = payload["next_cursor"]
+
+    page_response = client.get("/books/", params={"page": 2, "limit": 2})
+
+    assert seen_titles == [f"Book {index}" for index in reversed(range(5))]
+    assert [book["title"] for book in page_response.json()["books"]] == ["Book 2", "Book 1"]
+    assert client.get("/books/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+@pytest.mark.integration
+def test_cached_total_count_is_invalidated_by_book_writes(client):
+    register_user(client, "owner")
+    create_book(client, title="First")
+    first_response = client.get("/books/")
+
+    book_id = create_book(client, title="Second").json()["id"]
+    after_create = client.get("/books/")
+    client.delete(f"/books/{book_id}")
+    after_delete = client.get("/books/")
+
+    assert first_response.json()["total_count"] == 1
+    assert after_create.json()["total_count"] == 2
+    assert after_delete.json()["total_count"] == 1
+
+
+@pytest.mark.integration
+def test_catalog_page_is_served_from_cache_with_etag_until_catalog_changes(client):
+    register_user(client, "owner")
+    create_book(client, title="First")
+
+    first_response = client.get("/books/", params={"limit": 5})
+    etag = first_response.headers["etag"]
+    revalidated = client.get("/books/", params={"limit": 5}, headers={"If-None-Match": etag})
+
+    create_book(client, title="Second")
+    after_write = client.get("/books/", params={"limit": 5}, headers={"If-None-Match": etag})
+
+    assert first_response.status_code == 200
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert after_write.status_code == 200
+    assert after_write.headers["etag"] != etag
+    assert after_write.json()["total_count"] == 2
+
+
+@pytest.mark.integration
+def test_catalog_page_cache_keeps_filters_that_select_different_books_apart(client, db_session):
+    owner = User(email="owner@example.com", username="owner", password_hash=get_password_hash("Password123"))
+    db_session.add(owner)
+    db_session.flush()
+    db_session.add_all(
+        [
+            Book(title="Dune", author="Frank Herbert", genre="Фантастика", condition="good", owner_id=owner.id),
+            Book(title="Solaris", author="Stanislaw Lem", genre="фантастика", condition="excellent", owner_id=owner.id),
+        ]
+    )
+    db_session.commit()
+
+    def titles(response):
+        return [book["title"] for book in response.json()["books"]]
+
+    padded_genre = client.get("/books/", params={"genre": " Фантастика "})
+    etag = padded_genre.headers["etag"]
+    plain_genre = client.get("/books/", params={"genre": "Фантастика"}, headers={"If-None-Match": etag})
+    other_case = client.get("/books/", params={"genre": "фантастика"}, headers={"If-None-Match": etag})
+    padded_condition = client.get("/books/", params={"condition": " excellent "})
+    plain_condition = client.get("/books/", params={"condition": "excellent"})
+
+    assert titles(padded_genre) == ["Dune"]
+    assert plain_genre.status_code == 304
+    assert other_case.status_code == 200
+    assert titles(other_case) == ["Solaris"]
+    assert other_case.headers["etag"] != etag
+    assert titles(padded_condition) == titles(plain_condition) == ["Solaris"]
+    assert padded_condition.json()["total_count"] == plain_condition.json()["total_count"] == 1
+
+
+@pytest.mark.integration
+def test_suggest_returns_titles_and_authors_and_follows_book_writes(client):
+    register_user(client, "owner")
+    create_book(client, title="Clean Code", author="Robert Martin")
+    first_response = client.get("/books/suggest", params={"q": "cle"})
+
+    book_id = create_book(client, title="Clean Architecture", author="Robert Martin").json()["id"]
+    after_create = client.get("/books/suggest", params={"q": "cle"})
+    client.delete(f"/books/{book_id}")
+    after_delete = client.get("/books/suggest", params={"q": "cle"})
+    author_response = client.get("/books/suggest", params={"q": "mart"})
+    mid_title_response = client.get("/books/suggest", params={"q": "cod"})
+    typo_response = client.get("/books/suggest", params={"q": "robrt martn"})
+
+    assert first_response.status_code == 200
+    assert first_response.json() == [{"value": "Clean Code", "kind": "title"}]
+    assert {item["value"] for item in after_create.json()} == {"Clean Code", "Clean Architecture"}
+    assert after_delete.json() == [{"value": "Clean Code", "kind": "title"}]
+    assert author_response.json() == [{"value": "Robert Martin", "kind": "author"}]
+    assert mid_title_response.json() == [{"value": "Clean Code", "kind": "title"}]
+    assert typo_response.json() == [{"value": "Robert Martin", "kind": "author"}]
+
+
+@pytest.mark.integration
+def test_facets_count_each_dimension_under_the_other_filters(client):
+    register_user(client, "owner")
+    for title, genre, condition in [
+        ("Dune", "Фантастика", "good"),
+        ("Solaris", "Фантастика", "excellent"),
+        ("The Hobbit", "Фэнтези", "good"),
+    ]:
+        client.post("/books/", data={"title": title, "author": "Author", "genre": genre, "condition": condition})
+
+    unfiltered = client.get("/books/facets").json()
+    by_condition = client.get("/books/facets", params={"condition": "good"}).json()
+    with_search = client.get("/books/facets", params={"search": "solaris"}).json()
+
+    assert unfiltered["genres"] == [{"value": "Фантастика", "count": 2}, {"value": "Фэнтези", "count": 1}]
+    assert unfiltered["conditions"] == [{"value": "good", "count": 2}, {"value": "excellent", "count": 1}]
+    assert unfiltered["total_count"] == 3
+    assert by_condition["genres"] == [{"value": "Фантастика", "count": 1}, {"value": "Фэнтези", "count": 1}]
+    assert by_condition["conditions"] == unfiltered["conditions"]
+    assert by_condition["total_count"] == 2
+    assert with_search["genres"] == [{"value": "Фантастика", "count": 1}]
+    assert with_search["total_count"] == 1
+
+
+@pytest.mark.integration
+def test_get_book_answers_conditional_requests_with_304(client):
+    register_user(client, "owner")
+    book_id = create_book(client, title="Old title").json()["id"]
+
+    first_response = client.get(f"/books/{book_id}")
+    etag = first_response.headers["etag"]
+    by_etag = client.get(f"/books/{book_id}", headers={"If-None-Match": etag})
+    by_date = client.get(
+        f"/books/{book_id}",
+        headers={"If-Modified-Since": first_response.headers["last-modified"]},
+    )
+
+    client.put(f"/books/{book_id}", data={"title": "New title", "author": "Robert Martin"})
+    after_update = client.get(f"/books/{book_id}", headers={"If-None-Match": etag})
+
+    assert first_response.status_code == 200
+    assert by_etag.status_code == 304
+    assert by_date.status_code == 304
+    assert after_update.status_code == 200
+    assert after_update.json()["title"] == "New title"
+
+
+@pytest.mark.integration
+def test_batch_returns_books_in_request_order_and_marks_missing_ids(client):
+    register_user(client, "owner")
+    first_id = create_book(client, title="First").json()["id"]
+    second_id = create_book(client, title="Second").json()["id"]
+
+    response = client.get("/books/batch", params={"ids": f"{second_id},999,{first_id},{second_id}"})
+    too_many = client.get("/books/batch", params={"ids": ",".join(str(index) for index in range(1, 102))})
+    malformed = client.get("/books/batch", params={"ids": "1,abc"})
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert [item["id"] for item in payload["items"]] == [second_id, 999, first_id]
+    assert [item["found"] for item in payload["items"]] == [True, False, True]
+    assert payload["items"][0]["book"]["title"] == "Second"
+    assert payload["items"][1]["book"] is None
+    assert payload["missing_ids"] == [999]
+    assert too_many.status_code == 400
+    assert malformed.status_code == 400
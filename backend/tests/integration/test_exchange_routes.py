@@ -1,4 +1,16 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
 import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.models import Book, Exchange, ExchangeArchive, User, UserRole
+from app.security import get_password_hash
+from app.services import exchanges as exchanges_service
+from app.services.archive import archive_closed_exchanges
+from app.services.expiry import expire_stale_exchanges
+from app.services.outbox import outbox_dispatcher
+from app.websockets import load_exchange_sync
 
 
 def register_user(client, username: str, email: str | None = None, password: str = "Password123"):
@@ -36,9 +48,34 @@ def create_book(client, title: str):
     return response.json()["id"]
 
 
+def client_user_id(db_session, username: str) -> int:
+    return db_session.query(User.id).filter(User.username == username).scalar()
+
+
+def events_of(socket_manager, event_type: str) -> list[tuple[int, dict]]:
+    return [(recipient_id, payload) for kind, recipient_id, payload in socket_manager.events if kind == event_type]
+
+
+def access_token_for_existing(client, username: str) -> dict[str, str]:
+    login_user(client, username)
+    token = client.cookies.get("access_token")
+    client.post("/auth/logout")
+    client.cookies.clear()
+    return {"Authorization": f"Bearer {token}"}
+
+
+def access_token_for(client, username: str) -> dict[str, str]:
+    register_user(client, username)
+    token = client.cookies.get("access_token")
+    client.post("/auth/logout")
+    client.cookies.clear()
+    return {"Authorization": f"Bearer {token}"}
+
+
 @pytest.mark.integration
-def test_requester_can_create_and_cancel_exchange(client, fake_socket_manager):
+def test_requester_can_create_and_cancel_exchange(client, fake_socket_manager, drain_outbox):
     register_user(client, "owner")
+    owner_id = client.get("/auth/me").json()["id"]
     book_id = create_book(client, "Book for exchange")
     client.post("/auth/logout")
 
@@ -49,19 +86,26 @@ def test_requester_can_create_and_cancel_exchange(client, fake_socket_manager):
     )
     exchange_id = create_response.json()["id"]
     cancel_response = client.delete(f"/exchanges/{exchange_id}/cancel")
+    drain_outbox()
 
     assert create_response.status_code == 200
     assert cancel_response.status_code == 200
-    assert fake_socket_manager.new_exchange_calls == [exchange_id]
+    [(recipient_id, payload)] = events_of(fake_socket_manager, "exchange_created")
+    assert recipient_id == owner_id
+    assert payload["id"] == exchange_id
+    assert payload["book_title"] == "Book for exchange"
+    assert payload["requester_username"] == "requester"
+    assert payload["created_at"]
 
 
 @pytest.mark.integration
-def test_owner_can_accept_exchange_and_book_becomes_exchanged(client, fake_socket_manager):
+def test_owner_can_accept_exchange_and_book_becomes_exchanged(client, fake_socket_manager, drain_outbox):
     register_user(client, "owner")
     book_id = create_book(client, "Domain-Driven Design")
     client.post("/auth/logout")
 
     register_user(client, "requester")
+    requester_id = client.get("/auth/me").json()["id"]
     create_response = client.post(
         "/exchanges/",
         json={"book_id": book_id, "requester_id": 0, "owner_id": 0},
@@ -72,11 +116,14 @@ def test_owner_can_accept_exchange_and_book_becomes_exchanged(client, fake_socke
     login_user(client, "owner")
     accept_response = client.put(f"/exchanges/{exchange_id}/accept")
     book_response = client.get(f"/books/{book_id}")
+    drain_outbox()
 
     assert accept_response.status_code == 200
     assert accept_response.json()["status"] == "accepted"
     assert book_response.json()["status"] == "exchanged"
-    assert fake_socket_manager.status_updates == [(exchange_id, "accepted")]
+    assert events_of(fake_socket_manager, "exchange_status_changed") == [
+        (requester_id, {"exchange_id": exchange_id, "book_title": "Domain-Driven Design", "status": "accepted"})
+    ]
 
 
 @pytest.mark.integration
@@ -91,3 +138,473 @@ def test_user_cannot_exchange_own_book(client):
 
     assert response.status_code == 400
     assert response.json()["detail"] == "Вы не можете обменять свою же книгу"
+
+
+@pytest.mark.integration
+def test_only_the_active_book_index_violation_is_reported_as_duplicate_offer(client, monkeypatch):
+    owner = access_token_for(client, "owner")
+    first, second = access_token_for(client, "first"), access_token_for(client, "second")
+    book_id = client.post("/books/", headers=owner, data={"title": "Wanted", "author": "Author"}).json()["id"]
+    client.post("/exchanges/", headers=first, json={"book_id": book_id, "requester_id": 0, "owner_id": 0})
+
+    duplicate = client.post("/exchanges/", headers=second, json={"book_id": book_id, "requester_id": 0, "owner_id": 0})
+
+    def violate_foreign_key(*args, **kwargs):
+        raise IntegrityError("INSERT INTO exchanges", {}, Exception("FOREIGN KEY constraint failed"))
+
+    monkeypatch.setattr(exchanges_service, "adjust_pending_counters", violate_foreign_key)
+    other_book_id = client.post("/books/", headers=owner, data={"title": "Other", "author": "Author"}).json()["id"]
+    with pytest.raises(IntegrityError):
+        client.post("/exchanges/", headers=second, json={"book_id": other_book_id, "requester_id": 0, "owner_id": 0})
+
+    assert duplicate.status_code == 400
+    assert duplicate.json()["detail"] == exchanges_service.ACTIVE_EXCHANGE_EXISTS
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize(("path", "login_as"), [("/exchanges/my-requests", "requester"), ("/exchanges/my-offers", "owner")])
+def test_exchange_listings_do_not_issue_a_query_per_row(client, db_session, assert_constant_queries, path, login_as):
+    register_user(client, "owner")
+    owner_id = client.get("/auth/me").json()["id"]
+    client.post("/auth/logout")
+    register_user(client, "requester")
+    requester_id = client.get("/auth/me").json()["id"]
+    client.post("/auth/logout")
+    login_user(client, login_as)
+
+    def seed(count: int):
+        for _ in range(count):
+            book = Book(title="Book", author="Author", owner_id=owner_id)
+            db_session.add(book)
+            db_session.flush()
+            db_session.add(Exchange(book_id=book.id, requester_id=requester_id, owner_id=owner_id))
+        db_session.commit()
+
+    def request():
+        response = client.get(path)
+        assert response.status_code == 200
+
+    assert_constant_queries(seed, request)
+
+
+@pytest.mark.integration
+def test_exchange_listing_pages_by_cursor_with_status_filter_and_summary(client, db_session):
+    register_user(client, "owner")
+    owner_id = client.get("/auth/me").json()["id"]
+    client.post("/auth/logout")
+    register_user(client, "requester")
+    requester_id = client.get("/auth/me").json()["id"]
+
+    statuses = ["pending", "rejected", "pending", "accepted", "pending"]
+    for index, exchange_status in enumerate(statuses):
+        book = Book(title=f"Book {index}", author="Author", owner_id=owner_id)
+        db_session.add(book)
+        db_session.flush()
+        db_session.add(
+            Exchange(book_id=book.id, requester_id=requester_id, owner_id=owner_id, status=exchange_status)
+        )
+    db_session.commit()
+
+    first_page = client.get("/exchanges/my-requests", params={"limit": 2})
+    second_page = client.get(
+        "/exchanges/my-requests", params={"limit": 2, "cursor": first_page.json()["next_cursor"]}
+    )
+    pending = client.get("/exchanges/my-requests", params={"status": "pending", "order": "asc"})
+    invalid_status = client.get("/exchanges/my-requests", params={"status": "unknown"})
+
+    assert first_page.status_code == 200
+    assert [item["book"]["title"] for item in first_page.json()["exchanges"]] == ["Book 4", "Book 3"]
+    assert first_page.json()["status_counts"] == {"pending": 3, "rejected": 1, "accepted": 1}
+    assert [item["book"]["title"] for item in second_page.json()["exchanges"]] == ["Book 2", "Book 1"]
+    assert [item["book"]["title"] for item in pending.json()["exchanges"]] == ["Book 0", "Book 2", "Book 4"]
+    assert pending.json()["next_cursor"] is None
+    assert pending.json()["status_counts"]["rejected"] == 1
+    assert invalid_status.status_code == 422
+
+
+@pytest.mark.integration
+def test_concurrent_exchange_transitions_apply_exactly_once(client, db_session):
+    owner = access_token_for(client, "owner")
+    requesters = [access_token_for(client, f"reader{index}") for index in range(8)]
+    book_ids = [
+        client.post(
+            "/books/",
+            headers=owner,
+            data={"title": f"Contested {index}", "author": "Author", "condition": "good"},
+        ).json()["id"]
+        for index in range(3)
+    ]
+
+    def hammer(calls):
+        with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+            return [future.result().status_code for future in [pool.submit(call) for call in calls]]
+
+    # Много читателей одновременно просят одну книгу: активный обмен может быть только один
+    create_codes = hammer(
+        [
+            lambda headers=headers: client.post(
+                "/exchanges/", headers=headers, json={"book_id": book_ids[0], "requester_id": 0, "owner_id": 0}
+            )
+            for headers in requesters
+        ]
+    )
+    exchange_id = db_session.query(Exchange.id).filter(Exchange.book_id == book_ids[0]).scalar()
+
+    # Повторные клики «принять» и «отклонить» по одному обмену
+    decision_codes = hammer(
+        [lambda: client.put(f"/exchanges/{exchange_id}/accept", headers=owner) for _ in range(6)]
+        + [lambda: client.put(f"/exchanges/{exchange_id}/reject", headers=owner) for _ in range(6)]
+    )
+
+    # Отмена соревнуется с принятием
+    racer = requesters[0]
+    raced_id = client.post(
+        "/exchanges/", headers=racer, json={"book_id": book_ids[1], "requester_id": 0, "owner_id": 0}
+    ).json()["id"]
+    race_codes = hammer(
+        [lambda: client.delete(f"/exchanges/{raced_id}/cancel", headers=racer) for _ in range(4)]
+        + [lambda: client.put(f"/exchanges/{raced_id}/accept", headers=owner) for _ in range(4)]
+    )
+
+    db_session.expire_all()
+    assert sorted(create_codes) == [200] + [400] * 7
+    assert sorted(decision_codes) == [200] + [400] * 11
+    assert db_session.query(Exchange).filter(Exchange.book_id == book_ids[0]).count() == 1
+    # Проигравшие видят «уже обработан» или, после отмены, «не найден»
+    assert race_codes.count(200) == 1
+    assert set(race_codes) <= {200, 400, 404}
+    raced = db_session.get(Exchange, raced_id)
+    raced_book = db_session.get(Book, book_ids[1])
+    assert (raced is None and raced_book.status == "available") or (
+        raced.status == "accepted" and raced_book.status == "exchanged"
+    )
+
+
+@pytest.mark.integration
+def test_bulk_decisions_apply_in_one_transaction_and_coalesce_notifications(
+    client, db_session, fake_socket_manager, count_queries, drain_outbox
+):
+    owner = access_token_for(client, "owner")
+    first_reader = access_token_for(client, "reader1")
+    second_reader = access_token_for(client, "reader2")
+    stranger = access_token_for(client, "stranger")
+    book_ids = [
+        client.post("/books/", headers=owner, data={"title": f"Offer {index}", "author": "Author"}).json()["id"]
+        for index in range(4)
+    ]
+    foreign_book = client.post("/books/", headers=stranger, data={"title": "Foreign", "author": "Author"}).json()["id"]
+
+    def offer(headers, book_id):
+        return client.post(
+            "/exchanges/", headers=headers, json={"book_id": book_id, "requester_id": 0, "owner_id": 0}
+        ).json()["id"]
+
+    first_ids = [offer(first_reader, book_ids[0]), offer(first_reader, book_ids[1])]
+    second_ids = [offer(second_reader, book_ids[2]), offer(second_reader, book_ids[3])]
+    foreign_id = offer(first_reader, foreign_book)
+    client.put(f"/exchanges/{second_ids[1]}/reject", headers=owner)
+    drain_outbox()
+    fake_socket_manager.events.clear()
+
+    with count_queries() as counter:
+        response = client.post(
+            "/exchanges/bulk",
+            headers=owner,
+            json={
+                "actions": [
+                    {"id": first_ids[0], "action": "accept"},
+                    {"id": first_ids[1], "action": "reject"},
+                    {"id": second_ids[0], "action": "accept"},
+                    {"id": second_ids[1], "action": "accept"},
+                    {"id": foreign_id, "action": "reject"},
+                    {"id": 9999, "action": "reject"},
+                ]
+            },
+        )
+    duplicate = client.post(
+        "/exchanges/bulk",
+        headers=owner,
+        json={"actions": [{"id": first_ids[0], "action": "accept"}, {"id": first_ids[0], "action": "reject"}]},
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(item["id"], item["ok"], item["status"]) for item in results] == [
+        (first_ids[0], True, "accepted"),
+        (first_ids[1], True, "rejected"),
+        (second_ids[0], True, "accepted"),
+        (second_ids[1], False, "rejected"),
+        (foreign_id, False, "pending"),
+        (9999, False, None),
+    ]
+    assert results[3]["detail"] == "Этот обмен уже был обработан"
+    assert results[5]["detail"] == "Обмен не найден"
+    locking_selects = [
+        statement for statement in counter.statements if statement.lstrip().upper().startswith("SELECT")
+        and "FROM exchanges" in statement
+    ]
+    assert len(locking_selects) == 1
+    assert client.get(f"/books/{book_ids[0]}").json()["status"] == "exchanged"
+    assert client.get(f"/books/{book_ids[1]}").json()["status"] == "available"
+    drain_outbox()
+    assert events_of(fake_socket_manager, "exchange_status_changed") == []
+    batches = {
+        recipient_id: payload["updates"]
+        for recipient_id, payload in events_of(fake_socket_manager, "exchange_status_batch")
+    }
+    assert [update["status"] for update in batches[client_user_id(db_session, "reader1")]] == ["accepted", "rejected"]
+    assert [update["exchange_id"] for update in batches[client_user_id(db_session, "reader2")]] == [second_ids[0]]
+    assert duplicate.status_code == 400
+
+
+@pytest.mark.integration
+def test_expiry_sweep_expires_stale_pending_exchanges_in_batches(
+    client, db_session, fake_socket_manager, drain_outbox
+):
+    owner = access_token_for(client, "owner")
+    reader = access_token_for(client, "reader")
+    reader_id = client_user_id(db_session, "reader")
+    owner_id = client_user_id(db_session, "owner")
+    old = datetime.now(timezone.utc) - timedelta(days=30)
+
+    books = [Book(title=f"Stale {index}", author="Author", owner_id=owner_id) for index in range(4)]
+    db_session.add_all(books)
+    db_session.flush()
+    stale = [
+        Exchange(book_id=book.id, requester_id=reader_id, owner_id=owner_id, created_at=old) for book in books[:3]
+    ]
+    accepted = Exchange(
+        book_id=books[3].id, requester_id=reader_id, owner_id=owner_id, status="accepted", created_at=old
+    )
+    db_session.add_all(stale + [accepted])
+    db_session.commit()
+    fresh_book_id = client.post("/books/", headers=owner, data={"title": "Fresh", "author": "A"}).json()["id"]
+    fresh_id = client.post(
+        "/exchanges/", headers=reader, json={"book_id": fresh_book_id, "requester_id": 0, "owner_id": 0}
+    ).json()["id"]
+    drain_outbox()
+    fake_socket_manager.events.clear()
+
+    expired = expire_stale_exchanges(timedelta(days=14), batch_size=2)
+    drain_outbox()
+    expiry_events = events_of(fake_socket_manager, "exchange_status_changed")
+    db_session.expire_all()
+    retry = client.post("/exchanges/", headers=reader, json={"book_id": books[0].id, "requester_id": 0, "owner_id": 0})
+
+    assert expired == 3
+    assert [db_session.get(Exchange, exchange.id).status for exchange in stale] == ["expired"] * 3
+    assert db_session.get(Exchange, accepted.id).status == "accepted"
+    assert db_session.get(Exchange, fresh_id).status == "pending"
+    assert sorted(payload["book_title"] for _, payload in expiry_events) == [
+        "Stale 0",
+        "Stale 1",
+        "Stale 2",
+    ]
+    assert {recipient_id for recipient_id, _ in expiry_events} == {reader_id}
+    assert retry.status_code == 200
+    assert client.get("/exchanges/my-requests", headers=reader).json()["status_counts"]["expired"] == 3
+
+
+@pytest.mark.integration
+def test_archived_exchanges_stay_visible_in_listings(client, db_session):
+    reader = access_token_for(client, "reader")
+    access_token_for(client, "owner")
+    owner_id = client_user_id(db_session, "owner")
+    reader_id = client_user_id(db_session, "reader")
+    now = datetime.now(timezone.utc)
+
+    rows = []
+    for index, (exchange_status, age_days) in enumerate(
+        [("rejected", 200), ("accepted", 150), ("expired", 120), ("rejected", 10), ("pending", 5)]
+    ):
+        book = Book(title=f"History {index}", author="Author", owner_id=owner_id)
+        db_session.add(book)
+        db_session.flush()
+        created_at = now - timedelta(days=age_days)
+        rows.append(
+            Exchange(
+                book_id=book.id,
+                requester_id=reader_id,
+                owner_id=owner_id,
+                status=exchange_status,
+                created_at=created_at,
+                updated_at=created_at,
+            )
+        )
+    db_session.add_all(rows)
+    db_session.commit()
+
+    moved = archive_closed_exchanges(timedelta(days=90), batch_size=2)
+    db_session.expire_all()
+
+    first_page = client.get("/exchanges/my-requests", headers=reader, params={"limit": 3})
+    second_page = client.get(
+        "/exchanges/my-requests", headers=reader, params={"limit": 3, "cursor": first_page.json()["next_cursor"]}
+    )
+    rejected = client.get("/exchanges/my-requests", headers=reader, params={"status": "rejected", "order": "asc"})
+
+    assert moved == 3
+    assert db_session.query(Exchange).count() == 2
+    assert db_session.query(ExchangeArchive).count() == 3
+    titles = [item["book"]["title"] for item in first_page.json()["exchanges"] + second_page.json()["exchanges"]]
+    assert titles == ["History 4", "History 3", "History 2", "History 1", "History 0"]
+    assert second_page.json()["next_cursor"] is None
+    assert first_page.json()["status_counts"] == {"pending": 1, "rejected": 2, "accepted": 1, "expired": 1}
+    assert [item["book"]["title"] for item in rejected.json()["exchanges"]] == ["History 0", "History 3"]
+
+
+@pytest.mark.integration
+def test_archived_accepted_exchange_still_blocks_new_offers_and_deletion(client, db_session):
+    owner = access_token_for(client, "owner")
+    alice, bob = access_token_for(client, "alice"), access_token_for(client, "bob")
+    book_id = client.post("/books/", headers=owner, data={"title": "Once only", "author": "Author"}).json()["id"]
+    exchange_id = client.post(
+        "/exchanges/", headers=alice, json={"book_id": book_id, "requester_id": 0, "owner_id": 0}
+    ).json()["id"]
+    client.put(f"/exchanges/{exchange_id}/accept", headers=owner)
+
+    moved = archive_closed_exchanges(timedelta(0), batch_size=10, now=datetime.now(timezone.utc) + timedelta(days=1))
+    reoffer = client.post("/exchanges/", headers=bob, json={"book_id": book_id, "requester_id": 0, "owner_id": 0})
+    delete_response = client.delete(f"/books/{book_id}", headers=owner)
+
+    db_session.expire_all()
+    assert moved == 1
+    assert reoffer.status_code == 400
+    assert reoffer.json()["detail"] == exchanges_service.BOOK_NOT_AVAILABLE
+    assert db_session.query(Exchange).filter(Exchange.book_id == book_id).count() == 0
+    assert delete_response.status_code == 400
+    assert db_session.get(Book, book_id) is not None
+
+
+@pytest.mark.integration
+def test_exchange_counters_follow_every_transition(client, db_session, fake_socket_manager, drain_outbox):
+    owner = access_token_for(client, "owner")
+    reader = access_token_for(client, "reader")
+    owner_id = client_user_id(db_session, "owner")
+    book_ids = [
+        client.post("/books/", headers=owner, data={"title": f"Counted {index}", "author": "A"}).json()["id"]
+        for index in range(4)
+    ]
+
+    def counters(headers):
+        return client.get("/exchanges/counters", headers=headers).json()
+
+    empty = counters(owner)
+    exchange_ids = [
+        client.post(
+            "/exchanges/", headers=reader, json={"book_id": book_id, "requester_id": 0, "owner_id": 0}
+        ).json()["id"]
+        for book_id in book_ids
+    ]
+    after_create = (counters(owner), counters(reader))
+
+    client.put(f"/exchanges/{exchange_ids[0]}/accept", headers=owner)
+    client.post(
+        "/exchanges/bulk",
+        headers=owner,
+        json={"actions": [{"id": exchange_ids[1], "action": "reject"}, {"id": exchange_ids[0], "action": "reject"}]},
+    )
+    client.delete(f"/exchanges/{exchange_ids[2]}/cancel", headers=reader)
+    after_decisions = (counters(owner), counters(reader))
+
+    db_session.query(Exchange).filter(Exchange.id == exchange_ids[3]).update(
+        {"created_at": datetime.now(timezone.utc) - timedelta(days=30)}
+    )
+    db_session.commit()
+    expire_stale_exchanges(timedelta(days=14), batch_size=10)
+    drain_outbox()
+
+    assert empty == {"pending_offers": 0, "open_requests": 0}
+    assert after_create == ({"pending_offers": 4, "open_requests": 0}, {"pending_offers": 0, "open_requests": 4})
+    assert after_decisions == ({"pending_offers": 1, "open_requests": 0}, {"pending_offers": 0, "open_requests": 1})
+    assert counters(owner) == {"pending_offers": 0, "open_requests": 0}
+    pushed_to_owner = [
+        payload for recipient_id, payload in events_of(fake_socket_manager, "exchange_counters") if recipient_id == owner_id
+    ]
+    assert [payload["pending_offers"] for payload in pushed_to_owner] == [1, 2, 3, 4, 3, 2, 1, 0]
+
+
+@pytest.mark.integration
+def test_admin_deletions_release_pending_counters(client, db_session):
+    owner = access_token_for(client, "owner")
+    reader = access_token_for(client, "reader")
+    leaver = access_token_for(client, "leaver")
+    db_session.add(
+        User(
+            email="admin@example.com",
+            username="admin",
+            password_hash=get_password_hash("Password123"),
+            role=UserRole.ADMIN,
+            is_active=True,
+        )
+    )
+    db_session.commit()
+    admin = access_token_for_existing(client, "admin")
+    book_ids = [
+        client.post("/books/", headers=owner, data={"title": f"Removed {index}", "author": "A"}).json()["id"]
+        for index in range(2)
+    ]
+    client.post("/exchanges/", headers=reader, json={"book_id": book_ids[0], "requester_id": 0, "owner_id": 0})
+    client.post("/exchanges/", headers=leaver, json={"book_id": book_ids[1], "requester_id": 0, "owner_id": 0})
+
+    def counters(headers):
+        return client.get("/exchanges/counters", headers=headers).json()
+
+    before = counters(owner)
+    book_deleted = client.delete(f"/books/{book_ids[0]}", headers=admin)
+    user_deleted = client.delete(f"/auth/admin/users/{client_user_id(db_session, 'leaver')}", headers=admin)
+
+    assert before == {"pending_offers": 2, "open_requests": 0}
+    assert book_deleted.status_code == 200
+    assert user_deleted.status_code == 200
+    assert counters(owner) == {"pending_offers": 0, "open_requests": 0}
+    assert counters(reader) == {"pending_offers": 0, "open_requests": 0}
+    assert client.get("/exchanges/my-offers", headers=owner).json()["exchanges"] == []
+
+
+@pytest.mark.integration
+def test_reconnect_replays_missed_deltas_or_falls_back_to_snapshot(
+    client, db_session, fake_socket_manager, drain_outbox, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(outbox_dispatcher, "replay_buffer_size", 2)
+    owner = access_token_for(client, "owner")
+    reader = access_token_for(client, "reader")
+    owner_id = client_user_id(db_session, "owner")
+    book_ids = [
+        client.post("/books/", headers=owner, data={"title": f"Replayed {index}", "author": "A"}).json()["id"]
+        for index in range(4)
+    ]
+    exchange_ids = [
+        client.post(
+            "/exchanges/", headers=reader, json={"book_id": book_id, "requester_id": 0, "owner_id": 0}
+        ).json()["id"]
+        for book_id in book_ids
+    ]
+    client.put(f"/exchanges/{exchange_ids[0]}/accept", headers=owner)
+    drain_outbox()
+
+    created_seqs = [
+        seq for (kind, _, _), (_, seq) in zip(fake_socket_manager.events, fake_socket_manager.seqs)
+        if kind == "exchange_created"
+    ]
+    counters_seqs = {
+        seq for (kind, _, _), (_, seq) in zip(fake_socket_manager.events, fake_socket_manager.seqs)
+        if kind == "exchange_counters"
+    }
+    resumed = load_exchange_sync(owner_id, 2)
+    up_to_date = load_exchange_sync(owner_id, 4)
+    too_far_behind = load_exchange_sync(owner_id, 1)
+    unknown = load_exchange_sync(owner_id, 9)
+    fresh = load_exchange_sync(owner_id, None)
+
+    assert created_seqs == [1, 2, 3, 4]
+    assert counters_seqs == {None}
+    assert [seq for seq, _, _ in resumed.missed] == [3, 4]
+    assert [payload["id"] for _, _, payload in resumed.missed] == exchange_ids[2:]
+    assert resumed.snapshot == []
+    assert up_to_date.missed == []
+    assert too_far_behind.missed is None
+    assert unknown.missed is None
+    assert fresh.seq == 4
+    assert [item["id"] for item in fresh.snapshot] == exchange_ids[1:]
+    assert fresh.counters == {"pending_offers": 3, "open_requests": 0}
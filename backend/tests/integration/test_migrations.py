@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, text
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def alembic_config() -> Config:
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    return config
+
+
+@pytest.mark.integration
+def test_migration_chain_builds_schema_with_hot_path_indexes(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    database_url = f"sqlite:///{(tmp_path / 'migrations.sqlite3').as_posix()}"
+    monkeypatch.setenv("DATABASE_URL", database_url)
+    config = alembic_config()
+
+    command.upgrade(config, "head")
+
+    engine = create_engine(database_url)
+    try:
+        inspector = inspect(engine)
+        book_indexes = {index["name"] for index in inspector.get_indexes("books")}
+        exchange_indexes = {index["name"]: index for index in inspector.get_indexes("exchanges")}
+        table_names = set(inspector.get_table_names())
+        event_columns = {column["name"] for column in inspector.get_columns("exchange_events")}
+        with engine.connect() as connection:
+            fts_table = connection.execute(
+                text("SELECT name FROM sqlite_master WHERE name = 'books_fts'")
+            ).scalar()
+    finally:
+        engine.dispose()
+
+    assert {"ix_books_status_created_at_id", "ix_books_owner_id_status"} <= book_indexes
+    assert {
+        "ix_exchanges_requester_id_status_created_at",
+        "ix_exchanges_owner_id_status_created_at",
+        "ix_exchanges_requester_id_created_at",
+        "ix_exchanges_status_created_at",
+    } <= set(exchange_indexes)
+    assert "ix_exchanges_owner_id_status" not in exchange_indexes
+    assert exchange_indexes["uq_exchanges_active_book"]["unique"]
+    assert fts_table == "books_fts"
+    assert {
+        "exchange_events",
+        "exchanges_archive",
+        "exchange_counters",
+        "exchange_streams",
+        "exchange_replay",
+    } <= table_names
+    assert "attempts" in event_columns
+
+    command.downgrade(config, "base")
+
+
+@pytest.mark.integration
+def test_active_exchange_index_migration_keeps_one_active_exchange_per_book(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    database_url = f"sqlite:///{(tmp_path / 'migrations.sqlite3').as_posix()}"
+    monkeypatch.setenv("DATABASE_URL", database_url)
+    config = alembic_config()
+    command.upgrade(config, "0002_books_search")
+
+    engine = create_engine(database_url)
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO users (id, email, username, password_hash, role, is_active) VALUES "
+                    "(1, 'owner@example.com', 'owner', 'x', 'USER', 1), "
+                    "(2, 'reader@example.com', 'reader', 'x', 'USER', 1)"
+                )
+            )
+            connection.execute(
+                text(
+                    "INSERT INTO books (id, title, author, owner_id, status) VALUES "
+                    "(1, 'Dune', 'Frank Herbert', 1, 'reserved'), (2, 'Solaris', 'Stanislaw Lem', 1, 'available')"
+                )
+            )
+            connection.execute(
+                text(
+                    "INSERT INTO exchanges (id, book_id, requester_id, owner_id, status) VALUES "
+                    "(1, 1, 2, 1, 'pending'), (2, 1, 2, 1, 'accepted'), (3, 1, 2, 1, 'pending'), "
+                    "(4, 2, 2, 1, 'rejected'), (5, 2, 2, 1, 'pending'), (6, 2, 2, 1, 'pending')"
+                )
+            )
+
+        command.upgrade(config, "0003_hot_path_indexes")
+
+        with engine.connect() as connection:
+            statuses = dict(connection.execute(text("SELECT id, status FROM exchanges")).all())
+    finally:
+        engine.dispose()
+
+    assert statuses == {
+        1: "cancelled",
+        2: "accepted",
+        3: "cancelled",
+        4: "rejected",
+        5: "pending",
+        6: "cancelled",
+    }
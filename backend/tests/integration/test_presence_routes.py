@@ -0,0 +1,40 @@
+import pytest
+
+from app.routes.presence import MAX_PRESENCE_IDS
+
+
+def register_user(client, username: str):
+    return client.post(
+        "/auth/register",
+        json={
+            "email": f"{username}@example.com",
+            "username": username,
+            "password": "Password123",
+            "full_name": f"{username.title()} User",
+            "city": "Moscow",
+        },
+    )
+
+
+@pytest.mark.integration
+def test_presence_returns_online_state_for_requested_ids(client, fake_socket_manager):
+    anonymous = client.get("/presence", params={"ids": "1"})
+    register_user(client, "watcher")
+    client.portal.call(fake_socket_manager.presence.session_opened, 7)
+
+    response = client.get("/presence", params={"ids": "7,8,7"})
+
+    assert anonymous.status_code == 401
+    assert response.status_code == 200
+    assert response.json() == {"users": {"7": True, "8": False}}
+
+
+@pytest.mark.integration
+def test_presence_rejects_malformed_or_oversized_id_lists(client):
+    register_user(client, "watcher")
+
+    malformed = client.get("/presence", params={"ids": "7,abc"})
+    oversized = client.get("/presence", params={"ids": ",".join(str(i) for i in range(MAX_PRESENCE_IDS + 1))})
+
+    assert malformed.status_code == 422
+    assert oversized.status_code == 400
@@ -0,0 +1,78 @@
+import pytest
+
+from app.models import Book, User, UserRole
+from app.security import get_password_hash
+from app.services import sitemap as sitemap_service
+
+
+@pytest.fixture
+def owner(db_session):
+    user = User(
+        email="owner@example.com",
+        username="owner",
+        password_hash=get_password_hash("Password123"),
+        role=UserRole.USER,
+        is_active=True,
+    )
+    db_session.add(user)
+    db_session.commit()
+    db_session.refresh(user)
+    return user
+
+
+@pytest.mark.integration
+def test_sitemap_index_lists_static_pages_and_non_empty_book_shards(
+    client, db_session, owner, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(sitemap_service.settings, "sitemap_shard_size", 2)
+    db_session.add_all(
+        [
+            Book(title="One", author="Author", owner_id=owner.id),
+            Book(title="Two", author="Author", owner_id=owner.id),
+            Book(title="Three", author="Author", owner_id=owner.id, status="exchanged"),
+            Book(title="Four", author="Author", owner_id=owner.id, status="exchanged"),
+            Book(title="Five", author="Author", owner_id=owner.id),
+        ]
+    )
+    db_session.commit()
+
+    index_response = client.get("/sitemap.xml")
+    first_shard = client.get("/sitemap-books-0.xml")
+    empty_shard = client.get("/sitemap-books-1.xml")
+    pages_response = client.get("/sitemap-pages.xml")
+
+    assert index_response.status_code == 200
+    assert "/sitemap-pages.xml" in index_response.text
+    assert "/sitemap-books-0.xml" in index_response.text
+    assert "/sitemap-books-1.xml" not in index_response.text
+    assert "/sitemap-books-2.xml" in index_response.text
+    assert first_shard.text.count("<url>") == 2
+    assert "/book/1</loc>" in first_shard.text
+    assert empty_shard.status_code == 404
+    assert "/catalog</loc>" in pages_response.text
+
+
+@pytest.mark.integration
+def test_sitemap_shard_is_cached_until_its_books_change(
+    client, db_session, owner, monkeypatch: pytest.MonkeyPatch
+):
+    db_session.add(Book(title="One", author="Author", owner_id=owner.id))
+    db_session.commit()
+
+    first_response = client.get("/sitemap-books-0.xml")
+    calls = []
+    original_stream = sitemap_service.stream_shard
+    monkeypatch.setattr(
+        sitemap_service,
+        "stream_shard",
+        lambda shard, state: calls.append(shard) or original_stream(shard, state),
+    )
+    cached_response = client.get("/sitemap-books-0.xml")
+
+    db_session.add(Book(title="Two", author="Author", owner_id=owner.id))
+    db_session.commit()
+    changed_response = client.get("/sitemap-books-0.xml")
+
+    assert cached_response.content == first_response.content
+    assert calls == [0]
+    assert changed_response.text.count("<url>") == 2
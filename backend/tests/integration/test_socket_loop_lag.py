@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+
+from app import websockets
+from app.main import socket_manager
+
+SLOW_QUERY_SECONDS = 0.2
+STORM_SIZE = 20
+
+
+def slow_exchange_sync(user_id: int, last_seq) -> websockets.ExchangeSync:
+    time.sleep(SLOW_QUERY_SECONDS)
+    return websockets.ExchangeSync(0, [], [], {"pending_offers": 0, "open_requests": 0})
+
+
+async def connect_storm_with_loop_lag() -> float:
+    """Запустить STORM_SIZE синхронизаций после подключения и вернуть максимальную задержку event loop."""
+    max_lag = 0.0
+    storm = asyncio.gather(
+        *(socket_manager.resume(f"sid-{user_id}", user_id, 0) for user_id in range(STORM_SIZE))
+    )
+    while not storm.done():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        max_lag = max(max_lag, time.perf_counter() - started - 0.01)
+    await storm
+    return max_lag
+
+
+@pytest.mark.integration
+def test_connect_storm_does_not_block_event_loop(client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(websockets, "load_exchange_sync", slow_exchange_sync)
+
+    storm = client.portal.start_task_soon(connect_storm_with_loop_lag)
+    started = time.perf_counter()
+    response = client.get("/health/live")
+    live_seconds = time.perf_counter() - started
+    max_lag = storm.result(timeout=30)
+
+    assert response.status_code == 200
+    # Последовательно на event loop шторм занял бы STORM_SIZE * SLOW_QUERY_SECONDS = 4 с
+    assert live_seconds < 1
+    assert max_lag < SLOW_QUERY_SECONDS
+
+
+@pytest.mark.integration
+def test_slow_exchange_sync_times_out(client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(websockets, "load_exchange_sync", slow_exchange_sync)
+    monkeypatch.setattr(socket_manager, "db_timeout_seconds", SLOW_QUERY_SECONDS / 4)
+
+    started = time.perf_counter()
+    client.portal.call(socket_manager.resume, "sid-1", 1, 0)
+
+    assert time.perf_counter() - started < SLOW_QUERY_SECONDS
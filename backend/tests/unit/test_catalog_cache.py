@@ -0,0 +1,65 @@
+import pytest
+
+from app.models import Book, User
+from app.routes.books import _load_catalog_page
+from app.services import catalog_cache
+from app.services.catalog_cache import TTLCache, book_count_key, clean_filter
+
+
+@pytest.mark.unit
+def test_ttl_cache_evicts_least_recently_used_entry():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+@pytest.mark.unit
+def test_ttl_cache_expires_entries(monkeypatch: pytest.MonkeyPatch):
+    now = [100.0]
+    monkeypatch.setattr(catalog_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache(max_entries=10, ttl_seconds=5)
+    cache.set("key", "value")
+
+    now[0] += 6
+
+    assert cache.get("key") is None
+
+
+@pytest.mark.unit
+def test_ttl_cache_drops_values_computed_before_clear():
+    cache = TTLCache(max_entries=10, ttl_seconds=60)
+    generation = cache.generation
+    cache.clear()
+    cache.set("count", 42, generation=generation)
+
+    assert cache.get("count") is None
+
+
+@pytest.mark.unit
+def test_equal_book_count_keys_give_equal_counts(db_session):
+    owner = User(email="owner@example.com", username="owner", password_hash="x")
+    db_session.add(owner)
+    db_session.flush()
+    for genre, condition in [("Фантастика", "good"), ("фантастика", "good"), ("fantasy", "good "), ("Fantasy", "new")]:
+        db_session.add(Book(title="Дюна", author="Герберт", genre=genre, condition=condition, owner_id=owner.id))
+    db_session.commit()
+
+    filters = [
+        (genre, condition, search)
+        for genre in [None, "", "  ", "Фантастика", " фантастика ", "фантастика", "fantasy", " FANTASY"]
+        for condition in [None, " ", "good", " good ", "good ", "new"]
+        for search in [None, "Дюна", " дюна, "]
+    ]
+    counts = {}
+    for genre, condition, search in filters:
+        genre, condition = clean_filter(genre), clean_filter(condition)
+        key = book_count_key("catalog", genre, condition, search)
+        catalog_cache.invalidate_book_counts()
+        total = _load_catalog_page(db_session, 1, 10, genre, condition, search, None)["total_count"]
+        assert counts.setdefault(key, total) == total, key
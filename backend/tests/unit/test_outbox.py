@@ -0,0 +1,230 @@
+import asyncio
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import ExchangeEvent
+from app.services import outbox
+from app.services.outbox import OutboxDispatcher, record_event
+from app.websockets import SocketManager
+
+
+class FlakySocketManager:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.events: list[tuple[str, int, dict]] = []
+
+    async def deliver_event(self, event_type: str, recipient_id: int, payload: dict, seq=None):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("socket server unavailable")
+        self.events.append((event_type, recipient_id, payload))
+
+
+def seed_events(count: int) -> None:
+    db = SessionLocal()
+    try:
+        for index in range(count):
+            record_event(db, "exchange_status_changed", 7, {"exchange_id": index, "status": "accepted"}, index)
+        db.commit()
+    finally:
+        db.close()
+
+
+def remaining_events() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(ExchangeEvent).count()
+    finally:
+        db.close()
+
+
+async def drain_with(socket_manager, batch_size: int = 100) -> int:
+    dispatcher = OutboxDispatcher(batch_size=batch_size, poll_interval_seconds=60)
+    dispatcher.start(socket_manager)
+    try:
+        return await dispatcher.drain()
+    finally:
+        await dispatcher.stop()
+
+
+@pytest.mark.unit
+def test_dispatcher_redelivers_batch_after_failed_send():
+    seed_events(3)
+    socket_manager = FlakySocketManager(failures=1)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(drain_with(socket_manager))
+    assert remaining_events() == 3
+
+    delivered = asyncio.run(drain_with(socket_manager))
+
+    assert delivered == 3
+    assert [payload["exchange_id"] for _, _, payload in socket_manager.events] == [0, 1, 2]
+    assert remaining_events() == 0
+
+
+@pytest.mark.unit
+def test_dispatcher_uses_constant_queries_per_batch(count_queries):
+    seed_events(1)
+    with count_queries() as small:
+        asyncio.run(drain_with(FlakySocketManager()))
+    seed_events(20)
+    with count_queries() as large:
+        asyncio.run(drain_with(FlakySocketManager()))
+
+    assert large.count == small.count
+
+
+@pytest.mark.unit
+def test_dispatcher_drains_in_batches():
+    seed_events(5)
+    socket_manager = FlakySocketManager()
+
+    delivered = asyncio.run(drain_with(socket_manager, batch_size=2))
+
+    assert delivered == 2
+    assert remaining_events() == 3
+
+
+class PoisonSocketManager(FlakySocketManager):
+    def __init__(self, poison_exchange_id: int):
+        super().__init__()
+        self.poison_exchange_id = poison_exchange_id
+
+    async def deliver_event(self, event_type: str, recipient_id: int, payload: dict, seq=None):
+        if payload["exchange_id"] == self.poison_exchange_id:
+            raise ValueError("cannot serialize payload")
+        await super().deliver_event(event_type, recipient_id, payload, seq)
+
+
+def attempts_by_exchange() -> dict[int, int]:
+    db = SessionLocal()
+    try:
+        return dict(db.query(ExchangeEvent.exchange_id, ExchangeEvent.attempts).all())
+    finally:
+        db.close()
+
+
+async def drain_until_idle(dispatcher: OutboxDispatcher, rounds: int) -> None:
+    for _ in range(rounds):
+        try:
+            await dispatcher.drain()
+        except Exception:
+            pass
+
+
+@pytest.mark.unit
+def test_dispatcher_parks_poison_event_and_delivers_the_rest():
+    seed_events(3)
+    socket_manager = PoisonSocketManager(poison_exchange_id=1)
+
+    async def scenario():
+        dispatcher = OutboxDispatcher(batch_size=100, poll_interval_seconds=60, max_attempts=3)
+        dispatcher.start(socket_manager)
+        try:
+            await drain_until_idle(dispatcher, rounds=5)
+        finally:
+            await dispatcher.stop()
+
+    asyncio.run(scenario())
+
+    # Событие 0 доставлялось вместе с каждой упавшей пачкой, событие 2 — после откладывания 1
+    assert {payload["exchange_id"] for _, _, payload in socket_manager.events} == {0, 2}
+    assert attempts_by_exchange() == {1: 3}
+
+
+@pytest.mark.unit
+def test_dispatcher_isolates_events_when_the_failing_one_is_unknown(monkeypatch: pytest.MonkeyPatch):
+    seed_events(3)
+    real_assign_seqs = outbox.assign_seqs
+
+    def assign_seqs_failing_on_second(db, events, buffer_size):
+        if any(event.payload["exchange_id"] == 1 for event in events):
+            raise ValueError("cannot store replay payload")
+        return real_assign_seqs(db, events, buffer_size)
+
+    monkeypatch.setattr(outbox, "assign_seqs", assign_seqs_failing_on_second)
+    socket_manager = FlakySocketManager()
+
+    async def scenario():
+        dispatcher = OutboxDispatcher(batch_size=100, poll_interval_seconds=60, max_attempts=2)
+        dispatcher.start(socket_manager)
+        try:
+            await drain_until_idle(dispatcher, rounds=6)
+        finally:
+            await dispatcher.stop()
+
+    asyncio.run(scenario())
+
+    assert [payload["exchange_id"] for _, _, payload in socket_manager.events] == [0, 2]
+    assert attempts_by_exchange() == {1: 2}
+
+
+class WindowedEmitRecorder:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls: list[tuple[str, dict]] = []
+
+    async def __call__(self, event, data=None, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("socket server unavailable")
+        self.calls.append((event, data))
+
+
+def coalescing_socket_manager(monkeypatch: pytest.MonkeyPatch, recorder: WindowedEmitRecorder) -> SocketManager:
+    manager = SocketManager()
+    manager.coalescer.window_seconds = 0.1
+    manager.coalescer.max_delay_seconds = 0.1
+    monkeypatch.setattr(manager.sio, "emit", recorder)
+    return manager
+
+
+@pytest.mark.unit
+def test_dispatcher_acknowledges_coalesced_events_only_after_the_window_flushes(monkeypatch: pytest.MonkeyPatch):
+    seed_events(3)
+    recorder = WindowedEmitRecorder()
+    manager = coalescing_socket_manager(monkeypatch, recorder)
+
+    async def inside_window():
+        await asyncio.sleep(0.03)
+        return recorder.calls[:], remaining_events()
+
+    async def scenario():
+        dispatcher = OutboxDispatcher(batch_size=100, poll_interval_seconds=60)
+        dispatcher.start(manager)
+        try:
+            probe = asyncio.create_task(inside_window())
+            delivered = await dispatcher.drain()
+            return delivered, await probe
+        finally:
+            await dispatcher.stop()
+
+    delivered, (calls_in_window, remaining_in_window) = asyncio.run(scenario())
+
+    # Пока окно склейки открыто, события не отправлены и остаются в outbox
+    assert calls_in_window == []
+    assert remaining_in_window == 3
+
+    assert delivered == 3
+    assert [event for event, _ in recorder.calls] == ["exchange_batch"]
+    assert remaining_events() == 0
+
+
+@pytest.mark.unit
+def test_dispatcher_keeps_events_whose_coalesced_flush_failed(monkeypatch: pytest.MonkeyPatch):
+    seed_events(3)
+    recorder = WindowedEmitRecorder(failures=1)
+    manager = coalescing_socket_manager(monkeypatch, recorder)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(drain_with(manager))
+    assert remaining_events() == 3
+
+    delivered = asyncio.run(drain_with(manager))
+
+    assert delivered == 3
+    batch = recorder.calls[0][1]["events"]
+    assert [item["data"]["updates"][0]["exchange_id"] for item in batch] == [0, 1, 2]
+    assert remaining_events() == 0
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from app.services.sessions import SessionRegistry
+
+
+@pytest.mark.unit
+def test_registry_tracks_sessions_per_user_and_reports_last_disconnect():
+    registry = SessionRegistry()
+
+    assert registry.add("a", 1) is True
+    assert registry.add("b", 1) is False
+    assert registry.add("c", 2) is True
+    assert registry.online_count == 2
+    assert registry.sessions_of(1) == {"a", "b"}
+    assert registry.user_of("c") == 2
+
+    assert registry.remove("a") == (1, False)
+    assert registry.is_online(1)
+    assert registry.remove("b") == (1, True)
+    assert not registry.is_online(1)
+    assert registry.remove("b") == (None, False)
+    assert registry.online_count == 1
+    assert registry.session_count == 1
+
+
+@pytest.mark.unit
+def test_reauthenticating_sid_as_another_user_moves_it():
+    registry = SessionRegistry()
+    registry.add("a", 1)
+
+    assert registry.add("a", 1) is False
+    assert registry.add("a", 2) is True
+    assert not registry.is_online(1)
+    assert registry.sessions_of(2) == {"a"}
+    assert registry.session_count == 1
+
+
+@pytest.mark.unit
+def test_disconnect_churn_does_not_scan_online_users():
+    registry = SessionRegistry()
+    sessions = [(f"sid-{index}", index % 20_000 + 1) for index in range(50_000)]
+
+    started = time.perf_counter()
+    for sid, user_id in sessions:
+        registry.add(sid, user_id)
+    for sid, _ in sessions:
+        registry.remove(sid)
+    elapsed = time.perf_counter() - started
+
+    assert registry.online_count == 0
+    assert registry.session_count == 0
+    # Перебор пользователей на каждое отключение занимает здесь десятки секунд
+    assert elapsed < 5
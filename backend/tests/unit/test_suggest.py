@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.suggest import SuggestionIndex
+
+
+def book(title: str, author: str):
+    return SimpleNamespace(title=title, author=author)
+
+
+def built_index(*books):
+    index = SuggestionIndex(rebuild_interval_seconds=300)
+    index._built_at = 0.0
+    for item in books:
+        index.apply_change(None, item)
+    return index
+
+
+@pytest.mark.unit
+def test_suggestion_index_matches_any_word_prefix_case_insensitively():
+    index = built_index(book("Война и мир", "Лев Толстой"), book("Анна Каренина", "Лев Толстой"))
+
+    assert index.search("толс", 5) == [{"value": "Лев Толстой", "kind": "author"}]
+    assert index.search("МИР", 5) == [{"value": "Война и мир", "kind": "title"}]
+
+
+@pytest.mark.unit
+def test_suggestion_index_forgets_removed_books_and_prunes_branches():
+    dune = book("Dune", "Frank Herbert")
+    index = built_index(dune, book("Dune Messiah", "Frank Herbert"))
+
+    index.apply_change(dune, None)
+
+    assert index.search("dune", 5) == [{"value": "Dune Messiah", "kind": "title"}]
+    assert index.search("frank", 5) == [{"value": "Frank Herbert", "kind": "author"}]
+    index.apply_change(book("Dune Messiah", "Frank Herbert"), None)
+    assert index._root.children == {}
+
+
+@pytest.mark.unit
+def test_suggestion_index_ignores_changes_until_built():
+    index = SuggestionIndex(rebuild_interval_seconds=300)
+    index.apply_change(None, book("Dune", "Frank Herbert"))
+
+    assert index.search("dune", 5) == []
+
+
+@pytest.mark.unit
+def test_suggestion_index_fills_up_with_fuzzy_matches_for_typos():
+    index = built_index(book("Гарри Поттер", "Джоан Роулинг"), book("Война и мир", "Лев Толстой"))
+
+    assert index.search("гари потер", 5) == [{"value": "Гарри Поттер", "kind": "title"}]
+    assert index.search("толстй", 5) == [{"value": "Лев Толстой", "kind": "author"}]
+    assert index.search("ъъъ", 5) == []
+
+
+@pytest.mark.unit
+def test_suggestion_index_ranks_prefix_matches_before_fuzzy_ones():
+    index = built_index(book("Dune", "Frank Herbert"), book("Dunw", "Anonymous"))
+
+    assert index.search("dunw", 5) == [{"value": "Dunw", "kind": "title"}, {"value": "Dune", "kind": "title"}]
+    assert index.search("dunw", 1) == [{"value": "Dunw", "kind": "title"}]
+
+
+@pytest.mark.unit
+def test_suggestion_index_drops_fuzzy_candidates_of_removed_books():
+    dune = book("Dune", "Frank Herbert")
+    index = built_index(dune)
+
+    index.apply_change(dune, None)
+
+    assert index.search("dunw", 5) == []
+    assert index._values == {}
@@ -0,0 +1,312 @@
+import asyncio
+
+import pytest
+from jose import jwt
+
+from app.security import ALGORITHM, create_access_token, create_refresh_token
+from app.services.socket_backend import LocalPresence, MemoryPubSubManager
+from app import websockets
+from app.websockets import SocketManager, user_room
+
+
+class EmitRecorder:
+    def __init__(self):
+        self.calls: list[tuple[str, dict, dict]] = []
+
+    async def __call__(self, event, data=None, **kwargs):
+        self.calls.append((event, data, kwargs))
+
+
+async def connect_sessions(manager: SocketManager, count: int) -> list[str]:
+    return [await manager.sio.manager.connect(f"eio-{index}", "/") for index in range(count)]
+
+
+@pytest.mark.unit
+def test_sessions_join_user_room_and_move_on_reauthentication():
+    manager = SocketManager()
+
+    async def scenario():
+        first, second = await connect_sessions(manager, 2)
+        await manager.bind_session(first, 5)
+        await manager.bind_session(second, 5)
+        rooms = manager.sio.manager.rooms["/"]
+        assert set(rooms[user_room(5)]) == {first, second}
+
+        await manager.bind_session(second, 6)
+        assert set(rooms[user_room(5)]) == {first}
+        assert set(rooms[user_room(6)]) == {second}
+        assert manager.sessions.sessions_of(6) == {second}
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+def test_deliver_event_emits_once_per_user_regardless_of_tabs(monkeypatch: pytest.MonkeyPatch):
+    manager = SocketManager()
+    manager.coalescer.window_seconds = 0
+    recorder = EmitRecorder()
+
+    async def scenario():
+        for sid in await connect_sessions(manager, 3):
+            await manager.bind_session(sid, 7)
+        monkeypatch.setattr(manager.sio, "emit", recorder)
+        await manager.deliver_event("exchange_status_changed", 7, {"exchange_id": 1, "status": "accepted"}, 3)
+
+    asyncio.run(scenario())
+
+    assert recorder.calls == [
+        ("exchange_updated", {"seq": 3, "updates": [{"exchange_id": 1, "status": "accepted"}]}, {"room": user_room(7)})
+    ]
+
+
+async def wait_for(condition, attempts: int = 100):
+    for _ in range(attempts):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("условие не выполнилось")
+
+
+@pytest.mark.unit
+def test_emit_from_one_worker_reaches_sockets_of_another_worker():
+    presence = LocalPresence()
+    worker_a = SocketManager(MemoryPubSubManager(channel="test-fanout"), presence)
+    worker_b = SocketManager(MemoryPubSubManager(channel="test-fanout"), presence)
+    sent: list[str] = []
+
+    async def record_packet(eio_sid, pkt):
+        sent.append(eio_sid)
+
+    async def scenario():
+        worker_a.start()
+        worker_b.start()
+        worker_a.sio._send_eio_packet = record_packet
+        try:
+            first, second = await connect_sessions(worker_a, 2)
+            await worker_a.bind_session(first, 7)
+            await worker_a.bind_session(second, 7)
+            assert await worker_b.online_count() == 1
+
+            await worker_b.deliver_event("exchange_counters", 7, {"pending_offers": 1, "open_requests": 0})
+            await wait_for(lambda: len(sent) == 2)
+            assert sorted(sent) == ["eio-0", "eio-1"]
+
+            await worker_a.stop()
+            assert await worker_b.online_count() == 0
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+def test_burst_for_one_user_is_coalesced_into_single_batch(monkeypatch: pytest.MonkeyPatch):
+    manager = SocketManager()
+    recorder = EmitRecorder()
+    monkeypatch.setattr(manager.sio, "emit", recorder)
+
+    async def scenario():
+        await manager.deliver_event("exchange_created", 7, {"id": 1}, 1)
+        await manager.deliver_event("exchange_counters", 7, {"pending_offers": 1, "open_requests": 0})
+        await manager.deliver_event("exchange_created", 7, {"id": 2}, 2)
+        await manager.deliver_event("exchange_counters", 7, {"pending_offers": 2, "open_requests": 0})
+        await manager.deliver_event("exchange_status_changed", 8, {"exchange_id": 3, "status": "accepted"}, 1)
+        assert recorder.calls == []
+        await wait_for(lambda: len(recorder.calls) == 2)
+
+    asyncio.run(scenario())
+
+    by_room = {kwargs["room"]: (event, data) for event, data, kwargs in recorder.calls}
+    assert by_room[user_room(7)] == (
+        "exchange_batch",
+        {
+            "events": [
+                {"event": "exchange_created", "data": {"seq": 1, "exchange": {"id": 1}}},
+                {"event": "exchange_created", "data": {"seq": 2, "exchange": {"id": 2}}},
+                {"event": "exchange_counters", "data": {"pending_offers": 2, "open_requests": 0}},
+            ]
+        },
+    )
+    assert by_room[user_room(8)] == (
+        "exchange_updated",
+        {"seq": 1, "updates": [{"exchange_id": 3, "status": "accepted"}]},
+    )
+
+
+@pytest.mark.unit
+def test_steady_stream_is_flushed_within_max_delay(monkeypatch: pytest.MonkeyPatch):
+    manager = SocketManager()
+    manager.coalescer.window_seconds = 0.05
+    manager.coalescer.max_delay_seconds = 0.15
+    recorder = EmitRecorder()
+    monkeypatch.setattr(manager.sio, "emit", recorder)
+
+    async def scenario() -> float:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        seq = 0
+        # События идут чаще окна, поэтому без верхней границы пачка не ушла бы никогда
+        while not recorder.calls:
+            seq += 1
+            await manager.deliver_event("exchange_created", 7, {"id": seq}, seq)
+            await asyncio.sleep(0.02)
+        first_flush = loop.time() - started
+        await manager.stop()
+        return first_flush
+
+    first_flush = asyncio.run(scenario())
+
+    assert first_flush < 0.3
+    delivered = [
+        item["data"]["seq"]
+        for event, data, _ in recorder.calls
+        for item in (data["events"] if event == "exchange_batch" else [{"data": data}])
+    ]
+    assert delivered == list(range(1, len(delivered) + 1))
+
+
+@pytest.mark.unit
+def test_presence_changes_reach_only_subscribers():
+    manager = SocketManager()
+    sent: list[tuple[str, str]] = []
+
+    async def record_packet(eio_sid, pkt):
+        sent.append((eio_sid, pkt.data))
+
+    manager.sio._send_eio_packet = record_packet
+    subscribe = manager.sio.handlers["/"]["subscribe_presence"]
+    unsubscribe = manager.sio.handlers["/"]["unsubscribe_presence"]
+    disconnect = manager.sio.handlers["/"]["disconnect"]
+
+    async def scenario():
+        watcher, bystander, watched = await connect_sessions(manager, 3)
+        await manager.bind_session(watcher, 1)
+        await manager.bind_session(bystander, 2)
+
+        ack = await subscribe(watcher, {"user_ids": [5, 2, 5]})
+        assert ack == {"users": {"5": False, "2": True}}
+        assert await subscribe(bystander, {"user_ids": "5"}) == {"error": 'Ожидается {"user_ids": [...]}'}
+
+        await manager.bind_session(watched, 5)
+        await asyncio.sleep(0)
+        assert [eio_sid for eio_sid, data in sent if "user_online" in data] == ["eio-0"]
+
+        await unsubscribe(watcher, {"user_ids": [5]})
+        await disconnect(watched)
+        await disconnect(bystander)
+        await asyncio.sleep(0)
+        # Уход пользователя 5 после отписки не приходит, уход пользователя 2 — приходит
+        assert [(eio_sid, data) for eio_sid, data in sent if "user_offline" in data] == [
+            ("eio-0", '2["user_offline",{"user_id":"2"}]')
+        ]
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+def test_authenticate_takes_user_from_verified_token_only(monkeypatch: pytest.MonkeyPatch):
+    manager = SocketManager()
+    recorder = EmitRecorder()
+    resumed: list[tuple[str, int]] = []
+    saved: list[tuple[str, dict]] = []
+
+    async def record_resume(sid, user_id, last_seq):
+        resumed.append((sid, user_id))
+
+    async def record_session(sid, session):
+        saved.append((sid, session))
+
+    monkeypatch.setattr(manager.sio, "emit", recorder)
+    monkeypatch.setattr(manager, "resume", record_resume)
+    monkeypatch.setattr(manager.sio, "save_session", record_session)
+    authenticate = manager.sio.handlers["/"]["authenticate"]
+    forged = jwt.encode({"user_id": 5, "type": "access"}, "not-the-secret", algorithm=ALGORITHM)
+    refresh = create_refresh_token({"user_id": 5})
+
+    async def scenario():
+        sid, = await connect_sessions(manager, 1)
+        results = [
+            await authenticate(sid, {"token": forged, "user_id": 5}),
+            await authenticate(sid, {"token": refresh, "user_id": 5}),
+            await authenticate(sid, {"user_id": 5}),
+        ]
+        assert manager.sessions.user_of(sid) is None
+        results.append(await authenticate(sid, {"token": create_access_token({"user_id": 9}), "user_id": 5}))
+        return sid, results
+
+    sid, results = asyncio.run(scenario())
+
+    assert results == [False, False, False, True]
+    assert manager.sessions.user_of(sid) == 9
+    assert saved == [(sid, {"user_id": 9})]
+    assert resumed == [(sid, 9)]
+    assert [event for event, _, _ in recorder.calls if event.startswith("auth_")] == ["auth_error"] * 3 + ["auth_success"]
+
+
+class CrashedWorkerPresence(LocalPresence):
+    """Присутствие, в котором на первом пульсе снимаются сессии упавшего воркера."""
+
+    def __init__(self, orphaned: list[int]):
+        super().__init__()
+        self.orphaned = orphaned
+        self.closed = False
+
+    async def heartbeat(self) -> list[int]:
+        orphaned, self.orphaned = self.orphaned, []
+        return orphaned
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.mark.unit
+def test_heartbeat_announces_users_of_crashed_workers_offline(monkeypatch: pytest.MonkeyPatch):
+    presence = CrashedWorkerPresence(orphaned=[3])
+    manager = SocketManager(presence=presence)
+    recorder = EmitRecorder()
+    monkeypatch.setattr(manager.sio, "emit", recorder)
+
+    async def scenario():
+        manager.start()
+        await wait_for(lambda: recorder.calls)
+        await manager.stop()
+
+    asyncio.run(scenario())
+
+    assert recorder.calls == [("user_offline", {"user_id": "3"}, {"room": "presence:3"})]
+    assert presence.closed
+
+
+@pytest.mark.unit
+def test_resync_replays_after_client_seq_and_flags_unknown_seq_snapshot(monkeypatch: pytest.MonkeyPatch):
+    manager = SocketManager()
+    recorder = EmitRecorder()
+    requested: list[tuple[int, object]] = []
+
+    def exchange_sync(user_id, last_seq):
+        requested.append((user_id, last_seq))
+        if last_seq is not None and last_seq > 4:
+            return websockets.ExchangeSync(4, None, [], {"pending_offers": 0, "open_requests": 0})
+        missed = [(4, "exchange_created", {"id": 11})]
+        return websockets.ExchangeSync(4, missed, [], {"pending_offers": 1, "open_requests": 0})
+
+    monkeypatch.setattr(websockets, "load_exchange_sync", exchange_sync)
+    monkeypatch.setattr(manager.sio, "emit", recorder)
+    resync = manager.sio.handlers["/"]["exchange_resync"]
+
+    async def scenario():
+        sid, = await connect_sessions(manager, 1)
+        anonymous = await resync(sid, {"last_seq": 3})
+        await manager.bind_session(sid, 7)
+        await resync(sid, {"last_seq": 3})
+        await resync(sid, {"last_seq": 9})
+        return sid, anonymous
+
+    sid, anonymous = asyncio.run(scenario())
+
+    assert anonymous == {"error": "Требуется аутентификация"}
+    assert requested == [(7, 3), (7, 9)]
+    sent = [(event, data) for event, data, kwargs in recorder.calls if kwargs == {"to": sid}]
+    assert sent[0] == ("exchange_created", {"seq": 4, "exchange": {"id": 11}})
+    assert sent[2] == ("exchange_snapshot", {"seq": 4, "reset": True, "exchanges": []})
@@ -2,7 +2,7 @@
 import React from 'react';
 
 interface ExchangeStatusProps {
-  status: 'pending' | 'accepted' | 'rejected' | 'cancelled' | 'exchanged';
+  status: 'pending' | 'accepted' | 'rejected' | 'cancelled' | 'expired' | 'exchanged';
 }
 
 const ExchangeStatus: React.FC<ExchangeStatusProps> = ({ status }) => {
@@ -16,6 +16,8 @@ const ExchangeStatus: React.FC<ExchangeStatusProps> = ({ status }) => {
         return { text: 'Отклонено', color: '#dc2626', bg: '#fee2e2' };
       case 'cancelled':
         return { text: 'Отменено', color: '#6b7280', bg: '#f3f4f6' };
+      case 'expired':
+        return { text: 'Истёк срок', color: '#6b7280', bg: '#f3f4f6' };
       case 'exchanged':
         return { text: 'Обменено', color: '#059669', bg: '#d1fae5' };
       default:
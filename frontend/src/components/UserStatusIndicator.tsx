@@ -1,5 +1,7 @@
-import React from 'react';
-import { useSocket } from '../hooks/useSocket';
+import React, { useEffect, useState } from 'react';
+import { useAuth } from '../context/AuthContext';
+import { presenceAPI } from '../services/api';
+import { watchPresence } from '../services/socket';
 
 interface UserStatusIndicatorProps {
   userId: string | number;
@@ -12,8 +14,30 @@ const UserStatusIndicator: React.FC<UserStatusIndicatorProps> = ({
   size = 10, 
   showTooltip = true 
 }) => {
-  const { getIsUserOnline } = useSocket();
-  const isOnline = getIsUserOnline(userId.toString());
+  const { user } = useAuth();
+  const [isOnline, setIsOnline] = useState(false);
+
+  useEffect(() => {
+    if (!user) return;
+    const id = Number(userId);
+    let active = true;
+
+    // Сначала подписываемся, затем запрашиваем состояние: смена статуса между ними не потеряется
+    const cleanup = watchPresence([id], (data) => {
+      if (active) setIsOnline(data.isOnline);
+    });
+    presenceAPI
+      .getPresence([id])
+      .then((response) => {
+        if (active) setIsOnline(Boolean(response.data.users[String(id)]));
+      })
+      .catch((error) => console.error('Ошибка загрузки статуса пользователя:', error));
+
+    return () => {
+      active = false;
+      cleanup();
+    };
+  }, [user, userId]);
 
   return (
     <div 
@@ -8,6 +8,33 @@ import {
   setupUserStatus  
 } from '../services/socket';
 import { useAuth } from '../context/AuthContext';
+import { translateStatus } from '../utils/translations';
+
+// Заголовок и текст уведомления о смене статуса обмена
+const describeStatusUpdate = (status: string, bookTitle: string) => {
+  if (status === 'expired') {
+    const label = translateStatus(status).toLowerCase();
+    return {
+      title: `Обмен: ${label}`,
+      message: `Владелец не ответил на ваше предложение обмена книги "${bookTitle}" — ${label}`
+    };
+  }
+  const accepted = status === 'accepted';
+  return {
+    title: accepted ? 'Обмен принят' : 'Обмен отклонен',
+    message: `Ваше предложение обмена книги "${bookTitle}" было ${accepted ? 'принято' : 'отклонено'}`
+  };
+};
+
+const exchangeNotification = (exchange: any) => ({
+  id: exchange.id,
+  type: 'exchange',
+  title: 'Новое предложение обмена',
+  message: `Пользователь ${exchange.requester_username} хочет обменять вашу книгу "${exchange.book_title}"`,
+  bookId: exchange.book_id,
+  timestamp: new Date().toISOString(),
+  read: false
+});
 
 export const useSocket = () => {
   const { user } = useAuth();
@@ -30,21 +57,24 @@ export const useSocket = () => {
         console.log('✅ Успешное подключение к вебсокетам');
         setIsConnected(true);
 
-        const cleanupExchanges = setupExchangeNotifications((exchange) => {
-          setNotifications(prev => {
-            if (prev.some(n => n.id === exchange.id)) return prev;
-            
-            return [...prev, {
-              id: exchange.id,
-              type: 'exchange',
-              title: 'Новое предложение обмена',
-              message: `Пользователь ${exchange.requester_username} хочет обменять вашу книгу "${exchange.book_title}"`,
-              bookId: exchange.book_id,
-              timestamp: new Date().toISOString(),
-              read: false
-            }];
-          });
-        });
+        const cleanupExchanges = setupExchangeNotifications(
+          (exchange) => {
+            setNotifications(prev => {
+              if (prev.some(n => n.id === exchange.id)) return prev;
+              return [...prev, exchangeNotification(exchange)];
+            });
+          },
+          // Снимок — полный список ожидающих предложений: заменяем им прежние
+          (exchanges) => {
+            setNotifications(prev => {
+              const previous = new Map(prev.filter(n => n.type === 'exchange').map(n => [n.id, n]));
+              return [
+                ...prev.filter(n => n.type !== 'exchange'),
+                ...exchanges.map(exchange => previous.get(exchange.id) || exchangeNotification(exchange))
+              ];
+            });
+          }
+        );
 
         const cleanupStatus = setupExchangeStatusUpdates((update) => {
           const notificationId = `status-${update.exchange_id}-${update.status}`;
@@ -56,8 +86,7 @@ export const useSocket = () => {
               id: notificationId,
               type: 'status_update',
               status: update.status,
-              title: update.status === 'accepted' ? 'Обмен принят' : 'Обмен отклонен',
-              message: `Ваше предложение обмена книги "${update.book_title}" было ${update.status === 'accepted' ? 'принято' : 'отклонено'}`,
+              ...describeStatusUpdate(update.status, update.book_title),
               bookId: update.book_id,
               timestamp: new Date().toISOString(),
               read: false
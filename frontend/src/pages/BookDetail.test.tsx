@@ -53,6 +53,10 @@ const book = {
   updated_at: null,
 };
 
+function exchangePage(exchanges: unknown[]) {
+  return { exchanges, limit: 20, next_cursor: null, status_counts: { pending: exchanges.length } };
+}
+
 function renderBookDetail() {
   render(
     <MemoryRouter initialEntries={['/book/1']}>
@@ -86,9 +90,9 @@ describe('BookDetail page', () => {
     } as never);
     getBookMock.mockResolvedValue({ data: book });
     getMyExchangesMock
-      .mockResolvedValueOnce({ data: [] })
+      .mockResolvedValueOnce({ data: exchangePage([]) })
       .mockResolvedValueOnce({
-        data: [
+        data: exchangePage([
           {
             id: 10,
             book_id: 1,
@@ -97,7 +101,7 @@ describe('BookDetail page', () => {
             status: 'pending',
             created_at: '2026-04-23T00:00:00Z',
           },
-        ],
+        ]),
       });
     createExchangeMock.mockResolvedValue({ data: { id: 10 } });
 
@@ -134,7 +138,7 @@ describe('BookDetail page', () => {
     } as never);
     getBookMock.mockResolvedValue({ data: book });
     getMyOffersMock.mockResolvedValue({
-      data: [
+      data: exchangePage([
         {
           id: 10,
           book_id: 1,
@@ -154,7 +158,7 @@ describe('BookDetail page', () => {
             created_at: '2026-04-23T00:00:00Z',
           },
         },
-      ],
+      ]),
     });
 
     renderBookDetail();
@@ -162,6 +166,7 @@ describe('BookDetail page', () => {
     expect(await screen.findByText('Текущие предложения обмена')).toBeInTheDocument();
     expect(await screen.findByText(/Предложение от пользователя reader/)).toBeInTheDocument();
     expect(getMyOffersMock).toHaveBeenCalledTimes(1);
+    expect(getMyOffersMock).toHaveBeenCalledWith({ book_id: 1, status: 'pending' });
     expect(getMyExchangesMock).not.toHaveBeenCalled();
   });
 });
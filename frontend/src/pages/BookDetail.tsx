@@ -35,10 +35,11 @@ const BookDetail: React.FC = () => {
       }
 
       try {
+        const params = { book_id: Number(id), status: 'pending' as const };
         const response = user.id === book.owner_id
-          ? await exchangesAPI.getMyOffers()
-          : await exchangesAPI.getMyExchanges();
-        setExchanges(response.data.filter(ex => ex.book_id === Number(id) && ex.status === 'pending'));
+          ? await exchangesAPI.getMyOffers(params)
+          : await exchangesAPI.getMyExchanges(params);
+        setExchanges(response.data.exchanges);
       } catch (err) {
         console.error('Error fetching exchanges:', err);
       }
@@ -64,8 +65,8 @@ const BookDetail: React.FC = () => {
       await exchangesAPI.createExchange(newExchange);
       
       // Обновляем список обменов после создания
-      const response = await exchangesAPI.getMyExchanges();
-      setExchanges(response.data.filter(ex => ex.book_id === book.id && ex.status === 'pending'));
+      const response = await exchangesAPI.getMyExchanges({ book_id: book.id, status: 'pending' });
+      setExchanges(response.data.exchanges);
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Не удалось создать предложение обмена');
     } finally {
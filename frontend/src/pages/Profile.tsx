@@ -14,6 +14,9 @@ const Profile: React.FC = () => {
   const [loading, setLoading] = useState(true);
   const [exchanges, setExchanges] = useState<Exchange[]>([]);
   const [offers, setOffers] = useState<Exchange[]>([]);
+  const [requestsCursor, setRequestsCursor] = useState<string | null>(null);
+  const [offersCursor, setOffersCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [activeTab, setActiveTab] = useState<'requests' | 'offers'>('requests');
   const [loadingExchanges, setLoadingExchanges] = useState(true);
 
@@ -37,8 +40,10 @@ const Profile: React.FC = () => {
           exchangesAPI.getMyExchanges(),
           exchangesAPI.getMyOffers()
         ]);
-        setExchanges(requestsResponse.data);
-        setOffers(offersResponse.data);
+        setExchanges(requestsResponse.data.exchanges);
+        setOffers(offersResponse.data.exchanges);
+        setRequestsCursor(requestsResponse.data.next_cursor);
+        setOffersCursor(offersResponse.data.next_cursor);
       } catch (error) {
         console.error('Ошибка при загрузке обменов:', error);
       }
@@ -49,6 +54,28 @@ const Profile: React.FC = () => {
     }
   }, [user]);
 
+  // Списки обменов постраничные: следующая страница догружается по курсору
+  const loadMoreExchanges = async (tab: 'requests' | 'offers') => {
+    const cursor = tab === 'requests' ? requestsCursor : offersCursor;
+    if (!cursor) return;
+    setLoadingMore(true);
+    try {
+      if (tab === 'requests') {
+        const response = await exchangesAPI.getMyExchanges({ cursor });
+        setExchanges(prev => [...prev, ...response.data.exchanges]);
+        setRequestsCursor(response.data.next_cursor);
+      } else {
+        const response = await exchangesAPI.getMyOffers({ cursor });
+        setOffers(prev => [...prev, ...response.data.exchanges]);
+        setOffersCursor(response.data.next_cursor);
+      }
+    } catch (error) {
+      console.error('Ошибка при загрузке обменов:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDeleteBook = async (bookId: number) => {
     if (window.confirm('Вы уверены, что хотите удалить эту книгу?')) {
       try {
@@ -212,6 +239,17 @@ const Profile: React.FC = () => {
                 );
               })
             )}
+            {requestsCursor && (
+              <div className="text-center mt-3">
+                <button
+                  className="btn btn-secondary"
+                  onClick={() => loadMoreExchanges('requests')}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? 'Загрузка...' : 'Показать ещё'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       
@@ -297,6 +335,17 @@ const Profile: React.FC = () => {
                 );
               })
             )}
+            {offersCursor && (
+              <div className="text-center mt-3">
+                <button
+                  className="btn btn-secondary"
+                  onClick={() => loadMoreExchanges('offers')}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? 'Загрузка...' : 'Показать ещё'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Book, User, Exchange, ExchangeResponse, UserResponse } from '../types';
+import { Book, User, Exchange, ExchangeCounters, ExchangeResponse, PaginatedExchangeResponse, PresenceResponse, UserResponse } from '../types';
 
 const API_BASE_URL = '/api';
 
@@ -110,15 +110,31 @@ export interface PaginatedResponse<T> {
   limit: number;
 }
 
+export interface ExchangeListParams {
+  status?: Exchange['status'];
+  book_id?: number;
+  order?: 'asc' | 'desc';
+  cursor?: string;
+  limit?: number;
+}
+
 export const exchangesAPI = {
   createExchange: (exchangeData: any) => api.post<ExchangeResponse>('/exchanges/', exchangeData),
-  getMyExchanges: () => api.get<Exchange[]>(`/exchanges/my-requests`),
-  getMyOffers: () => api.get<Exchange[]>(`/exchanges/my-offers`),
+  getMyExchanges: (params?: ExchangeListParams) =>
+    api.get<PaginatedExchangeResponse>(`/exchanges/my-requests`, { params }),
+  getMyOffers: (params?: ExchangeListParams) =>
+    api.get<PaginatedExchangeResponse>(`/exchanges/my-offers`, { params }),
+  getCounters: () => api.get<ExchangeCounters>('/exchanges/counters'),
   acceptExchange: (exchangeId: number) => api.put<ExchangeResponse>(`/exchanges/${exchangeId}/accept`),
   rejectExchange: (exchangeId: number) => api.put<ExchangeResponse>(`/exchanges/${exchangeId}/reject`),
   cancelExchange: (exchangeId: number) => api.delete(`/exchanges/${exchangeId}/cancel`),
 };
 
+export const presenceAPI = {
+  getPresence: (userIds: number[]) =>
+    api.get<PresenceResponse>('/presence', { params: { ids: userIds.join(',') } }),
+};
+
 export const booksAPI = {
   getBooks: (params?: {
     page?: number;
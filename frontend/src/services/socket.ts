@@ -1,7 +1,75 @@
 import io, { Socket } from 'socket.io-client';
+import { ExchangeCounters } from '../types';
 
 let socket: Socket | null = null;
 const SOCKET_URL = location.origin;
+// Номер последнего применённого дельта-события обменов: при переподключении
+// сервер досылает только пропущенное или присылает снимок exchange_snapshot
+let lastSeq: number | null = null;
+
+// Дельты приходят из комнаты пользователя и из повтора после подключения
+// вперемешку: события с разрывом в номерах ждут здесь недостающих
+const pendingDeltas = new Map<number, () => void>();
+let gapTimer: ReturnType<typeof setTimeout> | null = null;
+const GAP_TIMEOUT_MS = 2000;
+
+const snapshotListeners = new Set<(exchanges: any[]) => void>();
+
+// Сколько компонентов следят за присутствием каждого пользователя
+const presenceWatchers = new Map<number, number>();
+
+const flushPendingDeltas = () => {
+  while (lastSeq !== null && pendingDeltas.has(lastSeq + 1)) {
+    lastSeq += 1;
+    const deliver = pendingDeltas.get(lastSeq)!;
+    pendingDeltas.delete(lastSeq);
+    deliver();
+  }
+  if (pendingDeltas.size === 0 && gapTimer !== null) {
+    clearTimeout(gapTimer);
+    gapTimer = null;
+  }
+};
+
+// Разрыв не закрылся сам: просим сервер дослать пропущенное после lastSeq
+const requestResync = () => {
+  gapTimer = null;
+  if (pendingDeltas.size === 0) return;
+  socket?.emit('exchange_resync', { last_seq: lastSeq });
+  gapTimer = setTimeout(requestResync, GAP_TIMEOUT_MS);
+};
+
+// Применить дельту строго по порядку номеров: дубликаты отбрасываются,
+// забежавшие вперёд ждут, пока не придут все предыдущие
+const applyDelta = (seq: number | null, deliver: () => void) => {
+  if (seq === null || seq === undefined) {
+    deliver();
+    return;
+  }
+  if (lastSeq !== null && seq <= lastSeq) return;
+  if (lastSeq !== null && seq === lastSeq + 1) {
+    lastSeq = seq;
+    deliver();
+    flushPendingDeltas();
+    return;
+  }
+  pendingDeltas.set(seq, deliver);
+  if (gapTimer === null) {
+    gapTimer = setTimeout(requestResync, GAP_TIMEOUT_MS);
+  }
+};
+
+// Снимок заменяет состояние целиком. Более старый снимок, чем уже применённые дельты,
+// устарел (ответ на повторный запрос), если только сервер не сбросил нумерацию
+const applySnapshot = (data: { seq: number; reset?: boolean; exchanges: any[] }) => {
+  if (lastSeq !== null && data.seq < lastSeq && !data.reset) return;
+  lastSeq = data.seq;
+  Array.from(pendingDeltas.keys())
+    .filter((seq) => seq <= data.seq)
+    .forEach((seq) => pendingDeltas.delete(seq));
+  snapshotListeners.forEach((listener) => listener(data.exchanges));
+  flushPendingDeltas();
+};
 
 export const initSocket = () => {
   if (!socket) {
@@ -15,11 +83,28 @@ export const initSocket = () => {
       extraHeaders: {
       },
       withCredentials: true,
+      auth: (cb) => cb(lastSeq === null ? {} : { last_seq: lastSeq }),
     });
     
     socket.on('connect_error', (error) => {
       console.error('Ошибка подключения к вебсокетам:', error);
     });
+
+    // Подписки на присутствие живут в комнатах сервера и теряются при переподключении
+    socket.on('connect', () => {
+      if (presenceWatchers.size > 0) {
+        socket?.emit('subscribe_presence', { user_ids: Array.from(presenceWatchers.keys()) });
+      }
+    });
+
+    socket.on('exchange_snapshot', applySnapshot);
+
+    // Всплеск событий сервер склеивает в одну пачку: раздаём её обычным обработчикам
+    socket.on('exchange_batch', (data: { events: { event: string; data: any }[] }) => {
+      data.events.forEach(({ event, data: payload }) => {
+        socket?.listeners(event).forEach((listener) => listener(payload));
+      });
+    });
     
     socket.on('disconnect', (reason) => {
       console.log('Вебсокет отключен. Причина:', reason);
@@ -68,47 +153,113 @@ export const disconnectSocket = () => {
     socket.disconnect();
   }
   socket = null;
+  lastSeq = null;
+  pendingDeltas.clear();
+  if (gapTimer !== null) {
+    clearTimeout(gapTimer);
+    gapTimer = null;
+  }
+  presenceWatchers.clear();
 };
 
-export const setupExchangeNotifications = (callback: (exchange: any) => void) => {
+// onSnapshot получает полный список ожидающих предложений и должен заменить им прежний
+export const setupExchangeNotifications = (
+  callback: (exchange: any) => void,
+  onSnapshot: (exchanges: any[]) => void = (exchanges) => exchanges.forEach(callback)
+) => {
   const socket = initSocket();
   
-  socket.on('new_exchanges', (data: { exchanges: any[] }) => {
-    console.log('Получены новые предложения обмена:', data);
-    data.exchanges.forEach(callback);
+  socket.on('exchange_created', (data: { seq: number | null; exchange: any }) => {
+    applyDelta(data.seq, () => {
+      console.log('Получено новое предложение обмена:', data);
+      callback(data.exchange);
+    });
   });
+
+  // Снимок приходит новому клиенту или отставшему больше, чем хранит буфер повтора
+  snapshotListeners.add(onSnapshot);
   
   return () => {
-    socket.off('new_exchanges');
+    socket.off('exchange_created');
+    snapshotListeners.delete(onSnapshot);
   };
 };
 
 export const setupExchangeStatusUpdates = (callback: (update: any) => void) => {
   const socket = initSocket();
   
-  socket.on('exchange_status_update', (data: any) => {
-    console.log('Обновление статуса обмена:', data);
-    callback(data);
+  // Одиночный переход и массовая обработка приходят одним событием со списком изменений
+  socket.on('exchange_updated', (data: { seq: number | null; updates: any[] }) => {
+    applyDelta(data.seq, () => {
+      console.log('Обновление статусов обменов:', data);
+      data.updates.forEach(callback);
+    });
   });
   
   return () => {
-    socket.off('exchange_status_update');
+    socket.off('exchange_updated');
+  };
+};
+
+export const setupExchangeCounters = (callback: (counters: ExchangeCounters) => void) => {
+  const socket = initSocket();
+
+  // Сервер присылает новые значения счётчиков после каждого перехода обмена
+  socket.on('exchange_counters', callback);
+
+  return () => {
+    socket.off('exchange_counters', callback);
   };
 };
 
 export const setupUserStatus = (callback: (data: { user_id: string; isOnline: boolean }) => void) => {
   const socket = initSocket();
   
-  socket.on('user_online', (data: { user_id: string }) => {
+  const handleOnline = (data: { user_id: string }) => {
     callback({ user_id: data.user_id, isOnline: true });
-  });
-  
-  socket.on('user_offline', (data: { user_id: string }) => {
+  };
+  const handleOffline = (data: { user_id: string }) => {
     callback({ user_id: data.user_id, isOnline: false });
-  });
+  };
+
+  socket.on('user_online', handleOnline);
+  socket.on('user_offline', handleOffline);
   
   return () => {
-    socket.off('user_online');
-    socket.off('user_offline');
+    socket.off('user_online', handleOnline);
+    socket.off('user_offline', handleOffline);
+  };
+};
+
+// Сервер присылает user_online/user_offline только подписчикам на этих пользователей
+export const watchPresence = (
+  userIds: number[],
+  callback: (data: { user_id: string; isOnline: boolean }) => void
+) => {
+  const socket = initSocket();
+  const added = userIds.filter((id) => !presenceWatchers.has(id));
+  userIds.forEach((id) => presenceWatchers.set(id, (presenceWatchers.get(id) || 0) + 1));
+  if (added.length > 0 && socket.connected) {
+    socket.emit('subscribe_presence', { user_ids: added });
+  }
+
+  const cleanupStatus = setupUserStatus((data) => {
+    if (userIds.includes(Number(data.user_id))) callback(data);
+  });
+
+  return () => {
+    cleanupStatus();
+    const removed = userIds.filter((id) => {
+      const watchers = (presenceWatchers.get(id) || 1) - 1;
+      if (watchers > 0) {
+        presenceWatchers.set(id, watchers);
+        return false;
+      }
+      presenceWatchers.delete(id);
+      return true;
+    });
+    if (removed.length > 0 && socket.connected) {
+      socket.emit('unsubscribe_presence', { user_ids: removed });
+    }
   };
 };
\ No newline at end of file
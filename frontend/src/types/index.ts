@@ -73,7 +73,7 @@ export interface Exchange {
   book_id: number;
   requester_id: number;
   owner_id: number;
-  status: 'pending' | 'accepted' | 'rejected' | 'cancelled';
+  status: 'pending' | 'accepted' | 'rejected' | 'cancelled' | 'expired';
   created_at: string;
   updated_at?: string;
   book?: Book;
@@ -87,5 +87,21 @@ export interface ExchangeResponse extends Exchange {
   owner: User;
 }
 
+export interface ExchangeCounters {
+  pending_offers: number;
+  open_requests: number;
+}
+
+export interface PresenceResponse {
+  users: Record<string, boolean>;
+}
+
+export interface PaginatedExchangeResponse {
+  exchanges: ExchangeResponse[];
+  limit: number;
+  next_cursor: string | null;
+  status_counts: Record<string, number>;
+}
+
 export interface UserResponse extends User {
 }
\ No newline at end of file
@@ -39,6 +39,7 @@ export const translateStatus = (status: string | null): string => {
     'accepted': 'Принято',
     'rejected': 'Отклонено',
     'cancelled': 'Отменено',
+    'expired': 'Истёк срок',
     'exchanged': 'Обменено',
     'available': 'Доступна для обмена'
   };